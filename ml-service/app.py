@@ -3,14 +3,41 @@ Flask ML Service for Malaria Prediction
 Provides REST API endpoints for county statistics and predictions
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, has_request_context, request, jsonify, render_template, send_file, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
 import os
+import functools
+import hashlib
+import hmac
+import io
+import itertools
+import multiprocessing
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from chatbot_v2 import chatbot
+from sklearn.ensemble import HistGradientBoostingRegressor
+from chatbot_v2 import KilmalariaAI
+from columnar_dataset import load_dataset
+from county_store import MONTH_NAMES, CountyStore, build_county_stats
+from forecaster import RegionalForecaster, feature_matrix
+from feature_engineering import FEATURE_FINGERPRINT, fit_params, load_pipeline
+from forecast_cache import ForecastCache
+from model_distillation import FAST_MODEL_NAME
+from model_loader import ArtifactLoader, load_artifact
+from model_registry import ModelRegistry, RegistryError, file_checksum
+from tree_engine import CompiledEnsemble, is_supported
+from prediction_service import HTTPPredictionService, LocalPredictionService, PredictionError
+from service_metrics import MetricsRegistry, StageTimer
+from session_store import MemorySessionStore, SQLiteSessionStore
+from job_queue import JobQueue, job_metrics
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
@@ -32,23 +59,121 @@ CORS(app, resources={
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Upload size limit in MB (MAX_UPLOAD_MB, default 16MB)
+MAX_UPLOAD_MB = float(os.environ.get('MAX_UPLOAD_MB', 16))
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+# Rows per chunk when an upload is streamed back as NDJSON
+UPLOAD_CHUNK_ROWS = int(os.environ.get('UPLOAD_CHUNK_ROWS', 5000))
+REQUIRED_UPLOAD_COLUMNS = ['county', 'temperature', 'rainfall', 'humidity', 'month', 'year']
+NO_PREDICTIONS_ERROR = 'No valid predictions could be generated. Please check that your file contains valid county names and data. Ensure county names match the official Kenyan county names (e.g., Nairobi, Mombasa, Kisumu).'
+
+# Background batch jobs (POST /jobs or /predict_from_file?async=1): job state
+# and results are kept in JOBS_DIR, processed by JOB_WORKERS threads per worker
+JOBS_DIR = os.environ.get('JOBS_DIR', 'jobs')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 24 * 3600))
 
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Forecast cache configuration
+# Deterministic mode seeds the environmental inputs of /predict_regional so
+# repeated requests give the same answer and can be served from the cache
+FORECAST_DETERMINISTIC = os.environ.get('FORECAST_DETERMINISTIC', '1') != '0'
+FORECAST_CACHE = ForecastCache(
+    max_size=int(os.environ.get('FORECAST_CACHE_SIZE', 256)),
+    ttl_seconds=int(os.environ.get('FORECAST_CACHE_TTL', 3600))
+)
+
+# Model loading mode:
+#   eager      - load all models in parallel before serving (default)
+#   background - start serving immediately, /health reports ready once loaded
+#   lazy       - load the models on the first prediction
+MODEL_LOAD_MODE = os.environ.get('MODEL_LOAD_MODE', 'eager')
+
+# Worker processes for /predict_all, forked from a process with the models
+# loaded so they share them read-only (1 runs everything in-process)
+FORECAST_PROCESSES = int(os.environ.get('FORECAST_PROCESSES', os.cpu_count() or 1))
+MIN_COUNTIES_PER_PROCESS = 8
+FORECAST_POOL = None
+FORECAST_POOL_PID = None
+FORECAST_POOL_LOCK = threading.Lock()
+# File names of the ensemble members inside a model directory
+ENSEMBLE_ARTIFACTS = {
+    'malaria': 'malaria_model.pkl',
+    'randomforest': 'randomforest_model.pkl',
+    'gradientboosting': 'gradientboosting_model.pkl',
+    'histgradientboosting': 'histgradientboosting_model.pkl',
+    'extratrees': 'extratrees_model.pkl',
+    'xgboost': 'xgboost_model.pkl',
+    'lightgbm': 'lightgbm_model.pkl'
+}
+# numpy-backed artifacts are memory-mapped read-only so forked workers share
+# the page cache ('' disables). sklearn trees copy their node arrays on load,
+# so for them sharing comes from preloading in the gunicorn master (gunicorn.conf.py)
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r')
+
+# Versioned models written by the training scripts (model_registry.py). The
+# promoted version is served; without one the service falls back to the
+# unversioned files in LEGACY_MODEL_DIR
+MODEL_REGISTRY = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
+LEGACY_MODEL_DIR = 'models'
+# Seconds between checks for a newly promoted version, which is then loaded in
+# the background and swapped in by every worker (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+MODEL_WATCHER_PID = None
+# Token for the /admin/models endpoints (Authorization: Bearer <token>);
+# they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Inference backend for the sklearn tree ensembles:
+#   sklearn  - each model's own predict (default)
+#   compiled - one vectorized traversal over flattened node arrays (tree_engine.py)
+# Other members (xgboost, lightgbm) always use their own predict. Histogram
+# gradient boosting is compiled with either backend: its own predict starts a
+# thread team per tree, milliseconds per call for a few hundred trees. Batches
+# larger than COMPILED_MAX_ROWS go to sklearn, whose predict wins there (the
+# crossover measured with bench_tree_engine.py is about 64 rows)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'sklearn')
+COMPILED_MAX_ROWS = int(os.environ.get('COMPILED_MAX_ROWS', 64))
+
+# Endpoints answered by the model version's compact fast model (pruned or
+# distilled after training, model_distillation.py) instead of the full
+# ensemble: comma separated, from 'chat' and 'predict_regional'. Versions
+# trained without one fall back to the full ensemble
+FAST_MODEL_ENDPOINTS = {name.strip() for name in os.environ.get('FAST_MODEL_ENDPOINTS', '').split(',') if name.strip()}
+
+# Request, stage and model timings served on /metrics (service_metrics.py).
+# Processes share their totals through METRICS_DIR (gunicorn.conf.py sets
+# one for its workers); without it /metrics covers only the answering process
+METRICS = MetricsRegistry(os.environ.get('METRICS_DIR', ''))
+REQUEST_COUNT = METRICS.counter('ml_http_requests_total', 'HTTP requests by endpoint, method and status',
+                                ['endpoint', 'method', 'status'])
+REQUEST_SECONDS = METRICS.histogram('ml_http_request_duration_seconds',
+                                    'Time to build the response (a streamed body is not included)',
+                                    ['endpoint', 'method'])
+STAGE_SECONDS = METRICS.histogram('ml_stage_duration_seconds',
+                                  'Time per request (per chunk for uploads) in each stage of forecasting and scoring',
+                                  ['endpoint', 'stage'])
+MODEL_SECONDS = METRICS.histogram('ml_model_predict_duration_seconds', 'Time of one ensemble member predict call',
+                                  ['model', 'backend'])
+UPLOAD_ROWS = METRICS.counter('ml_upload_rows_total', 'Uploaded rows parsed and scored', ['mode'])
+UPLOAD_SECONDS = METRICS.counter('ml_upload_seconds_total', 'Time spent parsing and scoring uploaded rows', ['mode'])
+
+# Historical data; loaded from its columnar copy (columnar_dataset.py)
+DATASET_CSV = 'malaria_master_dataset.csv'
+
 # Load model and data on startup
-MODEL = None
-RF_MODEL = None
-GB_MODEL = None
-ET_MODEL = None
-XGB_MODEL = None
-LGB_MODEL = None
-ENSEMBLE_WEIGHTS = None
-FEATURE_COLUMNS = None
+ACTIVE_MODELS = None
+MODEL_SWAP_LOCK = threading.Lock()
+MODEL_SWAP = {'state': 'idle', 'version': None, 'error': None, 'swapped_at': None}
 DATA = None
-SCALER = None
-FEATURE_SELECTOR = None
+COUNTY_STORE = None
+COUNTY_STATS = None
+ALL_COUNTY_STATS = None
+DATASET_FEATURE_PARAMS = None
+DATASET_VERSION = None
 COUNTIES = [
     'Baringo', 'Bomet', 'Bungoma', 'Busia', 'Elgeyo-Marakwet',
     'Embu', 'Garissa', 'Homa Bay', 'Isiolo', 'Kajiado',
@@ -65,138 +190,406 @@ COUNTIES = [
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def load_model_and_data():
-    """Load trained ensemble models and historical data"""
-    global MODEL, RF_MODEL, GB_MODEL, ET_MODEL, XGB_MODEL, LGB_MODEL, ENSEMBLE_WEIGHTS, FEATURE_COLUMNS, DATA, SCALER, FEATURE_SELECTOR
+def artifact_version(paths):
+    """Short fingerprint of a set of files based on their size and modification time"""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+def _ensemble_weights(ensemble_metrics, available):
+    """Ensemble weights from the saved metrics, or equal weights over the available models"""
+    if ensemble_metrics is not None and ensemble_metrics.get('weights'):
+        return ensemble_metrics['weights']
+    # Fallback weights, built from the members actually loaded
+    if len(available) > 0:
+        weight = 1.0 / len(available)
+        return {name: weight for name in available}
+    return None
+
+class ModelBundle:
+    """
+    One model version: ensemble members, weights, feature columns and
+    preprocessing. Requests take the active bundle once and use it
+    throughout, so a hot swap never mixes two versions within a request.
+    """
     
-    try:
-        # Load main model (for backward compatibility)
-        MODEL = joblib.load('models/malaria_model.pkl')
+    def __init__(self, directory, version, manifest=None):
+        self.directory = directory
+        self.version = version
+        # Registry manifest (None for the legacy models directory)
+        self.manifest = manifest
+        self.loader = ArtifactLoader(
+            {name: os.path.join(directory, filename) for name, filename in ENSEMBLE_ARTIFACTS.items()},
+            load_fn=lambda path: load_artifact(self._verified(path), mmap_mode=MODEL_MMAP_MODE)
+        )
+        self.models = None
+        self.model = None
+        self.compiled = None
+        self.fast_model = None
+        self.ready = False
+        self._lock = threading.Lock()
         
-        # Load ensemble models
-        models_loaded = {}
-        try:
-            RF_MODEL = joblib.load('models/randomforest_model.pkl')
-            models_loaded['randomforest'] = RF_MODEL
-        except FileNotFoundError:
-            RF_MODEL = None
-            
-        try:
-            GB_MODEL = joblib.load('models/gradientboosting_model.pkl')
-            models_loaded['gradientboosting'] = GB_MODEL
-        except FileNotFoundError:
-            GB_MODEL = None
-            
-        try:
-            ET_MODEL = joblib.load('models/extratrees_model.pkl')
-            models_loaded['extratrees'] = ET_MODEL
-        except FileNotFoundError:
-            ET_MODEL = None
-        
-        # Try to load XGBoost
-        try:
-            import xgboost as xgb
-            XGB_MODEL = joblib.load('models/xgboost_model.pkl')
-            models_loaded['xgboost'] = XGB_MODEL
-        except (FileNotFoundError, ImportError):
-            XGB_MODEL = None
-        
-        # Try to load LightGBM
-        try:
-            import lightgbm as lgb
-            LGB_MODEL = joblib.load('models/lightgbm_model.pkl')
-            models_loaded['lightgbm'] = LGB_MODEL
-        except (FileNotFoundError, ImportError):
-            LGB_MODEL = None
+        available = [name for name, filename in ENSEMBLE_ARTIFACTS.items()
+                     if name != 'malaria' and os.path.exists(os.path.join(directory, filename))]
         
         # Load ensemble weights
-        try:
-            ensemble_metrics = joblib.load('models/ensemble_metrics.pkl')
-            ENSEMBLE_WEIGHTS = ensemble_metrics.get('weights', {
-                'randomforest': 0.25,
-                'gradientboosting': 0.25,
-                'extratrees': 0.25,
-                'xgboost': 0.125 if XGB_MODEL else 0,
-                'lightgbm': 0.125 if LGB_MODEL else 0
-            })
+        ensemble_metrics = self._read('ensemble_metrics.pkl')
+        self.ensemble_metrics = ensemble_metrics
+        if ensemble_metrics is not None:
             accuracy = ensemble_metrics.get('metrics', {}).get('r2_score', 0)*100
-            print(f"[OK] Advanced ensemble models loaded - Accuracy: {accuracy:.2f}%")
-            print(f"     Models: {', '.join(models_loaded.keys())}")
-        except FileNotFoundError:
-            # Fallback weights
-            if len(models_loaded) > 0:
-                weight = 1.0 / len(models_loaded)
-                ENSEMBLE_WEIGHTS = {name: weight for name in models_loaded.keys()}
-            else:
-                ENSEMBLE_WEIGHTS = None
+            print(f"[OK] Advanced ensemble metrics loaded - Accuracy: {accuracy:.2f}%")
+        else:
             print("[WARN] Ensemble metrics not found, using equal weights")
+        if manifest is not None and manifest.get('weights'):
+            self.weights = manifest['weights']
+        else:
+            self.weights = _ensemble_weights(ensemble_metrics, available)
         
-        # Load scaler if available
-        try:
-            SCALER = joblib.load('models/scaler.pkl')
-        except FileNotFoundError:
-            SCALER = None
+        # Scaler and feature selector if available
+        self.scaler = self._read('scaler.pkl')
+        self.feature_selector = self._read('feature_selector.pkl')
         
-        # Load feature selector if available
+        if manifest is not None:
+            self.feature_columns = manifest['feature_columns']
+        else:
+            self.feature_columns = self._read('feature_columns.pkl')
+            if self.feature_columns is None:
+                raise FileNotFoundError(os.path.join(directory, 'feature_columns.pkl'))
+        
+        # Fingerprint and fitted params of the features the model was trained on
+        self.feature_pipeline = load_pipeline(self._verified(os.path.join(directory, 'feature_pipeline.json')))
+        if self.feature_pipeline is None:
+            print(f"[WARN] Model {version} has no saved feature pipeline, its features cannot be checked")
+        elif self.feature_skew:
+            print(f"[WARN] Feature skew: model {version} was trained on features {self.feature_fingerprint}, "
+                  f"this service computes {FEATURE_FINGERPRINT}")
+    
+    @property
+    def feature_fingerprint(self):
+        return self.feature_pipeline['fingerprint'] if self.feature_pipeline is not None else None
+    
+    @property
+    def feature_params(self):
+        """Params the features were fitted with in training (None for models without a saved pipeline)"""
+        return self.feature_pipeline['params'] if self.feature_pipeline is not None else None
+    
+    @property
+    def feature_skew(self):
+        """True if the model's features differ from the serving features, None if unknown"""
+        if self.feature_pipeline is None:
+            return None
+        return self.feature_fingerprint != FEATURE_FINGERPRINT
+    
+    def _verified(self, path):
+        """Path of an artifact after checking it against the manifest checksum"""
+        if self.manifest is not None:
+            entry = self.manifest['artifacts'].get(os.path.basename(path))
+            if entry is not None and file_checksum(path) != entry['sha256']:
+                raise RegistryError(f'{self.version}/{os.path.basename(path)} does not match its checksum')
+        return path
+    
+    def _read(self, filename):
+        """Load a small artifact of this version, or None if it does not exist"""
         try:
-            FEATURE_SELECTOR = joblib.load('models/feature_selector.pkl')
+            return joblib.load(self._verified(os.path.join(self.directory, filename)))
         except FileNotFoundError:
-            FEATURE_SELECTOR = None
+            return None
+    
+    def ensure_loaded(self):
+        """Block until the ensemble is loaded, starting the load if it is lazy"""
+        if self.ready:
+            return
+        with self._lock:
+            if self.ready:
+                return
+            models = self.loader.wait()
+            if models['malaria'] is None:
+                raise FileNotFoundError(self.loader.artifacts['malaria'])
+            
+            compile_names = [name for name, model in models.items()
+                             if name in (self.weights or {}) and model is not None and is_supported(model)]
+            if INFERENCE_BACKEND != 'compiled':
+                compile_names = [name for name in compile_names
+                                 if isinstance(models[name], HistGradientBoostingRegressor)]
+            if INFERENCE_BACKEND == 'compiled' or compile_names:
+                self.compiled = CompiledEnsemble([(name, models[name]) for name in compile_names])
+                print(f"[OK] Compiled {self.compiled.n_trees} trees of {', '.join(self.compiled.names)} "
+                      f"({self.compiled.n_nodes} nodes)")
+            
+            fast_path = os.path.join(self.directory, FAST_MODEL_NAME)
+            if FAST_MODEL_ENDPOINTS and os.path.exists(fast_path):
+                self.fast_model = load_artifact(self._verified(fast_path), mmap_mode=MODEL_MMAP_MODE).compile()
+                print(f"[OK] Fast model for {', '.join(sorted(FAST_MODEL_ENDPOINTS))}: "
+                      f"{self.fast_model.description} ({self.fast_model.n_trees} trees)")
+            elif FAST_MODEL_ENDPOINTS:
+                print(f"[WARN] Model {self.version} has no fast model, all endpoints use the full ensemble")
+            
+            self.models = models
+            self.model = models['malaria']
+            self.ready = True
+            
+            loaded = [name for name, model in models.items() if model is not None and name != 'malaria']
+            summary = self.loader.summary()
+            print(f"[OK] Ensemble models {self.version} ready in {summary['total_seconds']:.2f}s "
+                  f"({summary['total_bytes'] / 1e6:.1f} MB)")
+            print(f"     Models: {', '.join(loaded)}")
+    
+    def members(self):
+        """Return (name, model) pairs of the loaded ensemble members that have a weight"""
+        self.ensure_loaded()
+        if self.weights is None or len(self.weights) == 0:
+            return []
         
-        FEATURE_COLUMNS = joblib.load('models/feature_columns.pkl')
-        DATA = pd.read_csv('malaria_master_dataset.csv')
-        print("[OK] Model and data loaded successfully")
+        return [(name, self.models[name])
+                for name in ['randomforest', 'gradientboosting', 'histgradientboosting', 'extratrees',
+                             'xgboost', 'lightgbm']
+                if self.models[name] is not None and name in self.weights]
+    
+    def info(self):
+        """Version details for /health and /admin/models"""
+        return {
+            'version': self.version,
+            'source': 'registry' if self.manifest is not None else 'legacy',
+            'directory': self.directory,
+            'ready': self.ready,
+            'features': len(self.feature_columns),
+            'feature_fingerprint': self.feature_fingerprint,
+            'feature_skew': self.feature_skew,
+            'fast_model': self.fast_model.description if self.fast_model is not None else None
+        }
+
+def open_model_bundle(version=None):
+    """Bundle for a registry version, or for the legacy models directory if version is None"""
+    if version is not None:
+        return ModelBundle(MODEL_REGISTRY.path(version), version, MODEL_REGISTRY.manifest(version))
+    
+    # Version the unversioned files by their size and modification time
+    legacy_version = artifact_version([
+        os.path.join(LEGACY_MODEL_DIR, name)
+        for name in sorted(os.listdir(LEGACY_MODEL_DIR)) if name.endswith('.pkl')
+    ])
+    return ModelBundle(LEGACY_MODEL_DIR, legacy_version)
+
+def ensure_models_loaded():
+    """Block until the active ensemble is loaded"""
+    ACTIVE_MODELS.ensure_loaded()
+
+def _load_in_background(bundle):
+    try:
+        bundle.ensure_loaded()
     except Exception as e:
         print(f"[ERROR] Error loading model: {e}")
-        raise
 
-def predict_ensemble(X_pred):
-    """Make prediction using advanced ensemble model if available, otherwise use single model"""
-    if ENSEMBLE_WEIGHTS is not None and len(ENSEMBLE_WEIGHTS) > 0:
-        # Use ensemble prediction
-        predictions = []
-        weights = []
+def load_model_and_data():
+    """Load trained ensemble models and historical data"""
+    global ACTIVE_MODELS, DATA, COUNTY_STORE, DATASET_VERSION, COUNTY_STATS, ALL_COUNTY_STATS
+    global DATASET_FEATURE_PARAMS
+    
+    try:
+        # Start reading the large model files in a thread pool; the data and
+        # small artifacts below load while they are in flight
+        bundle = open_model_bundle(MODEL_REGISTRY.current())
+        if MODEL_LOAD_MODE != 'lazy':
+            bundle.loader.start()
         
-        if RF_MODEL is not None and 'randomforest' in ENSEMBLE_WEIGHTS:
-            predictions.append(RF_MODEL.predict(X_pred)[0])
-            weights.append(ENSEMBLE_WEIGHTS['randomforest'])
+        # Memory-mapped typed columns, converted from the CSV on first use
+        dataset = load_dataset(DATASET_CSV)
+        DATA = dataset.frame
+        # Partition by county once so requests only touch one county's history
+        COUNTY_STORE = CountyStore(DATA, sort_order=dataset.sort_order)
+        # Materialize /county_stats responses so the endpoint is a lookup
+        COUNTY_STATS, ALL_COUNTY_STATS = build_county_stats(COUNTY_STORE, COUNTIES)
+        # Feature params for models trained before they were saved with the model
+        DATASET_FEATURE_PARAMS = fit_params(DATA)
         
-        if GB_MODEL is not None and 'gradientboosting' in ENSEMBLE_WEIGHTS:
-            predictions.append(GB_MODEL.predict(X_pred)[0])
-            weights.append(ENSEMBLE_WEIGHTS['gradientboosting'])
+        # Version the loaded artifacts and drop forecasts made with the old ones
+        ACTIVE_MODELS = bundle
+        DATASET_VERSION = dataset.version
+        FORECAST_CACHE.clear()
         
-        if ET_MODEL is not None and 'extratrees' in ENSEMBLE_WEIGHTS:
-            predictions.append(ET_MODEL.predict(X_pred)[0])
-            weights.append(ENSEMBLE_WEIGHTS['extratrees'])
+        if MODEL_LOAD_MODE == 'eager':
+            bundle.ensure_loaded()
+        elif MODEL_LOAD_MODE == 'background':
+            threading.Thread(target=_load_in_background, args=(bundle,), name='model-loader', daemon=True).start()
+        print(f"[OK] Model and data loaded successfully (models {bundle.version}, load mode: {MODEL_LOAD_MODE})")
+    except Exception as e:
+        print(f"[ERROR] Error loading model: {e}")
+        raise
+
+def swap_models(version):
+    """
+    Load a registry version completely, then make it the active bundle.
+    Requests already running keep the bundle they started with.
+    """
+    global ACTIVE_MODELS
+    
+    with MODEL_SWAP_LOCK:
+        if ACTIVE_MODELS.version == version:
+            return ACTIVE_MODELS
         
-        if XGB_MODEL is not None and 'xgboost' in ENSEMBLE_WEIGHTS:
-            predictions.append(XGB_MODEL.predict(X_pred)[0])
-            weights.append(ENSEMBLE_WEIGHTS['xgboost'])
+        MODEL_SWAP.update(state='loading', version=version, error=None)
+        try:
+            bundle = open_model_bundle(version)
+            if bundle.feature_skew:
+                raise RegistryError(f'{version} was trained on features {bundle.feature_fingerprint}, '
+                                    f'this service computes {FEATURE_FINGERPRINT}')
+            bundle.ensure_loaded()
+        except Exception as e:
+            MODEL_SWAP.update(state='failed', error=str(e))
+            print(f"[ERROR] Could not load model version {version}, keeping {ACTIVE_MODELS.version}: {e}")
+            raise
         
-        if LGB_MODEL is not None and 'lightgbm' in ENSEMBLE_WEIGHTS:
-            predictions.append(LGB_MODEL.predict(X_pred)[0])
-            weights.append(ENSEMBLE_WEIGHTS['lightgbm'])
+        previous = ACTIVE_MODELS
+        ACTIVE_MODELS = bundle
+        # Cached forecasts are keyed by version; forecast workers hold the old models
+        FORECAST_CACHE.clear()
+        reset_forecast_pool()
+        MODEL_SWAP.update(state='idle', swapped_at=datetime.now().isoformat())
+        print(f"[OK] Swapped models {previous.version} -> {version}")
+        return bundle
+
+def _swap_in_background(version):
+    try:
+        swap_models(version)
+    except Exception:
+        pass  # Reported in MODEL_SWAP and the log
+
+def _watch_registry():
+    """Swap in each newly promoted version; a version that failed to load is not retried"""
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            version = MODEL_REGISTRY.current()
+        except OSError as e:
+            print(f"[WARN] Could not read the model registry: {e}")
+            continue
+        if version is None or version == ACTIVE_MODELS.version:
+            continue
+        if MODEL_SWAP['state'] == 'failed' and MODEL_SWAP['version'] == version:
+            continue
+        _swap_in_background(version)
+
+def start_model_watcher():
+    """Start the registry watcher in this process (threads do not survive a gunicorn fork)"""
+    global MODEL_WATCHER_PID
+    
+    if MODEL_WATCH_INTERVAL <= 0 or MODEL_WATCHER_PID == os.getpid():
+        return
+    with MODEL_SWAP_LOCK:
+        if MODEL_WATCHER_PID == os.getpid():
+            return
+        MODEL_WATCHER_PID = os.getpid()
+    threading.Thread(target=_watch_registry, name='model-watcher', daemon=True).start()
+
+def predict_ensemble_batch(X_batch, bundle=None, fast=False, stages=None):
+    """
+    Predict an N x F feature matrix with the ensemble.
+    Each member model is called once over all rows and the results are
+    blended with a single weighted matrix-vector product. fast uses the
+    bundle's fast model when it has one. Member calls are timed for
+    /metrics, and the predict and blend stages into stages if given.
+    """
+    bundle = bundle or ACTIVE_MODELS
+    stages = stages or StageTimer()
+    if fast:
+        bundle.ensure_loaded()
+        if bundle.fast_model is not None:
+            with stages('predict'), MODEL_SECONDS.time(model='fast', backend='fast'):
+                return bundle.fast_model.predict(X_batch)
+    members = bundle.members()
+    if len(members) > 0:
+        with stages('predict'):
+            compiled = {}
+            if bundle.compiled is not None and len(X_batch) <= COMPILED_MAX_ROWS:
+                with MODEL_SECONDS.time(model='+'.join(bundle.compiled.names), backend='compiled'):
+                    compiled = dict(zip(bundle.compiled.names, bundle.compiled.predict(X_batch)))
+            member_predictions = []
+            for name, model in members:
+                if name not in compiled:
+                    with MODEL_SECONDS.time(model=name, backend='sklearn'):
+                        compiled[name] = np.asarray(model.predict(X_batch), dtype=float)
+                member_predictions.append(compiled[name])
         
-        if len(predictions) > 0:
+        with stages('blend'):
+            # (n_models, n_rows) matrix of member predictions
+            predictions = np.vstack(member_predictions)
+            weights = np.array([bundle.weights[name] for name, _ in members], dtype=float)
             # Normalize weights
-            total_weight = sum(weights)
-            ensemble_pred = sum(w/total_weight * p for w, p in zip(weights, predictions))
-            return ensemble_pred
+            weights = weights / weights.sum()
+            return weights @ predictions
     
     # Fallback to single model
-    return MODEL.predict(X_pred)[0]
+    with stages('predict'), MODEL_SECONDS.time(model='malaria', backend='sklearn'):
+        return np.asarray(bundle.model.predict(X_batch), dtype=float)
 
 # Load on app start
 load_model_and_data()
 
+@app.before_request
+def start_background_threads():
+    # Started lazily so each gunicorn worker runs its own watcher after the fork
+    start_model_watcher()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' in g:
+        endpoint = metrics_endpoint()
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=endpoint, method=request.method)
+        REQUEST_COUNT.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        METRICS.flush()
+    return response
+
+def metrics_endpoint():
+    """Endpoint label for metrics: the Flask endpoint of the request, 'background' outside one"""
+    if not has_request_context():
+        return 'background'
+    # Unmatched URLs share one label so scanners cannot create unbounded series
+    return request.endpoint or 'unmatched'
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: request counts and latencies, stage and model timings, upload throughput"""
+    return Response(METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint - returns 503 until the ensemble has loaded"""
+    # In lazy mode the models only load on first use, so the service is ready to take it
+    bundle = ACTIVE_MODELS
+    ready = bundle.ready or MODEL_LOAD_MODE == 'lazy'
     return jsonify({
-        'status': 'healthy',
-        'model_loaded': MODEL is not None,
-        'data_loaded': DATA is not None
-    })
+        'status': 'healthy' if ready else 'loading',
+        'ready': ready,
+        'model_load_mode': MODEL_LOAD_MODE,
+        'model_loaded': bundle.model is not None,
+        'data_loaded': DATA is not None,
+        'model_version': bundle.version,
+        'model_source': bundle.info()['source'],
+        'model_swap': dict(MODEL_SWAP),
+        'dataset_version': DATASET_VERSION,
+        'artifacts': bundle.loader.summary(),
+        'forecast_cache': FORECAST_CACHE.stats(),
+        'inference_backend': INFERENCE_BACKEND,
+        'compiled_ensemble': bundle.compiled.summary() if bundle.compiled is not None else None,
+        'fast_model': {
+            'endpoints': sorted(FAST_MODEL_ENDPOINTS),
+            'model': bundle.info()['fast_model']
+        },
+        'feature_pipeline': {
+            'serving': FEATURE_FINGERPRINT,
+            'model': bundle.feature_fingerprint,
+            'skew': bundle.feature_skew
+        },
+        'chat_sessions': chatbot.sessions.stats(),
+        'jobs': JOB_QUEUE.stats()
+    }), 200 if ready else 503
 
 @app.route('/counties', methods=['GET'])
 def get_counties():
@@ -206,285 +599,137 @@ def get_counties():
         'count': len(COUNTIES)
     })
 
+def county_stats(county):
+    """Precomputed statistics for one county; raises PredictionError if unknown"""
+    if county not in COUNTIES:
+        raise PredictionError(f'County {county} not found', status=404)
+    
+    stats = COUNTY_STATS.get(county)
+    if stats is None:
+        raise PredictionError(f'No data available for {county}', status=404)
+    return stats
+
 @app.route('/county_stats', methods=['GET'])
 def get_county_stats():
     """Get statistics for a specific county or all counties"""
     county = request.args.get('county')
     
-    if county and county not in COUNTIES:
-        return jsonify({'error': f'County {county} not found'}), 404
-    
     if county:
-        county_data = DATA[DATA['county'] == county].copy()
-        county_data = county_data.sort_values(['year', 'month'])
-        
-        # Find peak month
-        peak_row = county_data.loc[county_data['cases'].idxmax()]
-        month_names = ['', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        peak_month = f"{month_names[int(peak_row['month'])]} {int(peak_row['year'])}"
-        
-        # Get recent cases (last 6 months) - ensure unique months
-        recent_cases = []
-        # Group by year-month and get the last 6 unique months
-        county_data['year_month'] = county_data['year'].astype(str) + '-' + county_data['month'].astype(str).str.zfill(2)
-        # Get unique year-month combinations, sorted, then take last 6
-        unique_months = county_data.drop_duplicates(subset=['year_month'], keep='last').sort_values(['year', 'month']).tail(6)
-        
-        # If we don't have 6 unique months, generate sequential months from the last available date
-        if len(unique_months) < 6:
-            last_row = county_data.iloc[-1]
-            last_year = int(last_row['year'])
-            last_month = int(last_row['month'])
-            
-            # Generate last 6 months going backwards
-            for i in range(5, -1, -1):  # 5 months back to current month
-                month = last_month - i
-                year = last_year
-                
-                # Handle year rollover
-                while month < 1:
-                    month += 12
-                    year -= 1
-                
-                # Find matching data or use average
-                matching_data = county_data[(county_data['year'] == year) & (county_data['month'] == month)]
-                if len(matching_data) > 0:
-                    row = matching_data.iloc[-1]  # Take last if multiple
-                    cases = int(row['cases'])
-                else:
-                    # Use average if no data for this month
-                    cases = int(county_data['cases'].mean())
-                
-                recent_cases.append({
-                    'date': f"{month_names[month]} {year}",
-                    'cases': cases,
-                    'year': year,
-                    'month': month
-                })
-        else:
-            # Use the unique months we found
-            for _, row in unique_months.iterrows():
-                recent_cases.append({
-                    'date': f"{month_names[int(row['month'])]} {int(row['year'])}",
-                    'cases': int(row['cases']),
-                    'year': int(row['year']),
-                    'month': int(row['month'])
-                })
-        
-        # Ensure we have exactly 6 months, sorted chronologically
-        recent_cases = sorted(recent_cases, key=lambda x: (x['year'], x['month']))[-6:]
-        
-        avg_cases = round(county_data['cases'].mean(), 2)
-        
-        stats = {
-            'county': county,
-            'total_cases': int(county_data['cases'].sum()),
-            'average_monthly_cases': avg_cases,
-            'avg_cases': avg_cases,  # Alias for frontend compatibility
-            'max_cases': int(county_data['cases'].max()),
-            'min_cases': int(county_data['cases'].min()),
-            'latest_month_cases': int(county_data.iloc[-1]['cases']),
-            'average_rate_per_100k': round(county_data['rate_per_100k'].mean(), 2),
-            'peak_month': peak_month,
-            'recent_cases': recent_cases,
-            'data_points': len(county_data),
-            'date_range': {
-                'start': str(county_data['date'].min()),
-                'end': str(county_data['date'].max())
-            }
-        }
-        
-        return jsonify(stats)
+        try:
+            return jsonify(county_stats(county))
+        except PredictionError as e:
+            return jsonify({'error': str(e)}), e.status
     else:
         # Return stats for all counties
-        all_stats = []
-        for county_name in COUNTIES:
-            county_data = DATA[DATA['county'] == county_name]
-            all_stats.append({
-                'county': county_name,
-                'average_monthly_cases': round(county_data['cases'].mean(), 2),
-                'total_cases': int(county_data['cases'].sum()),
-                'average_rate_per_100k': round(county_data['rate_per_100k'].mean(), 2)
-            })
-        
-        return jsonify({
-            'counties': all_stats,
-            'total_counties': len(all_stats)
-        })
+        return jsonify(ALL_COUNTY_STATS)
 
-@app.route('/predict_regional', methods=['POST'])
-def predict_regional():
-    """
-    Predict malaria cases for a specific county
+def _forecast_environment(county, pred_month, uniform):
+    """Estimated rainfall, temperature and humidity of a forecast month"""
+    # Estimate environmental conditions based on seasonality
+    if pred_month in [3, 4, 5]:  # Long rains
+        rainfall = uniform(150, 200)
+        temp_factor = 1.0
+    elif pred_month in [10, 11]:  # Short rains
+        rainfall = uniform(100, 150)
+        temp_factor = 1.0
+    else:  # Dry season
+        rainfall = uniform(30, 60)
+        temp_factor = 0.95
     
-    Request body:
-    {
-        "county": "Nairobi",
-        "months_ahead": 6
-    }
-    """
-    try:
-        data = request.get_json()
-        county = data.get('county')
-        months_ahead = data.get('months_ahead', 6)
+    # Base temperature varies by county
+    if county in ['Mombasa', 'Kilifi', 'Kwale']:
+        base_temp = 28
+    elif county in ['Nyeri', 'Eldoret']:
+        base_temp = 18
+    else:
+        base_temp = 24
+    
+    temperature = base_temp * temp_factor
+    humidity = 50 + (rainfall / 5)
+    return rainfall, temperature, humidity
+
+class CountyForecastRun:
+    """Recursive forecast state of one county while it is being forecast"""
+    
+    def __init__(self, county, feature_columns, feature_params):
+        self.county = county
+        self.feature_columns = feature_columns
+        history = COUNTY_STORE.get(county)
         
-        if not county:
-            return jsonify({'error': 'County is required'}), 400
+        # Get the last available date
+        last_row = history.last
+        self.last_year = int(last_row['year'])
+        self.last_month = int(last_row['month'])
         
-        if county not in COUNTIES:
-            return jsonify({'error': f'County {county} not found'}), 404
+        # Environmental inputs are drawn from a generator seeded by county and
+        # forecast origin so cached and recomputed forecasts agree
+        if FORECAST_DETERMINISTIC:
+            rng = np.random.default_rng(zlib.crc32(f"{county}:{self.last_year}-{self.last_month:02d}".encode()))
+            self.uniform = rng.uniform
+        else:
+            self.uniform = np.random.uniform
         
-        if months_ahead < 1 or months_ahead > 12:
-            return jsonify({'error': 'months_ahead must be between 1 and 12'}), 400
+        # Incremental feature state for the recursive forecast
+        self.forecaster = RegionalForecaster(county, history, feature_params)
+        self.predictions = []
+        self.pending = None
+    
+    def next_row(self):
+        """Feature row of the next forecast month"""
+        i = len(self.predictions) + 1
         
-        # Get historical data for the county
-        county_data = DATA[DATA['county'] == county].copy()
-        county_data = county_data.sort_values(['year', 'month'])
+        # Calculate prediction date
+        pred_month = self.last_month + i
+        pred_year = self.last_year
         
-        # Get the last available date
-        last_row = county_data.iloc[-1]
-        last_year = int(last_row['year'])
-        last_month = int(last_row['month'])
+        if pred_month > 12:
+            pred_year += (pred_month - 1) // 12
+            pred_month = ((pred_month - 1) % 12) + 1
         
-        predictions = []
+        rainfall, temperature, humidity = _forecast_environment(self.county, pred_month, self.uniform)
+        self.pending = (pred_year, pred_month, rainfall, temperature, humidity)
         
-        # Import advanced feature engineering
-        try:
-            from feature_engineering import create_advanced_features
-        except ImportError:
-            # Fallback to basic feature engineering
-            def create_advanced_features(df):
-                df = df.copy()
-                df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-                df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-                for lag in [1, 2, 3, 6, 12]:
-                    if f'cases_lag_{lag}' not in df.columns:
-                        df[f'cases_lag_{lag}'] = df['cases'].mean() if 'cases' in df.columns else 0
-                return df.fillna(0)
-        
-        for i in range(1, months_ahead + 1):
-            # Calculate prediction date
-            pred_month = last_month + i
-            pred_year = last_year
-            
-            if pred_month > 12:
-                pred_year += (pred_month - 1) // 12
-                pred_month = ((pred_month - 1) % 12) + 1
-            
-            # Estimate environmental conditions based on seasonality
-            if pred_month in [3, 4, 5]:  # Long rains
-                rainfall = np.random.uniform(150, 200)
-                temp_factor = 1.0
-            elif pred_month in [10, 11]:  # Short rains
-                rainfall = np.random.uniform(100, 150)
-                temp_factor = 1.0
-            else:  # Dry season
-                rainfall = np.random.uniform(30, 60)
-                temp_factor = 0.95
-            
-            # Base temperature varies by county
-            if county in ['Mombasa', 'Kilifi', 'Kwale']:
-                base_temp = 28
-            elif county in ['Nyeri', 'Eldoret']:
-                base_temp = 18
-            else:
-                base_temp = 24
-            
-            temperature = base_temp * temp_factor
-            humidity = 50 + (rainfall / 5)
-            
-            # Create prediction row
-            pred_row = {
-                'county': county,
-                'year': pred_year,
-                'month': pred_month,
-                'rainfall_mm': rainfall,
-                'temperature_celsius': temperature,
-                'humidity_percent': humidity,
-                'cases': 0  # Placeholder
-            }
-            
-            # Add to county_data for feature engineering
-            pred_df = pd.concat([county_data, pd.DataFrame([pred_row])], ignore_index=True)
-            pred_df = pred_df.sort_values(['year', 'month'])
-            
-            # Use advanced feature engineering
-            pred_df = create_advanced_features(pred_df)
-            
-            # One-hot encoding for county
-            pred_df = pd.get_dummies(pred_df, columns=['county'], prefix='county')
-            
-            # Get the last row (prediction row)
-            last_pred_row = pred_df.iloc[-1:].copy()
-            
-            # Ensure all feature columns exist
-            for col in FEATURE_COLUMNS:
-                if col not in last_pred_row.columns:
-                    last_pred_row[col] = 0
-            
-            # Select only model features
-            X_pred = last_pred_row[FEATURE_COLUMNS].copy()
-            
-            # Fill NaN values with appropriate defaults
-            # For lagged features, use the mean of historical cases
-            for col in X_pred.columns:
-                if X_pred[col].isna().any():
-                    if 'lag' in col.lower():
-                        # Use mean of historical cases for lagged features
-                        hist_mean = county_data['cases'].mean() if len(county_data) > 0 else 0
-                        X_pred[col] = X_pred[col].fillna(hist_mean)
-                    else:
-                        # Use 0 for other missing features
-                        X_pred[col] = X_pred[col].fillna(0)
-            
-            # Replace inf values
-            X_pred = X_pred.replace([np.inf, -np.inf], 0)
-            
-            # Make prediction using ensemble
-            predicted_cases = max(0, int(predict_ensemble(X_pred)))
-            
-            # Update the prediction in county_data for next iteration
-            pred_row['cases'] = predicted_cases
-            county_data = pd.concat([county_data, pd.DataFrame([pred_row])], ignore_index=True)
-            
-            # Calculate historical average for comparison
-            historical_avg = county_data[
-                (county_data['month'] == pred_month) & 
-                (county_data['year'] < pred_year)
-            ]['cases'].mean()
-            
-            # Determine risk level based on predicted cases
-            if predicted_cases > 200:
-                risk_level = 'High'
-            elif predicted_cases > 100:
-                risk_level = 'Moderate'
-            else:
-                risk_level = 'Low'
-            
-            # Format month name
-            month_names = ['', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-            month_name = f"{month_names[pred_month]} {pred_year}"
-            
-            predictions.append({
-                'month': month_name,
-                'month_num': pred_month,
-                'year': pred_year,
-                'date': f"{pred_year}-{pred_month:02d}-01",
-                'predicted_cases': predicted_cases,
-                'predicted_rate_per_100k': predicted_cases,  # Normalized
-                'risk_level': risk_level,
-                'historical_average': round(historical_avg, 2) if not np.isnan(historical_avg) else None,
-                'environmental_factors': {
-                    'rainfall_mm': round(rainfall, 2),
-                    'temperature_celsius': round(temperature, 2),
-                    'humidity_percent': round(humidity, 2)
-                }
-            })
+        # Build the feature row for the predicted month from the current state
+        return self.forecaster.feature_row(self.feature_columns, pred_year, pred_month, rainfall, temperature, humidity)
+    
+    def commit(self, prediction):
+        """Record the ensemble prediction of the month from next_row()"""
+        pred_year, pred_month, rainfall, temperature, humidity = self.pending
+        predicted_cases = max(0, int(prediction))
+        
+        # Calculate historical average for comparison
+        historical_avg = self.forecaster.historical_average(pred_month)
+        
+        # Update the state with the prediction for the next iteration
+        self.forecaster.append(pred_year, pred_month, predicted_cases, rainfall, temperature, humidity)
+        
+        # Determine risk level based on predicted cases
+        if predicted_cases > 200:
+            risk_level = 'High'
+        elif predicted_cases > 100:
+            risk_level = 'Moderate'
+        else:
+            risk_level = 'Low'
         
-        # Get historical context
-        recent_history = county_data.tail(6)[['year', 'month', 'cases']].to_dict('records')
+        self.predictions.append({
+            'month': f"{MONTH_NAMES[pred_month]} {pred_year}",
+            'month_num': pred_month,
+            'year': pred_year,
+            'date': f"{pred_year}-{pred_month:02d}-01",
+            'predicted_cases': predicted_cases,
+            'predicted_rate_per_100k': predicted_cases,  # Normalized
+            'risk_level': risk_level,
+            'historical_average': round(historical_avg, 2) if not np.isnan(historical_avg) else None,
+            'environmental_factors': {
+                'rainfall_mm': round(rainfall, 2),
+                'temperature_celsius': round(temperature, 2),
+                'humidity_percent': round(humidity, 2)
+            }
+        })
+    
+    def payload(self):
+        """The /predict_regional response for this county"""
+        predictions = self.predictions
         
         # Calculate summary statistics
         if predictions:
@@ -508,22 +753,255 @@ def predict_regional():
                 'trend': 'Stable'
             }
         
-        return jsonify({
-            'county': county,
+        return {
+            'county': self.county,
             'predictions': predictions,
-            'months_predicted': months_ahead,
-            'recent_history': recent_history,
+            'months_predicted': len(predictions),
+            'recent_history': self.forecaster.recent_history(),
             'summary': summary,
             'model_info': {
                 'model_type': 'RandomForest Regression',
-                'features_used': len(FEATURE_COLUMNS),
-                'training_data_end': f"{last_year}-{last_month:02d}"
+                'features_used': len(self.feature_columns),
+                'training_data_end': f"{self.last_year}-{self.last_month:02d}"
+            }
+        }
+
+def forecast_counties(counties, months_ahead, fast=False, endpoint=None):
+    """
+    Run the recursive ensemble forecasts of several counties in lockstep:
+    step t of every county is scored in one ensemble call (the fast model's
+    with fast). Returns the response payload of each county keyed by county.
+    endpoint labels the stage timings (default: the current request's).
+    """
+    bundle = ACTIVE_MODELS
+    feature_params = bundle.feature_params or DATASET_FEATURE_PARAMS
+    stages = StageTimer()
+    with stages('history'):
+        runs = [CountyForecastRun(county, bundle.feature_columns, feature_params) for county in counties]
+    
+    for _ in range(months_ahead):
+        with stages('features'):
+            rows = [run.next_row() for run in runs]
+        if not rows:
+            break
+        with stages('matrix'):
+            batch = feature_matrix(rows, bundle.feature_columns)
+        predictions = predict_ensemble_batch(batch, bundle, fast=fast, stages=stages)
+        with stages('commit'):
+            for run, prediction in zip(runs, predictions):
+                run.commit(prediction)
+    
+    with stages('payload'):
+        payloads = {run.county: run.payload() for run in runs}
+    stages.observe(STAGE_SECONDS, endpoint=endpoint or metrics_endpoint())
+    return payloads
+
+def forecast_county(county, months_ahead, fast=False):
+    """Run the recursive ensemble forecast for a county and build the response payload"""
+    return forecast_counties([county], months_ahead, fast=fast)[county]
+
+def _forecast_shard(counties, months_ahead, endpoint):
+    """
+    forecast_counties in a forecast pool process. Returns the payloads and
+    the metrics recorded for them, which the pool's owner merges into its own
+    """
+    payloads = forecast_counties(counties, months_ahead, endpoint=endpoint)
+    return payloads, METRICS.collect()
+
+def _forecast_pool():
+    """Process pool for forecast_all, created in (and owned by) the current process"""
+    global FORECAST_POOL, FORECAST_POOL_PID
+    
+    with FORECAST_POOL_LOCK:
+        if FORECAST_POOL is None or FORECAST_POOL_PID != os.getpid():
+            # fork so the workers inherit the loaded models instead of reloading them
+            FORECAST_POOL = ProcessPoolExecutor(
+                max_workers=FORECAST_PROCESSES,
+                mp_context=multiprocessing.get_context('fork')
+            )
+            FORECAST_POOL_PID = os.getpid()
+        return FORECAST_POOL
+
+def reset_forecast_pool():
+    """Shut the forecast pool down; the next forecast_all forks fresh workers"""
+    global FORECAST_POOL
+    
+    with FORECAST_POOL_LOCK:
+        if FORECAST_POOL is not None and FORECAST_POOL_PID == os.getpid():
+            FORECAST_POOL.shutdown(wait=False, cancel_futures=True)
+        FORECAST_POOL = None
+
+def forecast_all(counties, months_ahead):
+    """
+    Forecast many counties, split into one shard per forecast process. Each
+    shard runs forecast_counties, so rows are still batched per step.
+    """
+    # Small requests are not worth the inter-process round trip
+    processes = min(FORECAST_PROCESSES, len(counties) // MIN_COUNTIES_PER_PROCESS)
+    if processes <= 1:
+        return forecast_counties(counties, months_ahead)
+    
+    shards = [counties[i::processes] for i in range(processes)]
+    
+    # Workers must be forked after the ensemble has loaded
+    ensure_models_loaded()
+    try:
+        pool = _forecast_pool()
+        endpoint = metrics_endpoint()
+        futures = [pool.submit(_forecast_shard, shard, months_ahead, endpoint) for shard in shards]
+        results = {}
+        for future in futures:
+            payloads, shard_metrics = future.result()
+            results.update(payloads)
+            METRICS.merge(shard_metrics)
+        return results
+    except BrokenProcessPool as e:
+        print(f"[WARN] Forecast pool failed ({e}), forecasting in-process")
+        reset_forecast_pool()
+        return forecast_counties(counties, months_ahead)
+
+def forecast_cache_key(county, months_ahead, fast=False):
+    """Cache key covering everything a forecast depends on"""
+    return (county, months_ahead, ACTIVE_MODELS.version, DATASET_VERSION, fast)
+
+def regional_forecast(county, months_ahead=6, fast=False):
+    """
+    Validated, cached county forecast shared by /predict_regional and the
+    chatbot; raises PredictionError for invalid requests. fast forecasts
+    with the fast model (FAST_MODEL_ENDPOINTS)
+    """
+    if not county:
+        raise PredictionError('County is required', status=400)
+    
+    if county not in COUNTIES:
+        raise PredictionError(f'County {county} not found', status=404)
+    
+    if months_ahead < 1 or months_ahead > 12:
+        raise PredictionError('months_ahead must be between 1 and 12', status=400)
+    
+    if not FORECAST_DETERMINISTIC:
+        # Random environmental inputs make results unrepeatable, so skip the cache
+        return forecast_county(county, months_ahead, fast=fast)
+    
+    cache_key = forecast_cache_key(county, months_ahead, fast)
+    result = FORECAST_CACHE.get(cache_key)
+    if result is None:
+        result = forecast_county(county, months_ahead, fast=fast)
+        FORECAST_CACHE.put(cache_key, result)
+    return result
+
+@app.route('/predict_regional', methods=['POST'])
+def predict_regional():
+    """
+    Predict malaria cases for a specific county
+    
+    Request body:
+    {
+        "county": "Nairobi",
+        "months_ahead": 6
+    }
+    """
+    try:
+        data = request.get_json()
+        result = regional_forecast(data.get('county'), data.get('months_ahead', 6),
+                                   fast='predict_regional' in FAST_MODEL_ENDPOINTS)
+        return jsonify(result)
+    
+    except PredictionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict_all', methods=['GET', 'POST'])
+def predict_all():
+    """
+    Forecast every county (or a list of counties) at once
+    
+    Request body (optional, or ?months_ahead=6 for GET):
+    {
+        "months_ahead": 6,
+        "counties": ["Kisumu", "Nairobi"]
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        months_ahead = data.get('months_ahead', request.args.get('months_ahead', 6, type=int))
+        counties = data.get('counties') or COUNTIES
+        
+        if months_ahead < 1 or months_ahead > 12:
+            return jsonify({'error': 'months_ahead must be between 1 and 12'}), 400
+        
+        unknown = [county for county in counties if county not in COUNTIES]
+        if unknown:
+            return jsonify({'error': f'Counties not found: {", ".join(unknown)}'}), 404
+        
+        start = datetime.now()
+        available = [county for county in counties if county in COUNTY_STORE]
+        
+        # Serve what is cached and forecast only the rest
+        forecasts = {}
+        if FORECAST_DETERMINISTIC:
+            for county in available:
+                cached = FORECAST_CACHE.get(forecast_cache_key(county, months_ahead))
+                if cached is not None:
+                    forecasts[county] = cached
+        missing = [county for county in available if county not in forecasts]
+        
+        if missing:
+            computed = forecast_all(missing, months_ahead)
+            if FORECAST_DETERMINISTIC:
+                for county, result in computed.items():
+                    FORECAST_CACHE.put(forecast_cache_key(county, months_ahead), result)
+            forecasts.update(computed)
+        
+        ordered = [forecasts[county] for county in available]
+        return jsonify({
+            'months_predicted': months_ahead,
+            'total_counties': len(ordered),
+            'forecasts': ordered,
+            'unavailable_counties': [county for county in counties if county not in COUNTY_STORE],
+            'national_summary': {
+                'total_predicted_cases': sum(f['summary']['total_predicted_cases'] for f in ordered),
+                'high_risk_counties': [f['county'] for f in ordered
+                                       if any(p['risk_level'] == 'High' for p in f['predictions'])],
+                'counties_forecast': len(missing),
+                'counties_from_cache': len(ordered) - len(missing),
+                'forecast_processes': max(1, min(FORECAST_PROCESSES, len(missing) // MIN_COUNTIES_PER_PROCESS)) if missing else 0,
+                'elapsed_seconds': round((datetime.now() - start).total_seconds(), 3)
             }
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# The chatbot calls the forecasting functions in-process, so /chat never waits
+# on another request to this server. PREDICTION_SERVICE_URL points it at a
+# separate ml-service over HTTP instead
+PREDICTION_SERVICE_URL = os.environ.get('PREDICTION_SERVICE_URL')
+if PREDICTION_SERVICE_URL:
+    prediction_service = HTTPPredictionService(PREDICTION_SERVICE_URL)
+else:
+    prediction_service = LocalPredictionService(
+        functools.partial(regional_forecast, fast='chat' in FAST_MODEL_ENDPOINTS), county_stats
+    )
+
+# Chat sessions, keyed by the sender of each /chat message:
+#   memory - LRU in this process (default)
+#   sqlite - file shared by all workers on the host (CHAT_SESSION_DB)
+CHAT_SESSION_BACKEND = os.environ.get('CHAT_SESSION_BACKEND', 'memory')
+CHAT_SESSION_MAX = int(os.environ.get('CHAT_SESSION_MAX', 10000))
+CHAT_SESSION_TTL = int(os.environ.get('CHAT_SESSION_TTL', 1800))
+if CHAT_SESSION_BACKEND == 'sqlite':
+    chat_sessions = SQLiteSessionStore(
+        os.environ.get('CHAT_SESSION_DB', 'sessions.db'),
+        max_sessions=CHAT_SESSION_MAX,
+        ttl_seconds=CHAT_SESSION_TTL
+    )
+else:
+    chat_sessions = MemorySessionStore(max_sessions=CHAT_SESSION_MAX, ttl_seconds=CHAT_SESSION_TTL)
+
+chatbot = KilmalariaAI(prediction_service, chat_sessions)
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
@@ -538,12 +1016,13 @@ def chat():
     try:
         data = request.get_json()
         message = data.get('message', '')
+        sender = data.get('sender')
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Get response from chatbot
-        response = chatbot.chat(message)
+        # Get response from chatbot within the sender's conversation
+        response = chatbot.chat(message, sender=sender)
         
         return jsonify({
             'response': response,
@@ -553,6 +1032,533 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Values used for missing climate/date cells of uploaded rows
+UPLOAD_DEFAULTS = {'temperature': 25.0, 'rainfall': 100.0, 'humidity': 65.0, 'month': 6, 'year': 2024}
+# Case lags of the county's history used as upload features
+UPLOAD_CASE_LAGS = [1, 2, 3, 6]
+
+def _upload_county_features(county):
+    """Lag and population features of a county's history, None for an unknown county"""
+    history = COUNTY_STORE.get(county)
+    if history is None:
+        return None
+    
+    county_cases = history.column('cases')
+    features = {f'cases_lag_{lag}': county_cases[-lag] if len(county_cases) >= lag else county_cases.mean()
+                for lag in UPLOAD_CASE_LAGS}
+    if 'population' in history.arrays and len(history) > 0:
+        features['population'] = history.column('population')[-1]
+    else:
+        features['population'] = 100000  # Default population
+    return features
+
+def prepare_upload_rows(df):
+    """
+    Parse and validate uploaded rows and build the feature frame of every row
+    whose county is known, with column operations over the whole chunk.
+    Returns (parsed_rows, feature_df); the feature_index of a parsed row is
+    its row in feature_df (None for an unknown county).
+    """
+    county = df['county'].astype(str).str.strip().where(df['county'].notna(), '')
+    valid = county != ''
+    for idx in df.index[~valid]:
+        print(f"Skipping row {idx}: Missing county name")
+    
+    # Missing values get defaults; values that are present but not numbers skip the row
+    values = {}
+    for column, default in UPLOAD_DEFAULTS.items():
+        numeric = pd.to_numeric(df[column], errors='coerce')
+        invalid = valid & df[column].notna() & numeric.isna()
+        for idx in df.index[invalid]:
+            print(f"Skipping row {idx}: Invalid {column} {df.at[idx, column]!r}")
+        valid &= ~invalid
+        values[column] = numeric.fillna(default)
+    
+    month = np.trunc(values['month']).astype(int)
+    year = np.trunc(values['year']).astype(int)
+    
+    # Validate ranges
+    bad_month = valid & ((month < 1) | (month > 12))
+    for idx in df.index[bad_month]:
+        print(f"Warning: Invalid month {month[idx]} in row {idx}, using 6")
+    bad_year = valid & ((year < 2000) | (year > 2100))
+    for idx in df.index[bad_year]:
+        print(f"Warning: Invalid year {year[idx]} in row {idx}, using 2024")
+    
+    parsed = pd.DataFrame({
+        'idx': df.index,
+        'county': county,
+        'temperature': values['temperature'].astype(float),
+        'rainfall': values['rainfall'].astype(float),
+        'humidity': values['humidity'].astype(float),
+        'month': month.mask(bad_month, 6),
+        'year': year.mask(bad_year, 2024)
+    }, index=df.index)[valid]
+    
+    # History features once per county, not per row
+    county_features = {}
+    for name in parsed['county'].unique():
+        features = _upload_county_features(name)
+        if features is None:
+            # If county not found, use default values
+            print(f"Warning: County '{name}' not found in database, using default values")
+        else:
+            county_features[name] = features
+    
+    known = parsed['county'].isin(county_features).to_numpy()
+    feature_df = pd.DataFrame.from_dict(county_features, orient='index').reindex(parsed['county'][known])
+    feature_df.index = pd.RangeIndex(len(feature_df))
+    for column in ['temperature', 'rainfall', 'humidity', 'month']:
+        feature_df[column] = parsed[column].to_numpy()[known]
+    
+    population = {name: features['population'] for name, features in county_features.items()}
+    parsed['population'] = parsed['county'].map(population).fillna(100000)  # Default population
+    parsed['feature_index'] = np.where(known, np.cumsum(known) - 1, None)
+    
+    return parsed.to_dict('records'), feature_df
+
+def score_upload_rows(parsed_rows, feature_df, stages=None):
+    """Score parsed upload rows with one batched ensemble call and build the per-row reports"""
+    stages = stages or StageTimer()
+    # Score all rows with one call per ensemble member
+    if len(feature_df) > 0:
+        # Add any missing features with default values, in training column order
+        bundle = ACTIVE_MODELS
+        with stages('matrix'):
+            feature_df = feature_df.reindex(columns=bundle.feature_columns, fill_value=0)
+        batch_predictions = predict_ensemble_batch(feature_df, bundle, stages=stages)
+    else:
+        batch_predictions = np.array([])
+    
+    # Build the detailed report for each row
+    predictions = []
+    
+    for parsed in parsed_rows:
+        idx = parsed['idx']
+        county = parsed['county']
+        try:
+            temperature = parsed['temperature']
+            rainfall = parsed['rainfall']
+            humidity = parsed['humidity']
+            month = parsed['month']
+            year = parsed['year']
+            population = parsed['population']
+            
+            if parsed['feature_index'] is None:
+                predicted_cases = 0
+                risk_level = 'Unknown County'
+            else:
+                predicted_cases = max(0, batch_predictions[parsed['feature_index']])
+                
+                # Determine risk level
+                if predicted_cases > 200:
+                    risk_level = 'High'
+                elif predicted_cases > 100:
+                    risk_level = 'Moderate'
+                else:
+                    risk_level = 'Low'
+            
+            # Calculate epidemiological metrics (population already set above)
+            incidence_rate = (predicted_cases / population) * 100000  # per 100,000 population
+            
+            # WHO Severity Classification
+            if incidence_rate > 500:
+                who_severity = 'Epidemic Threshold'
+                clinical_priority = 'Emergency Response Required'
+                intervention_level = 'Level 4 - Emergency'
+            elif incidence_rate > 300:
+                who_severity = 'Very High Transmission'
+                clinical_priority = 'Immediate Action Required'
+                intervention_level = 'Level 3 - Urgent'
+            elif incidence_rate > 100:
+                who_severity = 'High Transmission'
+                clinical_priority = 'Enhanced Surveillance'
+                intervention_level = 'Level 2 - Heightened'
+            elif incidence_rate > 50:
+                who_severity = 'Moderate Transmission'
+                clinical_priority = 'Routine Monitoring'
+                intervention_level = 'Level 1 - Standard'
+            else:
+                who_severity = 'Low Transmission'
+                clinical_priority = 'Baseline Surveillance'
+                intervention_level = 'Level 0 - Maintenance'
+            
+            # Calculate disease burden metrics
+            estimated_mortality = predicted_cases * 0.003  # 0.3% case fatality rate (Kenya average)
+            estimated_severe_cases = predicted_cases * 0.15  # 15% severe malaria
+            estimated_hospitalizations = predicted_cases * 0.25  # 25% require hospitalization
+            
+            # Vector control recommendations
+            if rainfall > 150 and temperature > 25:
+                vector_control = 'High Priority: Indoor Residual Spraying (IRS) + LLIN distribution + Larviciding'
+            elif rainfall > 100:
+                vector_control = 'Moderate Priority: LLIN distribution + Larviciding in breeding sites'
+            else:
+                vector_control = 'Standard: LLIN maintenance + Environmental management'
+            
+            # Clinical preparedness recommendations
+            if predicted_cases > 200:
+                clinical_prep = {
+                    'drug_stockpile': f'Ensure {int(predicted_cases * 1.5)} ACT courses available',
+                    'rdt_requirements': f'{int(predicted_cases * 2)} Rapid Diagnostic Tests needed',
+                    'bed_capacity': f'Reserve {int(estimated_hospitalizations)} hospital beds',
+                    'staff_alert': 'Alert clinical staff for surge capacity',
+                    'blood_supply': f'Ensure {int(estimated_severe_cases * 2)} units blood available'
+                }
+            else:
+                clinical_prep = {
+                    'drug_stockpile': f'Maintain {int(predicted_cases * 1.2)} ACT courses',
+                    'rdt_requirements': f'{int(predicted_cases * 1.5)} RDTs needed',
+                    'bed_capacity': f'{int(estimated_hospitalizations)} beds on standby',
+                    'staff_alert': 'Standard staffing adequate',
+                    'blood_supply': 'Standard blood bank levels sufficient'
+                }
+            
+            # Preventive interventions timeline
+            intervention_timeline = []
+            if month in [3, 4, 5]:  # Long rainy season
+                intervention_timeline = [
+                    {'week': -4, 'action': 'Pre-emptive IRS in high-risk areas'},
+                    {'week': -2, 'action': 'Mass LLIN distribution campaign'},
+                    {'week': 0, 'action': 'Enhanced surveillance activation'},
+                    {'week': 2, 'action': 'Community health education intensified'}
+                ]
+            elif month in [10, 11, 12]:  # Short rainy season
+                intervention_timeline = [
+                    {'week': -2, 'action': 'Targeted IRS in hotspots'},
+                    {'week': 0, 'action': 'LLIN coverage verification'},
+                    {'week': 2, 'action': 'Case management training refresher'}
+                ]
+            else:
+                intervention_timeline = [
+                    {'week': 0, 'action': 'Routine surveillance maintenance'},
+                    {'week': 2, 'action': 'Community sensitization'}
+                ]
+            
+            predictions.append({
+                'county': county,
+                'climate_data': {
+                    'temperature': temperature,
+                    'rainfall': rainfall,
+                    'humidity': humidity,
+                    'month': month,
+                    'year': year
+                },
+                'epidemiological_forecast': {
+                    'predicted_cases': float(predicted_cases),
+                    'incidence_rate': round(incidence_rate, 2),
+                    'estimated_mortality': round(estimated_mortality, 1),
+                    'estimated_severe_cases': round(estimated_severe_cases, 1),
+                    'estimated_hospitalizations': round(estimated_hospitalizations, 1)
+                },
+                'who_classification': {
+                    'severity': who_severity,
+                    'risk_level': risk_level,
+                    'intervention_level': intervention_level,
+                    'clinical_priority': clinical_priority
+                },
+                'clinical_preparedness': clinical_prep,
+                'vector_control_strategy': vector_control,
+                'intervention_timeline': intervention_timeline,
+                'public_health_recommendations': {
+                    'surveillance': 'Enhanced passive case detection' if predicted_cases > 150 else 'Standard surveillance',
+                    'case_management': 'Ensure ACT availability at all facilities',
+                    'prevention': 'Scale up LLIN coverage to >80%',
+                    'community_engagement': 'Conduct health education in local languages'
+                }
+            })
+            
+        except Exception as row_error:
+            print(f"Error processing row {idx} for county '{county}': {str(row_error)}")
+            import traceback
+            print(traceback.format_exc())
+            continue  # Skip this row and continue with next
+    
+    return predictions
+
+def score_upload_chunk(df, mode):
+    """Parse and score one chunk of an upload, recording its rows, time and stages for /metrics"""
+    stages = StageTimer()
+    start = time.perf_counter()
+    with stages('prepare'):
+        parsed_rows, feature_df = prepare_upload_rows(df)
+    predictions = score_upload_rows(parsed_rows, feature_df, stages)
+    UPLOAD_ROWS.inc(len(df), mode=mode)
+    UPLOAD_SECONDS.inc(time.perf_counter() - start, mode=mode)
+    stages.observe(STAGE_SECONDS, endpoint=metrics_endpoint())
+    return predictions
+
+def _leading_number(text):
+    """First integer in a text like "Ensure 150 ACT courses available" (0 if none)"""
+    numbers = re.findall(r'\d+', text)
+    return int(numbers[0]) if numbers else 0
+
+class UploadSummary:
+    """Running epidemiological and resource totals over upload predictions"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total_cases = 0.0
+        self.high_risk_count = 0
+        self.emergency_count = 0
+        self.enhanced_surveillance_count = 0
+        self.total_mortality = 0.0
+        self.total_hospitalizations = 0.0
+        self.total_act_needed = 0
+        self.total_rdt_needed = 0
+        self.highest_burden_county = None
+        self.highest_burden_cases = None
+    
+    def add(self, prediction):
+        forecast = prediction['epidemiological_forecast']
+        classification = prediction['who_classification']
+        preparedness = prediction['clinical_preparedness']
+        
+        self.count += 1
+        self.total_cases += forecast['predicted_cases']
+        self.total_mortality += forecast['estimated_mortality']
+        self.total_hospitalizations += forecast['estimated_hospitalizations']
+        if classification['risk_level'] == 'High':
+            self.high_risk_count += 1
+        if classification['intervention_level'] == 'Level 4 - Emergency':
+            self.emergency_count += 1
+        if 'Enhanced' in classification['clinical_priority']:
+            self.enhanced_surveillance_count += 1
+        if self.highest_burden_cases is None or forecast['predicted_cases'] > self.highest_burden_cases:
+            self.highest_burden_cases = forecast['predicted_cases']
+            self.highest_burden_county = prediction['county']
+        
+        # Extract numbers from texts like "Ensure 150 ACT courses" or "300 Rapid Diagnostic Tests needed"
+        self.total_act_needed += _leading_number(preparedness['drug_stockpile'])
+        self.total_rdt_needed += _leading_number(preparedness['rdt_requirements'])
+    
+    def epidemiological_summary(self):
+        """WHO epidemiological summary"""
+        if self.emergency_count > 0:
+            status = 'Epidemic Alert'
+        elif self.high_risk_count > self.count * 0.3:
+            status = 'High Alert'
+        elif self.high_risk_count > 0:
+            status = 'Moderate Alert'
+        else:
+            status = 'Low Alert'
+        
+        return {
+            'total_predicted_cases': self.total_cases,
+            'average_cases_per_county': self.total_cases / self.count if self.count else 0,
+            'highest_burden_county': self.highest_burden_county,
+            'total_estimated_deaths': round(self.total_mortality, 1),
+            'total_hospitalizations_required': round(self.total_hospitalizations, 1),
+            'counties_at_high_risk': self.high_risk_count,
+            'counties_at_emergency_level': self.emergency_count,
+            'overall_transmission_status': status
+        }
+    
+    def resource_summary(self):
+        """Resource allocation summary"""
+        return {
+            'total_act_courses_required': self.total_act_needed,
+            'total_rdts_required': self.total_rdt_needed,
+            'total_hospital_beds_required': int(self.total_hospitalizations),
+            'counties_requiring_emergency_response': self.emergency_count,
+            'counties_requiring_enhanced_surveillance': self.enhanced_surveillance_count
+        }
+
+def missing_columns_response(missing_columns, found_columns):
+    """400 response for an upload without all required columns"""
+    return jsonify({
+        'error': f'Missing required columns: {", ".join(missing_columns)}',
+        'required': REQUIRED_UPLOAD_COLUMNS,
+        'found': list(found_columns),
+        'hint': 'Column names are case-insensitive. Please ensure your file has: county, temperature, rainfall, humidity, month, year'
+    }), 400
+
+def wants_stream():
+    """True when the client asked for an NDJSON stream (?stream=1 or Accept: application/x-ndjson)"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def _sniff_encoding(stream, sample_bytes=64 * 1024):
+    """Guess the encoding of a CSV upload from its first bytes (utf-8, else latin-1)"""
+    sample = stream.read(sample_bytes)
+    stream.seek(0)
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is still utf-8
+        if e.start < len(sample) - 3:
+            return 'latin-1'
+    return 'utf-8'
+
+def read_upload_chunks(stream, filename, chunk_rows=None):
+    """
+    Read an uploaded file from a binary stream (the request stream or a saved
+    file) in chunks of chunk_rows rows, with normalized column names
+    """
+    chunk_rows = chunk_rows or UPLOAD_CHUNK_ROWS
+    
+    if filename.lower().endswith('.csv'):
+        encoding = _sniff_encoding(stream)
+        reader = pd.read_csv(stream, encoding=encoding, encoding_errors='replace', chunksize=chunk_rows)
+    else:
+        # Excel workbooks cannot be parsed incrementally; read once and slice
+        df = pd.read_excel(io.BytesIO(stream.read()))
+        reader = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        yield chunk
+
+def _ndjson_line(record):
+    return app.json.dumps(record) + '\n'
+
+def stream_upload_predictions(chunks):
+    """
+    Generate NDJSON lines for chunked uploads: one 'prediction' line per row
+    as soon as its chunk is scored, then a final 'summary' line
+    """
+    summary = UploadSummary()
+    rows_read = 0
+    
+    try:
+        for chunk in chunks:
+            rows_read += len(chunk)
+            for prediction in score_upload_chunk(chunk, 'stream'):
+                summary.add(prediction)
+                yield _ndjson_line({'type': 'prediction', **prediction})
+        
+        if summary.count == 0:
+            yield _ndjson_line({
+                'type': 'error',
+                'error': NO_PREDICTIONS_ERROR,
+                'required_columns': REQUIRED_UPLOAD_COLUMNS,
+                'total_rows_processed': rows_read
+            })
+            return
+        
+        yield _ndjson_line({
+            'type': 'summary',
+            'success': True,
+            'analysis_timestamp': datetime.now().isoformat(),
+            'total_rows_processed': rows_read,
+            'total_records_analyzed': summary.count,
+            'epidemiological_summary': summary.epidemiological_summary(),
+            'resource_requirements': summary.resource_summary(),
+            'report_classification': 'WHO Epidemiological Intelligence Report',
+            'report_generated_by': 'Kilmalaria ML Intelligence System v2.0',
+            'data_quality': 'Clinical Grade - Validated',
+            'next_update_recommended': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+        })
+        print(f"[OK] Streamed {summary.count} predictions from {rows_read} uploaded rows")
+    
+    except Exception as e:
+        # Headers are already sent, so the error goes into the stream
+        import traceback
+        print(f"ERROR in streamed predict_from_file: {str(e)}")
+        print(traceback.format_exc())
+        yield _ndjson_line({
+            'type': 'error',
+            'error': str(e),
+            'error_type': type(e).__name__,
+            'total_rows_processed': rows_read
+        })
+
+def upload_report(summary, predictions=None):
+    """
+    Full /predict_from_file report for the summary of the predictions, with
+    the predictions themselves unless None (jobs write them separately)
+    """
+    report = {
+        'success': True,
+        'analysis_timestamp': datetime.now().isoformat(),
+        'total_records_analyzed': summary.count,
+        'epidemiological_summary': summary.epidemiological_summary(),
+        'resource_requirements': summary.resource_summary(),
+        'report_classification': 'WHO Epidemiological Intelligence Report',
+        'report_generated_by': 'Kilmalaria ML Intelligence System v2.0',
+        'data_quality': 'Clinical Grade - Validated',
+        'next_update_recommended': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+    }
+    if predictions is not None:
+        report['detailed_predictions'] = predictions
+    return report
+
+def _count_csv_rows(path):
+    """Data rows in a CSV file (lines minus the header), read in 1MB blocks"""
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    return max(0, lines - 1)
+
+def run_upload_job(job, progress, result_file):
+    """
+    Job handler: score a saved upload chunk by chunk, appending each chunk's
+    predictions to the result file and publishing progress after each chunk.
+    Only the running summary is kept in memory.
+    """
+    filename = job['filename']
+    if filename.lower().endswith('.csv'):
+        progress(rows_total=_count_csv_rows(job['source_path']))
+    
+    summary = UploadSummary()
+    rows_read = 0
+    # The report's predictions are written first, its summary fields once known
+    result_file.write('{"detailed_predictions":[')
+    with open(job['source_path'], 'rb') as stream:
+        for chunk in read_upload_chunks(stream, filename):
+            missing_columns = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in chunk.columns]
+            if missing_columns:
+                raise ValueError(f'Missing required columns: {", ".join(missing_columns)}')
+            
+            rows_read += len(chunk)
+            lines = []
+            for prediction in score_upload_chunk(chunk, 'job'):
+                lines.append(app.json.dumps(prediction))
+                summary.add(prediction)
+            if lines:
+                result_file.write((',' if summary.count > len(lines) else '') + ','.join(lines))
+            progress(rows_processed=rows_read, records=summary.count)
+    
+    progress(rows_total=rows_read)
+    if summary.count == 0:
+        raise ValueError(NO_PREDICTIONS_ERROR)
+    result_file.write('],' + app.json.dumps(upload_report(summary))[1:])
+
+JOB_QUEUE = JobQueue(JOBS_DIR, run_upload_job, max_workers=JOB_WORKERS, result_ttl_seconds=JOB_RESULT_TTL)
+
+def wants_async():
+    """True when the client asked for a background job (?async=1)"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def job_payload(job):
+    """Public view of a job record for /jobs responses"""
+    payload = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'filename': job['filename'],
+        'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+        'rows_total': job['rows_total'],
+        'rows_processed': job['rows_processed'],
+        'records_analyzed': job['records'],
+        'metrics': job_metrics(job),
+        'status_url': f"/jobs/{job['id']}"
+    }
+    if job['status'] == 'done':
+        payload['result_url'] = f"/jobs/{job['id']}/result"
+    if job['error']:
+        payload['error'] = job['error']
+    return payload
+
+def submit_upload_job(file, filename):
+    """Save an upload for the job workers and return the 202 response"""
+    job_id = JOB_QUEUE.new_id()
+    file.save(JOB_QUEUE.source_path(job_id, filename))
+    job = JOB_QUEUE.submit(job_id, filename)
+    print(f"[OK] Queued job {job_id} for {filename}")
+    return jsonify(job_payload(job)), 202
+
 @app.route('/predict_from_file', methods=['POST'])
 def predict_from_file():
     """
@@ -572,8 +1578,41 @@ def predict_from_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Please upload CSV or Excel file'}), 400
         
-        # Save file temporarily
         filename = secure_filename(file.filename)
+        
+        if wants_async():
+            # Job mode: return a job id at once and process the file in the background
+            return submit_upload_job(file, filename)
+        
+        if wants_stream():
+            # Stream mode: parse the upload chunk by chunk without saving it
+            # and send predictions back as NDJSON while later chunks are read
+            chunks = read_upload_chunks(file.stream, filename)
+            try:
+                first_chunk = next(chunks)
+            except (StopIteration, pd.errors.EmptyDataError):
+                first_chunk = None
+
+            if first_chunk is not None:
+                missing_columns = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in first_chunk.columns]
+                if missing_columns:
+                    return missing_columns_response(missing_columns, first_chunk.columns)
+
+            if first_chunk is None or first_chunk.empty:
+                # Header-only or empty upload: same answer as the buffered path
+                return jsonify({
+                    'error': NO_PREDICTIONS_ERROR,
+                    'required_columns': REQUIRED_UPLOAD_COLUMNS,
+                    'total_rows_processed': 0
+                }), 400
+
+            print(f"Streaming predictions for {filename} in chunks of {UPLOAD_CHUNK_ROWS} rows")
+            return Response(
+                stream_with_context(stream_upload_predictions(itertools.chain([first_chunk], chunks))),
+                mimetype='application/x-ndjson'
+            )
+        
+        # Save file temporarily
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
@@ -600,294 +1639,39 @@ def predict_from_file():
             df.columns = df.columns.str.strip().str.lower()
             
             # Validate required columns (case-insensitive)
-            required_columns = ['county', 'temperature', 'rainfall', 'humidity', 'month', 'year']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in df.columns]
             
             if missing_columns:
-                return jsonify({
-                    'error': f'Missing required columns: {", ".join(missing_columns)}',
-                    'required': required_columns,
-                    'found': list(df.columns),
-                    'hint': 'Column names are case-insensitive. Please ensure your file has: county, temperature, rainfall, humidity, month, year'
-                }), 400
+                return missing_columns_response(missing_columns, df.columns)
             
             print(f"All required columns found. Processing {len(df)} rows...")
             
-            # Make predictions for each row
-            predictions = []
-            
-            for idx, row in df.iterrows():
-                try:
-                    # Handle missing values
-                    county = str(row['county']).strip() if pd.notna(row['county']) else None
-                    if not county:
-                        print(f"Skipping row {idx}: Missing county name")
-                        continue  # Skip rows with missing county
-                    
-                    temperature = float(row['temperature']) if pd.notna(row['temperature']) else 25.0
-                    rainfall = float(row['rainfall']) if pd.notna(row['rainfall']) else 100.0
-                    humidity = float(row['humidity']) if pd.notna(row['humidity']) else 65.0
-                    month = int(row['month']) if pd.notna(row['month']) else 6
-                    year = int(row['year']) if pd.notna(row['year']) else 2024
-                    
-                    # Validate ranges
-                    if not (1 <= month <= 12):
-                        print(f"Warning: Invalid month {month} in row {idx}, using 6")
-                        month = 6
-                    if year < 2000 or year > 2100:
-                        print(f"Warning: Invalid year {year} in row {idx}, using 2024")
-                        year = 2024
-                    
-                    # Get historical data for the county
-                    county_data = DATA[DATA['county'] == county].copy()
-                    
-                    if len(county_data) == 0:
-                        # If county not found, use default values
-                        print(f"Warning: County '{county}' not found in database, using default values")
-                        predicted_cases = 0
-                        risk_level = 'Unknown County'
-                        population = 100000  # Default population
-                    else:
-                        # Create feature vector for prediction
-                        # Use recent data and climate inputs
-                        recent_cases = county_data['cases'].tail(12).values
-                        
-                        # Create basic features
-                        features = {
-                            'temperature': temperature,
-                            'rainfall': rainfall,
-                            'humidity': humidity,
-                            'month': month,
-                            'cases_lag_1': recent_cases[-1] if len(recent_cases) >= 1 else county_data['cases'].mean(),
-                            'cases_lag_2': recent_cases[-2] if len(recent_cases) >= 2 else county_data['cases'].mean(),
-                            'cases_lag_3': recent_cases[-3] if len(recent_cases) >= 3 else county_data['cases'].mean(),
-                            'cases_lag_6': recent_cases[-6] if len(recent_cases) >= 6 else county_data['cases'].mean(),
-                        }
-                        
-                        # Add other features that might be in the model
-                        if 'population' in county_data.columns and len(county_data) > 0:
-                            features['population'] = county_data['population'].iloc[-1]
-                            population = county_data['population'].iloc[-1]
-                        else:
-                            features['population'] = 100000  # Default population
-                            population = 100000
-                        
-                        # Create feature DataFrame
-                        feature_df = pd.DataFrame([features])
-                        
-                        # Add any missing features with default values
-                        for col in FEATURE_COLUMNS:
-                            if col not in feature_df.columns:
-                                feature_df[col] = 0
-                        
-                        # Ensure columns are in the same order as training
-                        feature_df = feature_df[FEATURE_COLUMNS]
-                        
-                        # Make prediction
-                        predicted_cases = max(0, predict_ensemble(feature_df))
-                        
-                        # Determine risk level
-                        if predicted_cases > 200:
-                            risk_level = 'High'
-                        elif predicted_cases > 100:
-                            risk_level = 'Moderate'
-                        else:
-                            risk_level = 'Low'
-                    
-                    # Calculate epidemiological metrics (population already set above)
-                    incidence_rate = (predicted_cases / population) * 100000  # per 100,000 population
-                    
-                    # WHO Severity Classification
-                    if incidence_rate > 500:
-                        who_severity = 'Epidemic Threshold'
-                        clinical_priority = 'Emergency Response Required'
-                        intervention_level = 'Level 4 - Emergency'
-                    elif incidence_rate > 300:
-                        who_severity = 'Very High Transmission'
-                        clinical_priority = 'Immediate Action Required'
-                        intervention_level = 'Level 3 - Urgent'
-                    elif incidence_rate > 100:
-                        who_severity = 'High Transmission'
-                        clinical_priority = 'Enhanced Surveillance'
-                        intervention_level = 'Level 2 - Heightened'
-                    elif incidence_rate > 50:
-                        who_severity = 'Moderate Transmission'
-                        clinical_priority = 'Routine Monitoring'
-                        intervention_level = 'Level 1 - Standard'
-                    else:
-                        who_severity = 'Low Transmission'
-                        clinical_priority = 'Baseline Surveillance'
-                        intervention_level = 'Level 0 - Maintenance'
-                    
-                    # Calculate disease burden metrics
-                    estimated_mortality = predicted_cases * 0.003  # 0.3% case fatality rate (Kenya average)
-                    estimated_severe_cases = predicted_cases * 0.15  # 15% severe malaria
-                    estimated_hospitalizations = predicted_cases * 0.25  # 25% require hospitalization
-                    
-                    # Vector control recommendations
-                    if rainfall > 150 and temperature > 25:
-                        vector_control = 'High Priority: Indoor Residual Spraying (IRS) + LLIN distribution + Larviciding'
-                    elif rainfall > 100:
-                        vector_control = 'Moderate Priority: LLIN distribution + Larviciding in breeding sites'
-                    else:
-                        vector_control = 'Standard: LLIN maintenance + Environmental management'
-                    
-                    # Clinical preparedness recommendations
-                    if predicted_cases > 200:
-                        clinical_prep = {
-                            'drug_stockpile': f'Ensure {int(predicted_cases * 1.5)} ACT courses available',
-                            'rdt_requirements': f'{int(predicted_cases * 2)} Rapid Diagnostic Tests needed',
-                            'bed_capacity': f'Reserve {int(estimated_hospitalizations)} hospital beds',
-                            'staff_alert': 'Alert clinical staff for surge capacity',
-                            'blood_supply': f'Ensure {int(estimated_severe_cases * 2)} units blood available'
-                        }
-                    else:
-                        clinical_prep = {
-                            'drug_stockpile': f'Maintain {int(predicted_cases * 1.2)} ACT courses',
-                            'rdt_requirements': f'{int(predicted_cases * 1.5)} RDTs needed',
-                            'bed_capacity': f'{int(estimated_hospitalizations)} beds on standby',
-                            'staff_alert': 'Standard staffing adequate',
-                            'blood_supply': 'Standard blood bank levels sufficient'
-                        }
-                    
-                    # Preventive interventions timeline
-                    intervention_timeline = []
-                    if month in [3, 4, 5]:  # Long rainy season
-                        intervention_timeline = [
-                            {'week': -4, 'action': 'Pre-emptive IRS in high-risk areas'},
-                            {'week': -2, 'action': 'Mass LLIN distribution campaign'},
-                            {'week': 0, 'action': 'Enhanced surveillance activation'},
-                            {'week': 2, 'action': 'Community health education intensified'}
-                        ]
-                    elif month in [10, 11, 12]:  # Short rainy season
-                        intervention_timeline = [
-                            {'week': -2, 'action': 'Targeted IRS in hotspots'},
-                            {'week': 0, 'action': 'LLIN coverage verification'},
-                            {'week': 2, 'action': 'Case management training refresher'}
-                        ]
-                    else:
-                        intervention_timeline = [
-                            {'week': 0, 'action': 'Routine surveillance maintenance'},
-                            {'week': 2, 'action': 'Community sensitization'}
-                        ]
-                    
-                    predictions.append({
-                        'county': county,
-                        'climate_data': {
-                            'temperature': temperature,
-                            'rainfall': rainfall,
-                            'humidity': humidity,
-                            'month': month,
-                            'year': year
-                        },
-                        'epidemiological_forecast': {
-                            'predicted_cases': float(predicted_cases),
-                            'incidence_rate': round(incidence_rate, 2),
-                            'estimated_mortality': round(estimated_mortality, 1),
-                            'estimated_severe_cases': round(estimated_severe_cases, 1),
-                            'estimated_hospitalizations': round(estimated_hospitalizations, 1)
-                        },
-                        'who_classification': {
-                            'severity': who_severity,
-                            'risk_level': risk_level,
-                            'intervention_level': intervention_level,
-                            'clinical_priority': clinical_priority
-                        },
-                        'clinical_preparedness': clinical_prep,
-                        'vector_control_strategy': vector_control,
-                        'intervention_timeline': intervention_timeline,
-                        'public_health_recommendations': {
-                            'surveillance': 'Enhanced passive case detection' if predicted_cases > 150 else 'Standard surveillance',
-                            'case_management': 'Ensure ACT availability at all facilities',
-                            'prevention': 'Scale up LLIN coverage to >80%',
-                            'community_engagement': 'Conduct health education in local languages'
-                        }
-                    })
-                    
-                except Exception as row_error:
-                    print(f"Error processing row {idx} for county '{county}': {str(row_error)}")
-                    import traceback
-                    print(traceback.format_exc())
-                    continue  # Skip this row and continue with next
+            # Parse, score and report every row
+            predictions = score_upload_chunk(df, 'sync')
             
             # Check if we have any valid predictions
             if len(predictions) == 0:
                 return jsonify({
-                    'error': 'No valid predictions could be generated. Please check that your file contains valid county names and data. Ensure county names match the official Kenyan county names (e.g., Nairobi, Mombasa, Kisumu).',
-                    'required_columns': ['county', 'temperature', 'rainfall', 'humidity', 'month', 'year'],
+                    'error': NO_PREDICTIONS_ERROR,
+                    'required_columns': REQUIRED_UPLOAD_COLUMNS,
                     'total_rows_processed': len(df)
                 }), 400
             
             # Calculate comprehensive summary statistics
-            pred_cases = [p['epidemiological_forecast']['predicted_cases'] for p in predictions]
-            high_risk_count = sum(1 for p in predictions if p['who_classification']['risk_level'] == 'High')
-            emergency_count = sum(1 for p in predictions if p['who_classification']['intervention_level'] == 'Level 4 - Emergency')
-            total_mortality = sum(p['epidemiological_forecast']['estimated_mortality'] for p in predictions)
-            total_hospitalizations = sum(p['epidemiological_forecast']['estimated_hospitalizations'] for p in predictions)
-            
-            # WHO epidemiological summary
-            epidemic_summary = {
-                'total_predicted_cases': sum(pred_cases),
-                'average_cases_per_county': float(np.mean(pred_cases)) if pred_cases else 0,
-                'highest_burden_county': max(predictions, key=lambda x: x['epidemiological_forecast']['predicted_cases'])['county'] if predictions else None,
-                'total_estimated_deaths': round(total_mortality, 1),
-                'total_hospitalizations_required': round(total_hospitalizations, 1),
-                'counties_at_high_risk': high_risk_count,
-                'counties_at_emergency_level': emergency_count,
-                'overall_transmission_status': 'Epidemic Alert' if emergency_count > 0 else 'High Alert' if high_risk_count > len(predictions) * 0.3 else 'Moderate Alert' if high_risk_count > 0 else 'Low Alert'
-            }
-            
-            # Resource allocation summary
-            total_act_needed = 0
-            for p in predictions:
-                try:
-                    drug_text = p['clinical_preparedness']['drug_stockpile']
-                    # Extract number from text like "Ensure 150 ACT courses" or "Maintain 120 ACT courses"
-                    import re
-                    numbers = re.findall(r'\d+', drug_text)
-                    if numbers:
-                        total_act_needed += int(numbers[0])
-                except:
-                    pass
-            
-            total_rdt_needed = 0
+            summary = UploadSummary()
             for p in predictions:
-                try:
-                    rdt_text = p['clinical_preparedness']['rdt_requirements']
-                    # Extract number from text like "300 Rapid Diagnostic Tests needed"
-                    import re
-                    numbers = re.findall(r'\d+', rdt_text)
-                    if numbers:
-                        total_rdt_needed += int(numbers[0])
-                except:
-                    pass
+                summary.add(p)
             
-            resource_summary = {
-                'total_act_courses_required': total_act_needed,
-                'total_rdts_required': total_rdt_needed,
-                'total_hospital_beds_required': int(total_hospitalizations),
-                'counties_requiring_emergency_response': emergency_count,
-                'counties_requiring_enhanced_surveillance': sum(1 for p in predictions if 'Enhanced' in p['who_classification']['clinical_priority'])
-            }
-            
-            return jsonify({
-                'success': True,
-                'analysis_timestamp': datetime.now().isoformat(),
-                'total_records_analyzed': len(predictions),
-                'epidemiological_summary': epidemic_summary,
-                'resource_requirements': resource_summary,
-                'detailed_predictions': predictions,
-                'report_classification': 'WHO Epidemiological Intelligence Report',
-                'report_generated_by': 'Kilmalaria ML Intelligence System v2.0',
-                'data_quality': 'Clinical Grade - Validated',
-                'next_update_recommended': (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
-            })
+            return jsonify(upload_report(summary, predictions))
             
         finally:
             # Clean up uploaded file
             if os.path.exists(filepath):
                 os.remove(filepath)
     
+    except RequestEntityTooLarge:
+        # Handled by upload_too_large
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -913,6 +1697,127 @@ def predict_from_file():
             'error_type': type(e).__name__
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Submit an uploaded CSV/Excel file as a background prediction job.
+    Same input as /predict_from_file; poll /jobs/<job_id> for progress.
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file type. Please upload CSV or Excel file'}), 400
+    
+    return submit_upload_job(file, secure_filename(file.filename))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, progress and throughput of a job"""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return jsonify(job_payload(job))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """The /predict_from_file report of a finished job"""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error'], 'status': 'failed'}), 400
+    if job['status'] != 'done':
+        return jsonify(job_payload(job)), 202
+    return send_file(job['result_path'], mimetype='application/json')
+
+def admin_error():
+    """Error response if the request may not use the admin endpoints, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (set ADMIN_TOKEN)'}), 403
+    
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    return None
+
+@app.route('/admin/models', methods=['GET'])
+def list_model_versions():
+    """Registry versions, the promoted one and the one this worker is serving"""
+    error = admin_error()
+    if error:
+        return error
+    
+    versions = []
+    for version in MODEL_REGISTRY.versions():
+        manifest = MODEL_REGISTRY.manifest(version)
+        versions.append({
+            'version': version,
+            'created_at': manifest['created_at'],
+            'source': manifest['source'],
+            'metrics': manifest['metrics'],
+            'features': len(manifest['feature_columns']),
+            'feature_fingerprint': manifest.get('feature_fingerprint')
+        })
+    
+    return jsonify({
+        'active': ACTIVE_MODELS.info(),
+        'promoted': MODEL_REGISTRY.current(),
+        'swap': dict(MODEL_SWAP),
+        'versions': versions
+    })
+
+@app.route('/admin/models/reload', methods=['POST'])
+def reload_models():
+    """
+    Load a model version in the background and swap it in once complete
+    
+    Request body (optional):
+    {
+        "version": "20260101-120000-1a2b3c4d",  # default: the promoted version
+        "promote": true                          # make it the promoted version first
+    }
+    
+    Promoting also brings the other workers over through their registry
+    watcher; without it only this worker serves the version.
+    """
+    error = admin_error()
+    if error:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    version = data.get('version') or MODEL_REGISTRY.current()
+    if not version:
+        return jsonify({'error': 'No model version given and none has been promoted'}), 400
+    
+    try:
+        if data.get('promote'):
+            MODEL_REGISTRY.promote(version)
+        else:
+            MODEL_REGISTRY.manifest(version)
+    except RegistryError as e:
+        return jsonify({'error': str(e)}), 404
+    
+    threading.Thread(target=_swap_in_background, args=(version,), name='model-swap', daemon=True).start()
+    return jsonify({
+        'status': 'loading',
+        'version': version,
+        'active_version': ACTIVE_MODELS.version
+    }), 202
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """JSON error for uploads over MAX_UPLOAD_MB"""
+    return jsonify({
+        'error': f'File too large. The maximum upload size is {MAX_UPLOAD_MB:g}MB',
+        'max_upload_mb': MAX_UPLOAD_MB
+    }), 413
+
 @app.route('/')
 def index():
     """Beautiful dashboard homepage"""
@@ -922,7 +1827,7 @@ def index():
         # Fallback to JSON if template not found
         # Try to get actual accuracy from ensemble metrics
         try:
-            ensemble_metrics = joblib.load('models/ensemble_metrics.pkl')
+            ensemble_metrics = ACTIVE_MODELS.ensemble_metrics
             accuracy = f"{ensemble_metrics.get('metrics', {}).get('r2_score', 0)*100:.2f}%"
         except:
             accuracy = '85%+'
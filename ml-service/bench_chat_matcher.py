@@ -0,0 +1,96 @@
+"""
+Chat Matcher Benchmark
+Per-message latency of the compiled trigger/county index (intent_matcher.py)
+against the substring scan it replaced, as the knowledge base grows with
+synthetic topics
+
+Run from the ml-service directory:
+    python bench_chat_matcher.py [--sizes 0,100,1000,5000] [--repeat 2000]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from chatbot_v2 import KilmalariaAI, PREDICTION_TRIGGERS, STATISTICS_TRIGGERS
+from intent_matcher import PhraseIndex
+from prediction_service import LocalPredictionService
+
+MESSAGES = [
+    'Hello there!',
+    'What are the symptoms of malaria in children?',
+    'How do I prevent malaria when I travel to the coast?',
+    'Predict malaria cases in Kisumu for the next 6 months',
+    'Show me historical statistics for Homa Bay',
+    'Which counties are available?',
+    'Is there any treatment for a baby with a fever and chills?',
+    'Something completely unrelated to any topic at all'
+]
+
+
+def synthetic_topics(count, triggers_per_topic=8, seed=0):
+    """Extra topics with random single- and two-word triggers"""
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+
+    return {
+        f'topic_{i}': [word() if rng.random() < 0.7 else f'{word()} {word()}' for _ in range(triggers_per_topic)]
+        for i in range(count)
+    }
+
+
+def substring_scan(message, intents, counties):
+    """The previous matching: one substring test per trigger and county variant"""
+    message_lower = message.lower()
+    found = {topic for topic, triggers in intents.items() if any(t in message_lower for t in triggers)}
+    for county in counties:
+        variants = [county.lower(), county.lower().replace('-', ' '), county.lower().replace("'", "")]
+        if any(variant in message_lower for variant in variants):
+            return found, county
+    return found, None
+
+
+def time_per_message(fn, repeat):
+    """Mean microseconds per message over all sample messages"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='0,100,1000,5000')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Matching never reaches the prediction service
+    bot = KilmalariaAI(LocalPredictionService(None, None))
+    base_intents = {topic: data['triggers'] for topic, data in bot.knowledge.items()}
+    base_intents['predict'] = PREDICTION_TRIGGERS
+    base_intents['statistics'] = STATISTICS_TRIGGERS
+
+    print(f"{'extra topics':>12} {'phrases':>8} {'build':>9} {'substring scan':>15} {'compiled index':>15}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        intents = {**base_intents, **synthetic_topics(size)}
+
+        start = time.perf_counter()
+        intent_index = PhraseIndex(intents, inflect=True)
+        build_ms = (time.perf_counter() - start) * 1000
+        county_index = bot.county_index
+
+        def compiled(message):
+            return intent_index.labels(message), county_index.first(message)
+
+        repeat = max(10, args.repeat // max(1, size // 100))
+        scan_us = time_per_message(lambda m: substring_scan(m, intents, bot.counties), repeat)
+        compiled_us = time_per_message(compiled, args.repeat)
+        print(f"{size:>12} {len(intent_index):>8} {build_ms:>7.1f}ms {scan_us:>13.1f}us {compiled_us:>13.1f}us")
+
+
+if __name__ == '__main__':
+    main()
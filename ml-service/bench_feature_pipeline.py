@@ -0,0 +1,107 @@
+"""
+Feature Pipeline Benchmark
+Time of the grouped rolling and EMA features (3/6/12 mean, std, max and min
+of cases, rainfall rolling means, cases EMAs) computed by the SortedGroups
+engine in feature_engineering.py against the groupby(...).transform(lambda)
+calls the training scripts used, on synthetic facility-weekly data
+
+Run from the ml-service directory:
+    python bench_feature_pipeline.py [--sizes 100000,1000000,10000000] [--group-length 520]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import EMA_SPANS, ROLLING_WINDOWS, SortedGroups
+
+
+def synthetic_series(rows, group_length, seed=0):
+    """Groups of roughly group_length consecutive weeks (ragged), sorted by group and week"""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(group_length // 2, group_length * 3 // 2 + 1, size=rows // group_length + 1)
+    lengths = lengths[np.cumsum(lengths) <= rows]
+    lengths = np.r_[lengths, rows - lengths.sum()] if lengths.sum() < rows else lengths
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    return pd.DataFrame({
+        'group': group,
+        'cases': rng.poisson(50, rows).astype(float),
+        'rainfall_mm': rng.gamma(2.0, 60.0, rows)
+    })
+
+
+def lambda_features(data):
+    """The previous feature code: one Python callback per group and feature"""
+    features = {}
+    grouped = data.groupby('group')
+    for window in ROLLING_WINDOWS:
+        features[f'cases_rolling_mean_{window}'] = grouped['cases'].transform(
+            lambda x: x.rolling(window, min_periods=1).mean())
+        features[f'cases_rolling_std_{window}'] = grouped['cases'].transform(
+            lambda x: x.rolling(window, min_periods=1).std().fillna(0))
+        features[f'cases_rolling_max_{window}'] = grouped['cases'].transform(
+            lambda x: x.rolling(window, min_periods=1).max())
+        features[f'cases_rolling_min_{window}'] = grouped['cases'].transform(
+            lambda x: x.rolling(window, min_periods=1).min())
+        features[f'rainfall_rolling_mean_{window}'] = grouped['rainfall_mm'].transform(
+            lambda x: x.rolling(window, min_periods=1).mean())
+    for span in EMA_SPANS:
+        features[f'cases_ema_{span}'] = grouped['cases'].transform(lambda x: x.ewm(span=span, adjust=False).mean())
+    return {name: values.to_numpy() for name, values in features.items()}
+
+
+def engine_features(data):
+    """The same features from SortedGroups"""
+    groups = SortedGroups(data['group'].to_numpy())
+    cases = data['cases'].to_numpy()
+    cases_rolling = groups.rolling(cases, ROLLING_WINDOWS)
+    rainfall_rolling = groups.rolling(data['rainfall_mm'].to_numpy(), ROLLING_WINDOWS)
+    features = {}
+    for window in ROLLING_WINDOWS:
+        mean, std, high, low = cases_rolling[window]
+        features[f'cases_rolling_mean_{window}'] = mean
+        features[f'cases_rolling_std_{window}'] = std
+        features[f'cases_rolling_max_{window}'] = high
+        features[f'cases_rolling_min_{window}'] = low
+        features[f'rainfall_rolling_mean_{window}'] = rainfall_rolling[window][0]
+    for span, ema in groups.ema(cases, EMA_SPANS).items():
+        features[f'cases_ema_{span}'] = ema
+    return features
+
+
+def timed(fn, data):
+    start = time.perf_counter()
+    result = fn(data)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100000,1000000,10000000')
+    parser.add_argument('--group-length', type=int, default=520, help='mean rows per group (10 years of weeks)')
+    parser.add_argument('--lambda-max-rows', type=int, default=2000000,
+                        help='skip the lambda version above this many rows')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'groups':>7} {'lambdas':>9} {'engine':>8} {'speedup':>8} {'rows/s':>11} {'max diff':>9}")
+    for rows in [int(s) for s in args.sizes.split(',')]:
+        data = synthetic_series(rows, args.group_length)
+        groups = data['group'].nunique()
+        engine, engine_seconds = timed(engine_features, data)
+
+        if rows <= args.lambda_max_rows:
+            expected, lambda_seconds = timed(lambda_features, data)
+            max_diff = max(np.nanmax(np.abs(engine[name] - expected[name])) for name in expected)
+            lambda_text = f'{lambda_seconds:.2f}s'
+            speedup_text = f'{lambda_seconds / engine_seconds:.1f}x'
+            diff_text = f'{max_diff:.1e}'
+        else:
+            lambda_text = speedup_text = diff_text = '-'
+        print(f"{rows:>10} {groups:>7} {lambda_text:>9} {engine_seconds:>7.2f}s {speedup_text:>8} "
+              f"{rows / engine_seconds:>11,.0f} {diff_text:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Gradient Boosting Benchmark
+Training time, accuracy and serving latency of the histogram gradient
+boosting member (HistGradientBoostingRegressor with early stopping, as the
+training scripts fit it) against the GradientBoostingRegressor it replaced,
+on the shared pipeline features of the dataset
+
+Run from the ml-service directory:
+    python bench_hist_gradient_boosting.py [--dataset malaria_master_dataset.csv] [--rows 0]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from columnar_dataset import load_dataset
+from feature_engineering import build_features, fit_params
+from tree_engine import CompiledEnsemble
+
+# Same settings as train_advanced_model.py
+MODELS = {
+    'GradientBoosting': lambda: GradientBoostingRegressor(
+        n_estimators=500, max_depth=10, learning_rate=0.03, min_samples_split=2,
+        min_samples_leaf=1, subsample=0.85, random_state=42
+    ),
+    'HistGradientBoosting': lambda: HistGradientBoostingRegressor(
+        max_iter=1000, learning_rate=0.05, max_leaf_nodes=31, min_samples_leaf=20,
+        l2_regularization=0.1, early_stopping=True, validation_fraction=0.1,
+        n_iter_no_change=30, random_state=42
+    )
+}
+
+
+def latency_ms(predict, X, repeat):
+    """Median milliseconds of one predict call"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', default='malaria_master_dataset.csv')
+    parser.add_argument('--rows', type=int, default=0, help='use only the first N rows (0: all)')
+    parser.add_argument('--batch', type=int, default=1000, help='rows per batch prediction')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = load_dataset(args.dataset, mmap_mode=None).frame
+    if args.rows:
+        data = data.iloc[:args.rows]
+    features = build_features(data, fit_params(data))
+    X = features.to_numpy(dtype=float)
+    y = data['cases'].to_numpy(dtype=float)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.15, random_state=42, shuffle=True)
+    batch = X_test[:args.batch]
+    print(f"{len(X_train):,} training rows, {X.shape[1]} features\n")
+
+    print(f"{'model':>20} {'fit':>8} {'trees':>6} {'R2':>7} {'MAE':>7} "
+          f"{'1 row':>9} {'batch':>9} {'compiled 1 row':>15} {'compiled batch':>15}")
+    for name, make in MODELS.items():
+        model = make()
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        predictions = model.predict(X_test)
+        compiled = CompiledEnsemble([(name, model)])
+        assert np.allclose(compiled.predict(batch)[0], model.predict(batch))
+        trees = getattr(model, 'n_iter_', None) or len(model.estimators_)
+
+        print(f"{name:>20} {fit_seconds:>7.1f}s {trees:>6} {r2_score(y_test, predictions):>7.4f} "
+              f"{mean_absolute_error(y_test, predictions):>7.2f} "
+              f"{latency_ms(model.predict, X_test[:1], args.repeat):>7.2f}ms "
+              f"{latency_ms(model.predict, batch, args.repeat):>7.2f}ms "
+              f"{latency_ms(compiled.predict, X_test[:1], args.repeat):>13.2f}ms "
+              f"{latency_ms(compiled.predict, batch, args.repeat):>13.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+"""
+Service Benchmark
+Latency percentiles, throughput and peak memory of the ML service endpoints
+(/county_stats, /predict_regional at every horizon, /predict_from_file with
+synthetic uploads, /chat), driven in-process through the Flask test client
+and over HTTP against a local gunicorn started with gunicorn.conf.py.
+Results are written as JSON; with --baseline, a p95 latency regression
+beyond --max-regression in any scenario fails the run (exit status 1).
+
+The forecast cache is disabled unless --forecast-cache is given, so the
+forecast scenarios measure the model path instead of cache hits.
+
+Run from the ml-service directory:
+    python bench_service.py [--targets inprocess,gunicorn] [--requests 50] [--horizons 1-12]
+                            [--file-rows 1000,10000,100000,1000000] [--output bench_service.json]
+                            [--baseline previous.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+
+MESSAGES = [
+    'What are the symptoms of malaria?',
+    'How can I prevent malaria at home?',
+    'Predict malaria cases in Kisumu for the next 6 months',
+    'Show me historical statistics for Nairobi',
+    'Which counties are available?'
+]
+
+
+class Scenario:
+    """One benchmarked request type; make(i) returns the keyword arguments of request i"""
+
+    def __init__(self, name, method, path, make, requests_count, rows=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.make = make
+        self.requests_count = requests_count
+        # Uploaded rows per request (upload scenarios)
+        self.rows = rows
+
+
+class InProcessClient:
+    """The Flask app imported into this process, called through its test client"""
+
+    name = 'inprocess'
+
+    def __init__(self, env):
+        os.environ.update(env)
+        import app as service
+        self.app = service.app
+        self._local = threading.local()
+
+    def request(self, method, path, json=None, params=None, file=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        kwargs = {'json': json, 'query_string': params}
+        if file is not None:
+            filename, data = file
+            kwargs = {'query_string': params, 'content_type': 'multipart/form-data',
+                      'data': {'file': (io.BytesIO(data), filename)}}
+        response = client.open(path, method=method, **kwargs)
+        # Streamed bodies are generated while they are read
+        body = response.get_data()
+        return response.status_code, body
+
+    def pids(self):
+        return [os.getpid()]
+
+    def close(self):
+        pass
+
+
+class GunicornClient:
+    """A local gunicorn (gunicorn.conf.py) in a child process, called over HTTP"""
+
+    name = 'gunicorn'
+
+    def __init__(self, env, workers, startup_timeout=600):
+        port = _free_port()
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, **env, PORT=str(port), WEB_CONCURRENCY=str(workers)),
+            stdout=self.log,
+            stderr=subprocess.STDOUT
+        )
+        self._local = threading.local()
+
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.process.returncode}:\n{self.log_tail()}')
+            try:
+                if requests.get(f'{self.base_url}/health', timeout=5).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.close()
+        raise RuntimeError(f'gunicorn did not become healthy within {startup_timeout}s:\n{self.log_tail()}')
+
+    def log_tail(self, lines=20):
+        self.log.seek(0)
+        return '\n'.join(self.log.read().decode(errors='replace').splitlines()[-lines:])
+
+    def request(self, method, path, json=None, params=None, file=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        files = {'file': file} if file is not None else None
+        response = session.request(method, f'{self.base_url}{path}', json=json, params=params, files=files,
+                                   timeout=3600)
+        return response.status_code, response.content
+
+    def pids(self):
+        return [self.process.pid] + _child_pids(self.process.pid)
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _child_pids(parent):
+    """Direct children of a process, from /proc (empty where there is none)"""
+    children = []
+    for name in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # Field 4, after the parenthesized command name
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(name))
+    return children
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """Peak summed resident memory of a set of processes, sampled in a background thread"""
+
+    def __init__(self, pids, interval=0.02):
+        self.pids = pids
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if os.path.isdir('/proc'):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, sum(_rss_bytes(pid) for pid in self.pids))
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            # No /proc: lifetime peak of this process (kilobytes on Linux, bytes on macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def synthetic_upload(rows, counties, seed=0):
+    """CSV bytes of an upload with the required columns and known counties"""
+    rng = np.random.default_rng(seed)
+    lines = ['county,temperature,rainfall,humidity,month,year']
+    county = rng.choice(counties, rows)
+    temperature = rng.normal(24, 3, rows).round(1)
+    rainfall = rng.gamma(2.0, 60.0, rows).round(1)
+    humidity = rng.uniform(40, 95, rows).round(1)
+    month = rng.integers(1, 13, rows)
+    year = rng.integers(2024, 2027, rows)
+    lines.extend(f'{c},{t},{r},{h},{m},{y}'
+                 for c, t, r, h, m, y in zip(county, temperature, rainfall, humidity, month, year))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _parse_horizons(text):
+    if '-' in text:
+        low, high = text.split('-')
+        return list(range(int(low), int(high) + 1))
+    return [int(h) for h in text.split(',')]
+
+
+def build_scenarios(args, counties, uploads):
+    scenarios = [Scenario(
+        'county_stats', 'GET', '/county_stats',
+        lambda i: {'params': {'county': counties[i % len(counties)]}}, args.requests
+    )]
+    for horizon in _parse_horizons(args.horizons):
+        scenarios.append(Scenario(
+            f'predict_regional_{horizon}m', 'POST', '/predict_regional',
+            lambda i, horizon=horizon: {'json': {'county': counties[i % len(counties)], 'months_ahead': horizon}},
+            args.requests
+        ))
+    for rows, data in uploads.items():
+        params = {'stream': '1'} if args.upload_mode == 'stream' else None
+        scenarios.append(Scenario(
+            f'predict_from_file_{rows}', 'POST', '/predict_from_file',
+            lambda i, data=data, params=params: {'file': ('bench.csv', data), 'params': params},
+            args.upload_requests, rows=rows
+        ))
+    scenarios.append(Scenario(
+        'chat', 'POST', '/chat',
+        lambda i: {'json': {'message': MESSAGES[i % len(MESSAGES)], 'sender': f'bench-{i % 20}'}},
+        args.requests
+    ))
+    return scenarios
+
+
+def run_scenario(client, scenario, concurrency, warmup):
+    for i in range(min(warmup, scenario.requests_count)):
+        client.request(scenario.method, scenario.path, **scenario.make(i))
+
+    def one(i):
+        start = time.perf_counter()
+        status, _ = client.request(scenario.method, scenario.path, **scenario.make(i))
+        return time.perf_counter() - start, status
+
+    with RSSSampler(client.pids()) as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(scenario.requests_count)))
+        wall_seconds = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(1 for _, status in results if status >= 400)
+    result = {
+        'requests': len(results),
+        'errors': errors,
+        'concurrency': concurrency,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'max_ms': float(latencies.max()),
+        'throughput_rps': len(results) / wall_seconds,
+        'peak_rss_mb': rss.peak / 1e6
+    }
+    if scenario.rows:
+        result['rows_per_second'] = scenario.rows * len(results) / wall_seconds
+    return result
+
+
+def compare(results, baseline, max_regression):
+    """Scenarios whose p95 latency grew by more than max_regression over the baseline run"""
+    regressions = []
+    for target, scenarios in results.items():
+        for name, result in scenarios.items():
+            previous = baseline.get('results', {}).get(target, {}).get(name)
+            if previous and previous['p95_ms'] > 0 and result['p95_ms'] > previous['p95_ms'] * (1 + max_regression):
+                regressions.append(f"{target}/{name}: p95 {previous['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--targets', default='inprocess,gunicorn', help='inprocess, gunicorn or both (comma separated)')
+    parser.add_argument('--requests', type=int, default=50, help='requests per scenario')
+    parser.add_argument('--upload-requests', type=int, default=2, help='requests per upload size')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests before each scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='requests in flight at once')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--horizons', default='1-12', help='forecast horizons in months (range or list)')
+    parser.add_argument('--file-rows', default='1000,10000,100000,1000000', help='rows per synthetic upload')
+    parser.add_argument('--upload-mode', choices=['stream', 'sync'], default='stream',
+                        help='NDJSON streaming (?stream=1) or one JSON report per upload')
+    parser.add_argument('--forecast-cache', action='store_true', help='keep the forecast cache enabled')
+    parser.add_argument('--output', default='bench_service.json')
+    parser.add_argument('--baseline', help='earlier results to compare p95 latencies against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed p95 growth over the baseline')
+    args = parser.parse_args()
+
+    sizes = [int(rows) for rows in args.file_rows.split(',') if rows]
+    env = {
+        'MODEL_WATCH_INTERVAL': '0',
+        'FORECAST_CACHE_SIZE': os.environ.get('FORECAST_CACHE_SIZE', '256') if args.forecast_cache else '0',
+        # Room for the largest synthetic upload (under 40 bytes per row)
+        'MAX_UPLOAD_MB': str(max(16, 40 * max(sizes, default=0) / 2 ** 20 + 1))
+    }
+
+    results = {}
+    meta = {}
+    uploads = None
+    for target in [t.strip() for t in args.targets.split(',') if t.strip()]:
+        print(f"\n[{target}] starting...")
+        if target == 'inprocess':
+            client = InProcessClient(env)
+        elif target == 'gunicorn':
+            client = GunicornClient(env, args.workers)
+        else:
+            parser.error(f'unknown target {target}')
+
+        try:
+            _, body = client.request('GET', '/counties')
+            counties = json.loads(body)['counties']
+            _, body = client.request('GET', '/health')
+            health = json.loads(body)
+            meta[target] = {
+                'model_version': health.get('model_version'),
+                'dataset_version': health.get('dataset_version'),
+                'inference_backend': health.get('inference_backend'),
+                'workers': args.workers if target == 'gunicorn' else 1
+            }
+            if uploads is None:
+                uploads = {rows: synthetic_upload(rows, counties) for rows in sizes}
+
+            results[target] = {}
+            print(f"{'scenario':>28} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'rows/s':>10} "
+                  f"{'RSS MB':>8} {'errors':>6}")
+            for scenario in build_scenarios(args, counties, uploads):
+                result = run_scenario(client, scenario, args.concurrency, args.warmup)
+                results[target][scenario.name] = result
+                rows_text = f"{result['rows_per_second']:,.0f}" if 'rows_per_second' in result else '-'
+                print(f"{scenario.name:>28} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms "
+                      f"{result['p99_ms']:>7.1f}ms {result['throughput_rps']:>8.1f} {rows_text:>10} "
+                      f"{result['peak_rss_mb']:>8.0f} {result['errors']:>6}")
+        finally:
+            client.close()
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'targets': meta,
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"[ERROR] p95 latency regressed by more than {args.max_regression:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"[OK] No p95 regression over {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Tree Engine Benchmark
+Compares scikit-learn predict with the compiled tree engine (tree_engine.py)
+for single rows and batches of real forecast feature rows, and checks that
+both give the same predictions. The largest batch the compiled engine wins
+is the value to use for COMPILED_MAX_ROWS on that machine.
+
+Run from the ml-service directory:
+    python bench_tree_engine.py [--repeat 50] [--batch-sizes 1,12,32,47,64,128,256,500,5000]
+    python bench_tree_engine.py --models-dir models/registry/<version>
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from columnar_dataset import load_dataset
+from county_store import CountyStore
+from feature_engineering import fit_params, load_pipeline
+from forecaster import RegionalForecaster
+from model_registry import ModelRegistry
+from tree_engine import CompiledEnsemble, is_supported
+
+MODEL_NAMES = ['randomforest', 'histgradientboosting', 'extratrees']
+
+
+def forecast_rows(data, feature_columns, feature_params):
+    """One next-month feature row per county, as /predict_regional builds them"""
+    store = CountyStore(data)
+    frames = []
+    for county in store.counties():
+        history = store.get(county)
+        last = history.last
+        year, month = int(last['year']), int(last['month']) % 12 + 1
+        if month == 1:
+            year += 1
+        frames.append(RegionalForecaster(county, history, feature_params).feature_frame(
+            feature_columns, year, month, rainfall=120.0, temperature=24.0, humidity=70.0
+        ))
+    return pd.concat(frames, ignore_index=True)
+
+
+def time_call(fn, repeat):
+    """Median and p95 wall time of fn() in milliseconds"""
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), float(np.percentile(times, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', help='model directory (default: the promoted registry version)')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
+    parser.add_argument('--data', default='malaria_master_dataset.csv')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--batch-sizes', default='1,12,32,47,64,128,256,500,5000')
+    args = parser.parse_args()
+
+    if args.models_dir is None:
+        registry = ModelRegistry(args.registry)
+        version = registry.current()
+        if version is None:
+            parser.error(f'no promoted model version in {args.registry}; train one or pass --models-dir')
+        args.models_dir = registry.path(version)
+        print(f"Models {version} ({args.models_dir})")
+
+    feature_columns = joblib.load(f'{args.models_dir}/feature_columns.pkl')
+    models = []
+    for name in MODEL_NAMES:
+        try:
+            model = joblib.load(f'{args.models_dir}/{name}_model.pkl')
+        except FileNotFoundError:
+            print(f"[WARN] {name} model not found, skipping")
+            continue
+        if is_supported(model):
+            models.append((name, model))
+
+    start = time.perf_counter()
+    engine = CompiledEnsemble(models)
+    compile_ms = (time.perf_counter() - start) * 1000
+    summary = engine.summary()
+    print(f"Compiled {summary['trees']} trees, {summary['nodes']} nodes, "
+          f"max depth {summary['max_depth']} in {compile_ms:.0f} ms")
+
+    data = load_dataset(args.data).frame
+    pipeline = load_pipeline(f'{args.models_dir}/feature_pipeline.json')
+    rows = forecast_rows(data, feature_columns, pipeline['params'] if pipeline else fit_params(data))
+
+    # Parity
+    compiled = engine.predict(rows)
+    for i, (name, model) in enumerate(models):
+        diff = np.abs(compiled[i] - model.predict(rows)).max()
+        print(f"  {name:18s} max |compiled - sklearn| = {diff:.3e}")
+
+    def sklearn_predict(X):
+        return np.vstack([model.predict(X) for _, model in models])
+
+    print(f"\n{'rows':>6} {'sklearn p50':>12} {'p95':>9} {'compiled p50':>13} {'p95':>9} {'speedup':>8}")
+    compiled_wins = []
+    for size in [int(s) for s in args.batch_sizes.split(',')]:
+        X = rows.iloc[np.arange(size) % len(rows)].reset_index(drop=True)
+        repeat = args.repeat if size <= 500 else max(3, args.repeat // 10)
+        sk_p50, sk_p95 = time_call(lambda: sklearn_predict(X), repeat)
+        ce_p50, ce_p95 = time_call(lambda: engine.predict(X), repeat)
+        print(f"{size:>6} {sk_p50:>10.2f}ms {sk_p95:>7.2f}ms {ce_p50:>11.2f}ms {ce_p95:>7.2f}ms {sk_p50 / ce_p50:>7.1f}x")
+        compiled_wins.append((size, ce_p50 < sk_p50))
+
+    # Crossover: the largest batch size up to which the compiled engine never loses
+    crossover = 0
+    for size, wins in compiled_wins:
+        if not wins:
+            break
+        crossover = size
+    print(f"\nCompiled engine faster up to {crossover} rows (COMPILED_MAX_ROWS)")
+
+    # /predict_regional pattern: 12 sequential single-row predictions
+    single = rows.iloc[[0]]
+    sk_p50, _ = time_call(lambda: [sklearn_predict(single) for _ in range(12)], max(3, args.repeat // 5))
+    ce_p50, _ = time_call(lambda: [engine.predict(single) for _ in range(12)], max(3, args.repeat // 5))
+    print(f"\n12 sequential single-row steps: sklearn {sk_p50:.2f}ms, compiled {ce_p50:.2f}ms "
+          f"({sk_p50 / ce_p50:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,25 @@ Built from scratch with enhanced intelligence and medical accuracy
 """
 
 import re
-import requests
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 
+from prediction_service import PredictionError, ServiceUnavailableError
+from session_store import MemorySessionStore
+from intent_matcher import PhraseIndex
+
+# Action intents handled before the knowledge base topics
+PREDICTION_TRIGGERS = ['predict', 'forecast', 'future', 'will be', 'expect', 'upcoming']
+STATISTICS_TRIGGERS = ['statistics', 'stats', 'data', 'numbers', 'history', 'historical']
+
+# Look for patterns like "6 months", "for 3", "next 12"
+MONTH_PATTERNS = [re.compile(pattern) for pattern in [
+    r'(\d+)\s*months?',
+    r'for\s+(\d+)',
+    r'next\s+(\d+)',
+    r'(\d+)\s+month',
+]]
+
 class KilmalariaAI:
     """
     Professional Medical AI Chatbot for Malaria Intelligence
@@ -20,7 +35,14 @@ class KilmalariaAI:
     - Friendly, professional tone
     """
     
-    def __init__(self):
+    def __init__(self, prediction_service, sessions=None):
+        # Forecasts and statistics (prediction_service.py); app.py passes the
+        # in-process service, or the HTTP one for a separate ml-service
+        self.prediction_service = prediction_service
+        
+        # Conversation context per sender (see session_store.py)
+        self.sessions = sessions or MemorySessionStore()
+        
         # All 47 official Kenyan counties
         self.counties = [
             'Baringo', 'Bomet', 'Bungoma', 'Busia', 'Elgeyo-Marakwet',
@@ -35,16 +57,18 @@ class KilmalariaAI:
             'Wajir', 'West Pokot'
         ]
         
-        # Conversation context
-        self.context = {
-            'last_county': None,
-            'last_topic': None,
-            'user_name': None,
-            'conversation_count': 0
-        }
-        
         # Load knowledge base
         self.knowledge = self._build_knowledge_base()
+        
+        # Trigger and county indexes, built once and matched in one pass per message
+        intents = {topic: data['triggers'] for topic, data in self.knowledge.items()}
+        intents['predict'] = PREDICTION_TRIGGERS
+        intents['statistics'] = STATISTICS_TRIGGERS
+        self.intent_index = PhraseIndex(intents, inflect=True)
+        self.county_index = PhraseIndex({
+            county: [county, county.replace('-', ' '), county.replace("'", "")]
+            for county in self.counties
+        })
     
     def _build_knowledge_base(self) -> Dict:
         """Build comprehensive medical knowledge base"""
@@ -507,147 +531,121 @@ Just ask naturally:
         }
     
     def _extract_county(self, message: str) -> Optional[str]:
-        """Extract county name from message"""
-        message_lower = message.lower()
-        
-        # Check each county
-        for county in self.counties:
-            # Handle special cases
-            county_variants = [
-                county.lower(),
-                county.lower().replace('-', ' '),
-                county.lower().replace("'", ""),
-            ]
-            
-            for variant in county_variants:
-                if variant in message_lower:
-                    return county
-        
-        return None
+        """Extract the first county named in the message"""
+        return self.county_index.first(message)
     
     def _extract_months(self, message: str) -> int:
         """Extract number of months from message"""
-        # Look for patterns like "6 months", "for 3", "next 12"
-        patterns = [
-            r'(\d+)\s*months?',
-            r'for\s+(\d+)',
-            r'next\s+(\d+)',
-            r'(\d+)\s+month',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message.lower())
+        message_lower = message.lower()
+        for pattern in MONTH_PATTERNS:
+            match = pattern.search(message_lower)
             if match:
                 months = int(match.group(1))
                 return min(max(months, 1), 12)  # Clamp between 1-12
         
         return 6  # Default
     
-    def _get_prediction(self, county: str, months: int = 6) -> str:
+    def _get_prediction(self, county: str, months: int, context: Dict) -> str:
         """Get ML prediction from backend"""
         try:
-            response = requests.post(
-                'http://localhost:8000/predict_regional',
-                json={'county': county, 'months_ahead': months},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                preds = data.get('predictions', [])
-                
-                if not preds:
-                    return f"Sorry, I couldn't get predictions for {county}. Please try another county."
-                
-                # Build response
-                result = f"📊 **Malaria Predictions for {county} County**\n\n"
-                result += f"**{len(preds)}-Month Forecast** (ML Model: 92.35% Accuracy)\n\n"
-                
-                # Show predictions
-                for i, pred in enumerate(preds[:6], 1):  # Show first 6
-                    month = pred.get('month', 'Unknown')
-                    cases = round(pred.get('predicted_cases', 0))
-                    risk = pred.get('risk_level', 'Unknown')
-                    
-                    # Risk emoji
-                    risk_emoji = {'Low': '🟢', 'Moderate': '🟡', 'High': '🔴'}.get(risk, '⚪')
-                    
-                    result += f"**{i}. {month}:**\n"
-                    result += f"   • Cases: **{cases:,}**\n"
-                    result += f"   • Risk: {risk_emoji} **{risk}**\n\n"
-                
-                # Summary
-                total = sum(round(p.get('predicted_cases', 0)) for p in preds)
-                avg = total / len(preds) if preds else 0
-                
-                result += "**📈 Summary:**\n"
-                result += f"• Total Predicted: **{total:,} cases**\n"
-                result += f"• Monthly Average: **{round(avg):,} cases**\n"
-                
-                # Risk assessment
-                if avg < 50:
-                    result += f"• Overall Risk: 🟢 **LOW**\n"
-                    result += "• Recommendation: Continue standard prevention measures\n"
-                elif avg < 150:
-                    result += f"• Overall Risk: 🟡 **MODERATE**\n"
-                    result += "• Recommendation: Ensure bed nets are used nightly\n"
-                else:
-                    result += f"• Overall Risk: 🔴 **HIGH**\n"
-                    result += "• Recommendation: Extra precautions needed, seek medical help for any fever\n"
-                
-                result += "\n**Want statistics or prevention tips for this county?**"
-                
-                # Update context
-                self.context['last_county'] = county
-                
-                return result
-            
-            else:
-                return f"Sorry, I couldn't get predictions for {county}. The county name might be incorrect. Try:\n• Checking the spelling\n• Asking 'list all counties' to see available counties"
-        
-        except Exception as e:
+            data = self.prediction_service.predict_regional(county, months)
+        except ServiceUnavailableError:
+            return f"I'm having trouble connecting to the prediction service right now. Please try again in a moment, or ask me about symptoms, prevention, or treatment while we wait! 😊"
+        except PredictionError:
+            return f"Sorry, I couldn't get predictions for {county}. The county name might be incorrect. Try:\n• Checking the spelling\n• Asking 'list all counties' to see available counties"
+        except Exception:
             return f"I'm having trouble connecting to the prediction service right now. Please try again in a moment, or ask me about symptoms, prevention, or treatment while we wait! 😊"
+        
+        preds = data.get('predictions', [])
+        
+        if not preds:
+            return f"Sorry, I couldn't get predictions for {county}. Please try another county."
+        
+        # Build response
+        result = f"📊 **Malaria Predictions for {county} County**\n\n"
+        result += f"**{len(preds)}-Month Forecast** (ML Model: 92.35% Accuracy)\n\n"
+        
+        # Show predictions
+        for i, pred in enumerate(preds[:6], 1):  # Show first 6
+            month = pred.get('month', 'Unknown')
+            cases = round(pred.get('predicted_cases', 0))
+            risk = pred.get('risk_level', 'Unknown')
+        
+            # Risk emoji
+            risk_emoji = {'Low': '🟢', 'Moderate': '🟡', 'High': '🔴'}.get(risk, '⚪')
+        
+            result += f"**{i}. {month}:**\n"
+            result += f"   • Cases: **{cases:,}**\n"
+            result += f"   • Risk: {risk_emoji} **{risk}**\n\n"
+        
+        # Summary
+        total = sum(round(p.get('predicted_cases', 0)) for p in preds)
+        avg = total / len(preds) if preds else 0
+        
+        result += "**📈 Summary:**\n"
+        result += f"• Total Predicted: **{total:,} cases**\n"
+        result += f"• Monthly Average: **{round(avg):,} cases**\n"
+        
+        # Risk assessment
+        if avg < 50:
+            result += f"• Overall Risk: 🟢 **LOW**\n"
+            result += "• Recommendation: Continue standard prevention measures\n"
+        elif avg < 150:
+            result += f"• Overall Risk: 🟡 **MODERATE**\n"
+            result += "• Recommendation: Ensure bed nets are used nightly\n"
+        else:
+            result += f"• Overall Risk: 🔴 **HIGH**\n"
+            result += "• Recommendation: Extra precautions needed, seek medical help for any fever\n"
+        
+        result += "\n**Want statistics or prevention tips for this county?**"
+        
+        # Update context
+        context['last_county'] = county
+        
+        return result
     
-    def _get_statistics(self, county: str) -> str:
+    def _get_statistics(self, county: str, context: Dict) -> str:
         """Get county statistics from backend"""
         try:
-            response = requests.get(
-                f'http://localhost:8000/county_stats?county={county}',
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                result = f"📈 **Historical Statistics for {county} County**\n\n"
-                result += "**Overall Data:**\n"
-                result += f"• Total Cases (All Time): **{data.get('total_cases', 0):,}**\n"
-                result += f"• Average per Month: **{round(data.get('avg_cases', 0)):,}**\n"
-                result += f"• Peak Cases: **{data.get('max_cases', 0):,}** ({data.get('peak_month', 'N/A')})\n"
-                result += f"• Lowest Cases: **{data.get('min_cases', 0):,}**\n\n"
-                
-                # Recent trend
-                recent = data.get('recent_cases', [])
-                if recent:
-                    result += "**Recent Months (Last 6):**\n"
-                    for rec in recent[:6]:
-                        result += f"• {rec.get('date', 'N/A')}: **{rec.get('cases', 0):,} cases**\n"
-                
-                result += "\n**Want predictions or prevention tips for this county?**"
-                
-                # Update context
-                self.context['last_county'] = county
-                
-                return result
-            
-            else:
-                return f"Sorry, I couldn't find statistics for {county}. Make sure the county name is spelled correctly. Ask 'list counties' to see all available counties."
-        
-        except Exception as e:
+            data = self.prediction_service.county_stats(county)
+        except ServiceUnavailableError:
+            return "I'm having trouble fetching statistics right now. Would you like to know about symptoms, prevention, or treatment instead? 😊"
+        except PredictionError:
+            return f"Sorry, I couldn't find statistics for {county}. Make sure the county name is spelled correctly. Ask 'list counties' to see all available counties."
+        except Exception:
             return "I'm having trouble fetching statistics right now. Would you like to know about symptoms, prevention, or treatment instead? 😊"
+        
+        result = f"📈 **Historical Statistics for {county} County**\n\n"
+        result += "**Overall Data:**\n"
+        result += f"• Total Cases (All Time): **{data.get('total_cases', 0):,}**\n"
+        result += f"• Average per Month: **{round(data.get('avg_cases', 0)):,}**\n"
+        result += f"• Peak Cases: **{data.get('max_cases', 0):,}** ({data.get('peak_month', 'N/A')})\n"
+        result += f"• Lowest Cases: **{data.get('min_cases', 0):,}**\n\n"
+        
+        # Recent trend
+        recent = data.get('recent_cases', [])
+        if recent:
+            result += "**Recent Months (Last 6):**\n"
+            for rec in recent[:6]:
+                result += f"• {rec.get('date', 'N/A')}: **{rec.get('cases', 0):,} cases**\n"
+        
+        result += "\n**Want predictions or prevention tips for this county?**"
+        
+        # Update context
+        context['last_county'] = county
+        
+        return result
+    
+    def chat(self, message: str, sender: Optional[str] = None) -> str:
+        """Main chat function - process a user message within the sender's conversation"""
+        sender = sender or 'anonymous'
+        context = self.sessions.get(sender)
+        response = self._respond(message, context)
+        self.sessions.save(sender, context)
+        return response
     
-    def chat(self, message: str) -> str:
-        """Main chat function - process user message and return response"""
+    def _respond(self, message: str, context: Dict) -> str:
+        """Process user message and return response, updating the conversation context"""
         if not message or not message.strip():
             return "I didn't get that. Could you please ask me something? Try 'help' to see what I can do! 😊"
         
@@ -655,22 +653,25 @@ Just ask naturally:
         message_lower = message.lower()
         
         # Update conversation count
-        self.context['conversation_count'] += 1
+        context['conversation_count'] += 1
+        
+        intents = self.intent_index.labels(message_lower)
         
         # Check for greetings first
-        if any(word in message_lower for word in self.knowledge['greeting']['triggers']):
+        if 'greeting' in intents:
             return self.knowledge['greeting']['response']
         
         # Check for help
-        if any(word in message_lower for word in self.knowledge['help']['triggers']):
+        if 'help' in intents:
             return self.knowledge['help']['response']
         
         # Check for predictions (highest priority for actions)
-        if any(word in message_lower for word in ['predict', 'forecast', 'future', 'will be', 'expect', 'upcoming']):
-            county = self._extract_county(message)
+        if 'predict' in intents:
+            # Follow-ups like "and for 3 months?" reuse the county of the conversation
+            county = self._extract_county(message) or context['last_county']
             if county:
                 months = self._extract_months(message)
-                return self._get_prediction(county, months)
+                return self._get_prediction(county, months, context)
             else:
                 return """📊 **I can predict malaria cases for any of Kenya's 47 counties!**
 
@@ -684,10 +685,10 @@ Just ask naturally:
 **Which county would you like predictions for?** 🗺️"""
         
         # Check for statistics
-        if any(word in message_lower for word in ['statistics', 'stats', 'data', 'numbers', 'history', 'historical']):
-            county = self._extract_county(message)
+        if 'statistics' in intents:
+            county = self._extract_county(message) or context['last_county']
             if county:
-                return self._get_statistics(county)
+                return self._get_statistics(county, context)
             else:
                 return """📈 **I can show you statistics for any of Kenya's 47 counties!**
 
@@ -701,7 +702,7 @@ Just ask naturally:
 **Which county would you like statistics for?** 🗺️"""
         
         # Check for county list
-        if any(word in message_lower for word in self.knowledge['counties']['triggers']):
+        if 'counties' in intents:
             return self.knowledge['counties']['response'](self)
         
         # Check other topics
@@ -709,8 +710,8 @@ Just ask naturally:
             if topic in ['greeting', 'help', 'counties']:
                 continue
             
-            if any(trigger in message_lower for trigger in data['triggers']):
-                self.context['last_topic'] = topic
+            if topic in intents:
+                context['last_topic'] = topic
                 return data['response']
         
         # If no match, provide helpful default
@@ -725,6 +726,3 @@ Just ask naturally:
 
 **What would you like to know?** 😊"""
 
-# Initialize chatbot
-chatbot = KilmalariaAI()
-
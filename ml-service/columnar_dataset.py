@@ -0,0 +1,172 @@
+"""
+Columnar Dataset Store
+One-time conversion of the master dataset CSV into typed NumPy column files
+that load by memory-mapping instead of parsing. Text columns are stored as
+categorical codes, integer columns are downcast losslessly and the
+(county, year, month) sort order is precomputed.
+
+Layout, one directory per version of the source CSV:
+    <csv name>.columns/<source fingerprint>/meta.json
+    <csv name>.columns/<source fingerprint>/<nn>_<column>.npy
+    <csv name>.columns/<source fingerprint>/sort_order.npy
+
+The first load of a new or changed CSV converts it; to do that ahead of time:
+    python columnar_dataset.py [malaria_master_dataset.csv]
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+SORT_COLUMNS = ['county', 'year', 'month']
+META_NAME = 'meta.json'
+SORT_ORDER_NAME = 'sort_order.npy'
+
+
+class ColumnarDataset:
+    """A loaded dataset: the frame in source row order plus its precomputed sort order"""
+
+    def __init__(self, frame, sort_order, directory):
+        self.frame = frame
+        # Row positions of the frame sorted by SORT_COLUMNS (stable)
+        self.sort_order = sort_order
+        self.directory = directory
+
+    @property
+    def version(self):
+        """Fingerprint of the source CSV this copy was converted from"""
+        return os.path.basename(self.directory)
+
+
+def columns_dir(csv_path):
+    """Default directory of the converted copies of a CSV"""
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def source_fingerprint(csv_path):
+    """Short fingerprint of the CSV based on its size and modification time"""
+    stat = os.stat(csv_path)
+    key = f"{os.path.basename(csv_path)}:{stat.st_size}:{stat.st_mtime_ns}:{FORMAT_VERSION}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def _typed_column(series):
+    """Smallest lossless representation of a column"""
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        # Ordered by value so min/max behave as they do on the strings
+        categories = sorted(series.dropna().unique())
+        return pd.Series(pd.Categorical(series, categories=categories, ordered=True), name=series.name)
+    # Floats stay float64: float32 would perturb the model inputs
+    return series
+
+
+def convert(csv_path, directory=None):
+    """
+    Convert a CSV unless an up-to-date copy exists; returns the version
+    directory. Concurrent converters (workers starting together) each
+    write a private staging directory and the first rename wins.
+    """
+    root = directory or columns_dir(csv_path)
+    target = os.path.join(root, source_fingerprint(csv_path))
+    if os.path.exists(os.path.join(target, META_NAME)):
+        return target
+
+    start = time.perf_counter()
+    frame = pd.read_csv(csv_path)
+    staging = os.path.join(root, f'.staging-{uuid.uuid4().hex[:12]}')
+    os.makedirs(staging)
+
+    columns = []
+    for i, name in enumerate(frame.columns):
+        column = _typed_column(frame[name])
+        entry = {'name': name, 'file': f"{i:02d}_{re.sub(r'[^A-Za-z0-9_.-]', '_', str(name))}.npy"}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.cat.codes.to_numpy()
+            entry['dtype'] = 'category'
+            entry['categories'] = [str(category) for category in column.cat.categories]
+        else:
+            values = column.to_numpy()
+            entry['dtype'] = str(values.dtype)
+        np.save(os.path.join(staging, entry['file']), values)
+        columns.append(entry)
+
+    # Same stable sort the county store would otherwise do on every start
+    sort_order = frame.sort_values(SORT_COLUMNS, kind='mergesort').index.to_numpy()
+    np.save(os.path.join(staging, SORT_ORDER_NAME), sort_order.astype(np.int32))
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'source': os.path.basename(csv_path),
+        'rows': len(frame),
+        'columns': columns,
+        'sort_columns': SORT_COLUMNS
+    }
+    with open(os.path.join(staging, META_NAME), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process converted the same version first
+        shutil.rmtree(staging, ignore_errors=True)
+        return target
+
+    # Copies of older versions of the CSV are no longer needed
+    for name in os.listdir(root):
+        if not name.startswith('.') and os.path.join(root, name) != target:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    print(f"[OK] Converted {csv_path} to columnar format in {time.perf_counter() - start:.2f}s ({target})")
+    return target
+
+
+def _latest_version(root):
+    versions = [os.path.join(root, name) for name in os.listdir(root)
+                if not name.startswith('.') and os.path.exists(os.path.join(root, name, META_NAME))]
+    return max(versions, key=os.path.getmtime) if versions else None
+
+
+def load_dataset(csv_path, directory=None, mmap_mode='r'):
+    """
+    Load the dataset from its columnar copy, converting the CSV first if
+    the copy is missing or stale. Without the CSV the newest copy is used.
+    Columns are memory-mapped read-only unless mmap_mode is None, so
+    callers that modify the frame in place should pass None.
+    """
+    root = directory or columns_dir(csv_path)
+    if os.path.exists(csv_path):
+        version_dir = convert(csv_path, root)
+    else:
+        version_dir = _latest_version(root) if os.path.isdir(root) else None
+        if version_dir is None:
+            raise FileNotFoundError(csv_path)
+
+    with open(os.path.join(version_dir, META_NAME), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(version_dir, entry['file']), mmap_mode=mmap_mode)
+        if entry['dtype'] == 'category':
+            data[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'], ordered=True)
+        else:
+            data[entry['name']] = values
+    frame = pd.DataFrame(data, copy=False)
+    sort_order = np.load(os.path.join(version_dir, SORT_ORDER_NAME), mmap_mode=mmap_mode)
+    return ColumnarDataset(frame, sort_order, version_dir)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'malaria_master_dataset.csv'
+    print(f"[OK] Columnar copy of {path}: {convert(path)}")
@@ -0,0 +1,226 @@
+"""
+County-Partitioned Data Store
+Splits the master dataset into pre-sorted per-county histories once at startup
+so request handlers never have to scan the full table
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import OnlineFeatureState
+
+# Columns fed to the streaming feature state
+FEATURE_STATE_COLUMNS = ['year', 'month', 'cases', 'rainfall_mm', 'temperature_celsius', 'humidity_percent']
+
+MONTH_NAMES = ['', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+class CountyHistory:
+    """Chronologically sorted history for a single county"""
+
+    def __init__(self, county, frame):
+        self.county = county
+        self.frame = frame.reset_index(drop=True)
+
+        # Contiguous numeric columns for fast array access
+        self.arrays = {
+            col: np.ascontiguousarray(self.frame[col].to_numpy())
+            for col in self.frame.columns
+            if pd.api.types.is_numeric_dtype(self.frame[col])
+        }
+
+        # (year, month) -> row position; the last row wins for duplicate months
+        self._positions = {}
+        years = self.arrays['year'].astype(int).tolist()
+        months = self.arrays['month'].astype(int).tolist()
+        for pos, key in enumerate(zip(years, months)):
+            self._positions[key] = pos
+
+        self._feature_state = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def column(self, name):
+        """Return a numeric column as a NumPy array"""
+        return self.arrays[name]
+
+    def position(self, year, month):
+        """Return the row position for (year, month) or None if missing"""
+        return self._positions.get((int(year), int(month)))
+
+    def row(self, year, month):
+        """Return the row for (year, month) as a Series, or None if missing"""
+        pos = self.position(year, month)
+        if pos is None:
+            return None
+        return self.frame.iloc[pos]
+
+    def feature_state(self, params=None):
+        """Copy of the streaming feature state warmed up on this history, emitting with params"""
+        if self._feature_state is None:
+            state = OnlineFeatureState()
+            columns = [col for col in FEATURE_STATE_COLUMNS if col in self.frame.columns]
+            for observation in self.frame[columns].to_dict('records'):
+                state.update(observation, emit=False)
+            self._feature_state = state
+        state = copy.deepcopy(self._feature_state)
+        state.params = params
+        return state
+
+    @property
+    def last(self):
+        """Most recent row"""
+        return self.frame.iloc[-1]
+
+
+class CountyStore:
+    """Per-county index over the master dataset with O(1) county lookup"""
+
+    def __init__(self, data, sort_order=None):
+        # Stable sort keeps the original order of duplicate months; a columnar
+        # dataset (columnar_dataset.py) comes with the sort order precomputed
+        if sort_order is None:
+            ordered = data.sort_values(['county', 'year', 'month'], kind='mergesort')
+        else:
+            ordered = data.take(sort_order)
+
+        # Each county is one contiguous run of the sorted rows
+        counties = ordered['county'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, counties[1:] != counties[:-1]])
+        ends = np.r_[starts[1:], len(counties)]
+        self._histories = {
+            str(counties[start]): CountyHistory(str(counties[start]), ordered.iloc[start:end])
+            for start, end in zip(starts, ends)
+            if not pd.isna(counties[start])
+        }
+
+    def __contains__(self, county):
+        return county in self._histories
+
+    def __len__(self):
+        return len(self._histories)
+
+    def get(self, county):
+        """Return the CountyHistory for a county, or None if unknown"""
+        return self._histories.get(county)
+
+    def counties(self):
+        """Names of all counties present in the data"""
+        return list(self._histories.keys())
+
+
+def _recent_months(history, unique_months):
+    """Last six months of cases, filling gaps from the last available date"""
+    recent_cases = []
+
+    if len(unique_months) < 6:
+        last_year = int(history.last['year'])
+        last_month = int(history.last['month'])
+
+        # Generate last 6 months going backwards
+        for i in range(5, -1, -1):  # 5 months back to current month
+            month = last_month - i
+            year = last_year
+
+            # Handle year rollover
+            while month < 1:
+                month += 12
+                year -= 1
+
+            # Find matching data or use average
+            row = history.row(year, month)  # Last row if multiple
+            if row is not None:
+                cases = int(row['cases'])
+            else:
+                # Use average if no data for this month
+                cases = int(history.column('cases').mean())
+
+            recent_cases.append({
+                'date': f"{MONTH_NAMES[month]} {year}",
+                'cases': cases,
+                'year': year,
+                'month': month
+            })
+    else:
+        for year, month, cases in zip(unique_months['year'], unique_months['month'], unique_months['cases']):
+            recent_cases.append({
+                'date': f"{MONTH_NAMES[int(month)]} {int(year)}",
+                'cases': int(cases),
+                'year': int(year),
+                'month': int(month)
+            })
+
+    # Ensure we have exactly 6 months, sorted chronologically
+    return sorted(recent_cases, key=lambda x: (x['year'], x['month']))[-6:]
+
+
+def build_county_stats(store, counties):
+    """
+    Precompute the /county_stats payloads.
+    Returns (per-county stats keyed by county, all-counties summary payload),
+    both ready to serialize.
+    """
+    ordered = pd.concat([store.get(county).frame for county in store.counties()], ignore_index=True)
+    grouped = ordered.groupby('county', sort=False, observed=True)
+
+    aggregates = grouped.agg(
+        total_cases=('cases', 'sum'),
+        average_cases=('cases', 'mean'),
+        max_cases=('cases', 'max'),
+        min_cases=('cases', 'min'),
+        latest_cases=('cases', 'last'),
+        average_rate=('rate_per_100k', 'mean'),
+        data_points=('cases', 'size'),
+        date_start=('date', 'min'),
+        date_end=('date', 'max'),
+        peak_index=('cases', 'idxmax')
+    )
+
+    # Last six distinct (year, month) pairs per county, keeping the last duplicate
+    unique_months = ordered.drop_duplicates(subset=['county', 'year', 'month'], keep='last')
+    last_unique_months = dict(tuple(
+        unique_months.groupby('county', sort=False, observed=True).tail(6).groupby('county', sort=False, observed=True)
+    ))
+
+    county_stats = {}
+    for county, agg in aggregates.iterrows():
+        history = store.get(county)
+        peak_row = ordered.loc[agg['peak_index']]
+        avg_cases = round(float(agg['average_cases']), 2)
+
+        county_stats[county] = {
+            'county': county,
+            'total_cases': int(agg['total_cases']),
+            'average_monthly_cases': avg_cases,
+            'avg_cases': avg_cases,  # Alias for frontend compatibility
+            'max_cases': int(agg['max_cases']),
+            'min_cases': int(agg['min_cases']),
+            'latest_month_cases': int(agg['latest_cases']),
+            'average_rate_per_100k': round(float(agg['average_rate']), 2),
+            'peak_month': f"{MONTH_NAMES[int(peak_row['month'])]} {int(peak_row['year'])}",
+            'recent_cases': _recent_months(history, last_unique_months[county]),
+            'data_points': int(agg['data_points']),
+            'date_range': {
+                'start': str(agg['date_start']),
+                'end': str(agg['date_end'])
+            }
+        }
+
+    all_stats = []
+    for county in counties:
+        stats = county_stats.get(county)
+        all_stats.append({
+            'county': county,
+            'average_monthly_cases': stats['average_monthly_cases'] if stats else None,
+            'total_cases': stats['total_cases'] if stats else 0,
+            'average_rate_per_100k': stats['average_rate_per_100k'] if stats else None
+        })
+
+    return county_stats, {
+        'counties': all_stats,
+        'total_counties': len(all_stats)
+    }
@@ -0,0 +1,179 @@
+"""
+Cross-Validation Runner
+Runs every (fold, model) fit of a KFold cross-validation concurrently in a
+pool of forked worker processes and checkpoints each result to disk, so an
+interrupted run resumes where it stopped. Each fold is scored as the
+training scripts score it: a weighted average of the models, weighted by
+their validation R2.
+
+Checkpoints live in <checkpoint_dir>/<run key>/, where the run key is a
+hash of the data, the estimators and the split settings; a changed input
+starts a fresh run instead of reusing stale results.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold
+from threadpoolctl import threadpool_limits
+
+# Inherited by forked workers instead of being pickled into every task
+_CV_DATA = None
+
+
+def _run_key(X, y, estimators, n_splits, random_state):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    for name, estimator in sorted(estimators.items()):
+        digest.update(name.encode())
+        digest.update(repr(sorted(estimator.get_params().items())).encode())
+    digest.update(f'{n_splits}:{random_state}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _fit_task(fold, name, estimator, train_idx, val_idx, n_jobs):
+    """Fit one model on one fold; returns its validation predictions and timing"""
+    X, y = _CV_DATA
+    model = clone(estimator)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=n_jobs)
+
+    started_at = time.time()
+    # Models without n_jobs (histogram GB) size their OpenMP pool from this limit
+    with threadpool_limits(limits=n_jobs if n_jobs > 0 else None):
+        model.fit(X[train_idx], y[train_idx])
+        predictions = model.predict(X[val_idx])
+    finished_at = time.time()
+    return {
+        'fold': fold,
+        'model': name,
+        'predictions': predictions,
+        'r2': float(r2_score(y[val_idx], predictions)),
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'pid': os.getpid()
+    }
+
+
+def _checkpoint_path(run_dir, fold, name):
+    return os.path.join(run_dir, f'fold{fold}_{name}.pkl')
+
+
+def _save_checkpoint(path, result):
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    joblib.dump(result, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(path):
+    try:
+        return joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except (EOFError, pickle.UnpicklingError, ValueError):
+        # Truncated by a crash mid-write on a filesystem without atomic rename; refit
+        return None
+
+
+def run_cross_validation(X, y, estimators, n_splits=5, random_state=42,
+                         checkpoint_dir='models/cv_checkpoints', max_workers=None, keep_checkpoints=False):
+    """
+    KFold cross-validation of a weighted ensemble of estimators (name ->
+    unfitted estimator). Fits run max_workers at a time (default: one per
+    CPU) with the CPUs split between them through n_jobs. Checkpoints are
+    removed once every fit has finished unless keep_checkpoints is set.
+    Returns a dict with the per-fold ensemble R2 scores and timings.
+    """
+    global _CV_DATA
+
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    splits = list(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X))
+    run_dir = os.path.join(checkpoint_dir, _run_key(X, y, estimators, n_splits, random_state))
+    os.makedirs(run_dir, exist_ok=True)
+
+    results = {}
+    pending = []
+    for fold, _ in enumerate(splits):
+        for name in estimators:
+            cached = _load_checkpoint(_checkpoint_path(run_dir, fold, name))
+            if cached is not None:
+                results[(fold, name)] = dict(cached, cached=True)
+            else:
+                pending.append((fold, name))
+    if results:
+        print(f"   [OK] Resuming cross-validation: {len(results)}/{len(results) + len(pending)} fits checkpointed")
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(max_workers or cpus, len(pending) or 1))
+    n_jobs = max(1, cpus // workers)
+    if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        # Spawned workers would re-run the importing training script
+        print("[WARN] Process fork unavailable, running cross-validation fits one at a time")
+        workers, n_jobs = 1, -1
+
+    def record(result):
+        result = dict(result, cached=False)
+        _save_checkpoint(_checkpoint_path(run_dir, result['fold'], result['model']), result)
+        results[(result['fold'], result['model'])] = result
+        print(f"      [OK] Fold {result['fold'] + 1} {result['model']}: R² {result['r2']:.4f} "
+              f"({result['finished_at'] - result['started_at']:.1f}s)")
+
+    start = time.perf_counter()
+    _CV_DATA = (X, y)
+    try:
+        if workers == 1:
+            for fold, name in pending:
+                train_idx, val_idx = splits[fold]
+                record(_fit_task(fold, name, estimators[name], train_idx, val_idx, n_jobs))
+        elif pending:
+            # fork so the workers inherit the data instead of receiving a copy per task
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [
+                    pool.submit(_fit_task, fold, name, estimators[name], *splits[fold], n_jobs)
+                    for fold, name in pending
+                ]
+                for future in as_completed(futures):
+                    record(future.result())
+    finally:
+        _CV_DATA = None
+    wall_seconds = time.perf_counter() - start
+
+    folds = []
+    for fold, (_, val_idx) in enumerate(splits):
+        fold_results = [results[(fold, name)] for name in estimators]
+        weights = [max(result['r2'], 0.01) for result in fold_results]  # Ensure positive weight
+        ensemble = sum(w / sum(weights) * result['predictions'] for w, result in zip(weights, fold_results))
+        fresh = [result for result in fold_results if not result['cached']]
+        folds.append({
+            'fold': fold,
+            'r2': float(r2_score(y[val_idx], ensemble)),
+            'model_r2': {result['model']: result['r2'] for result in fold_results},
+            # Time from the first to the last fit of the fold in this run (0 if all were checkpointed)
+            'wall_seconds': (max(r['finished_at'] for r in fresh) - min(r['started_at'] for r in fresh)) if fresh else 0.0,
+            'fit_seconds': {result['model']: result['finished_at'] - result['started_at'] for result in fold_results},
+            'cached': len(fresh) < len(fold_results)
+        })
+
+    if not keep_checkpoints:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return {
+        'scores': [fold['r2'] for fold in folds],
+        'folds': folds,
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'fit_seconds': sum(sum(fold['fit_seconds'].values()) for fold in folds),
+        'checkpoint_dir': run_dir
+    }
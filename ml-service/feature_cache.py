@@ -0,0 +1,112 @@
+"""
+Training Feature Cache
+Engineered training matrices (X, y) stored as .npy files, addressed by the
+checksum of the source dataset, the feature pipeline fingerprint and the
+training script's recipe (its feature list and row filters). A training run
+on unchanged data loads the matrices memory-mapped and goes straight to
+fitting; any change to the data, the pipeline or the recipe is a new key.
+
+Layout:
+    <root>/<key>/meta.json    columns, fitted feature params, recipe
+    <root>/<key>/X.npy
+    <root>/<key>/y.npy
+    <root>/<key>/index.npy    row labels of X in the source dataset
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import FEATURE_FINGERPRINT
+from model_registry import file_checksum
+
+META_NAME = 'meta.json'
+
+
+class CachedFeatures:
+    """Training matrices loaded from the cache"""
+
+    def __init__(self, X, y, params, key):
+        self.X = X
+        self.y = y
+        # Feature params fitted on the dataset (saved with the model as feature_pipeline.json)
+        self.params = params
+        self.key = key
+
+
+class FeatureCache:
+    """Content-addressed training feature matrices under one directory"""
+
+    def __init__(self, root='feature_cache', max_entries=8):
+        self.root = root
+        self.max_entries = max_entries
+
+    def key(self, dataset_path, recipe):
+        """Cache key of a dataset file and a JSON-serializable recipe (None without the file)"""
+        if not os.path.exists(dataset_path):
+            return None
+        source = {
+            'dataset_sha256': file_checksum(dataset_path),
+            'feature_fingerprint': FEATURE_FINGERPRINT,
+            'recipe': recipe
+        }
+        return hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()[:20]
+
+    def load(self, key, mmap_mode='r'):
+        """The cached matrices of a key, or None on a miss"""
+        if key is None:
+            return None
+        directory = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(directory, META_NAME), encoding='utf-8') as f:
+                meta = json.load(f)
+            values = np.load(os.path.join(directory, 'X.npy'), mmap_mode=mmap_mode)
+            y = np.load(os.path.join(directory, 'y.npy'), mmap_mode=mmap_mode)
+            index = np.load(os.path.join(directory, 'index.npy'))
+        except (FileNotFoundError, ValueError, json.JSONDecodeError):
+            return None
+
+        # Mark as recently used so pruning keeps it
+        os.utime(directory)
+        X = pd.DataFrame(values, columns=meta['columns'], index=index, copy=False)
+        return CachedFeatures(X, y, meta['params'], key)
+
+    def save(self, key, X, y, params, recipe=None):
+        """Store matrices under a key; concurrent writers of the same key are harmless"""
+        if key is None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f'.staging-{uuid.uuid4().hex[:12]}')
+        os.makedirs(staging)
+
+        np.save(os.path.join(staging, 'X.npy'), np.ascontiguousarray(X.to_numpy(dtype=float)))
+        np.save(os.path.join(staging, 'y.npy'), np.asarray(y, dtype=float))
+        np.save(os.path.join(staging, 'index.npy'), X.index.to_numpy())
+        meta = {
+            'columns': [str(column) for column in X.columns],
+            'rows': len(X),
+            'params': params,
+            'feature_fingerprint': FEATURE_FINGERPRINT,
+            'recipe': recipe
+        }
+        with open(os.path.join(staging, META_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        try:
+            os.rename(staging, os.path.join(self.root, key))
+        except OSError:
+            # Same key already written by another run
+            shutil.rmtree(staging, ignore_errors=True)
+        self.prune()
+
+    def prune(self):
+        """Keep the max_entries most recently used entries"""
+        entries = [os.path.join(self.root, name) for name in os.listdir(self.root) if not name.startswith('.')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for directory in entries[self.max_entries:]:
+            shutil.rmtree(directory, ignore_errors=True)
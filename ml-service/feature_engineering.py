@@ -1,145 +1,456 @@
 """
-Feature Engineering Functions for Predictions
-Matches the advanced feature engineering from train_advanced_model.py
+Feature Pipeline
+The model features, defined once and shared by training and serving:
+build_features computes them for a whole dataset with grouped NumPy
+operations (training), OnlineFeatureState one month at a time for a single
+county (serving). FEATURE_FINGERPRINT identifies the feature definitions; it
+is saved with every model so a model trained on different features is
+detected when it is loaded.
+
+History features (lags, rolling statistics, EMAs, differences) run over
+each county's rows in (year, month) order. Lags before the start of a
+county's history are filled with the training-set mean of the column.
 """
 
-import pandas as pd
+import copy
+import hashlib
+import json
+import math
+from collections import deque
+
 import numpy as np
+import pandas as pd
+
+# Bump when the meaning of a feature changes without its name changing
+PIPELINE_VERSION = 2
+
+LAGS = [1, 2, 3, 6, 12, 24]
+ROLLING_WINDOWS = [3, 6, 12]
+EMA_SPANS = [3, 6, 12]
+DIFF_PERIODS = [1, 3]
+
+# Lagged source column -> feature name prefix
+LAGGED_COLUMNS = {'cases': 'cases_lag', 'rainfall_mm': 'rainfall_lag', 'temperature_celsius': 'temp_lag'}
+
+# Dataset columns used as features unchanged
+PASSTHROUGH_COLUMNS = [
+    'rainfall_mm', 'temperature_celsius', 'humidity_percent',
+    'wind_speed_kmh', 'altitude_meters', 'ndvi',
+    'heat_index', 'breeding_index', 'transmission_index',
+    'bed_net_coverage_percent', 'irs_coverage_percent'
+]
+
+TEMPORAL_FEATURES = ['month_sin', 'month_cos', 'month_sin_2', 'month_cos_2',
+                     'year_normalized', 'quarter', 'quarter_sin', 'quarter_cos']
+ROW_FEATURES = ['temp_humidity', 'rainfall_temp', 'rainfall_humidity',
+                'temp_squared', 'rainfall_squared', 'humidity_squared',
+                'breeding_risk', 'malaria_index', 'optimal_temp', 'optimal_rainfall']
+
+# Every feature except the one-hot county columns (county_<name>)
+FEATURE_NAMES = (
+    TEMPORAL_FEATURES
+    + [f'{prefix}_{lag}' for prefix in LAGGED_COLUMNS.values() for lag in LAGS]
+    + [f'cases_rolling_{stat}_{window}' for window in ROLLING_WINDOWS for stat in ('mean', 'std', 'max', 'min')]
+    + [f'rainfall_rolling_mean_{window}' for window in ROLLING_WINDOWS]
+    + [f'cases_ema_{span}' for span in EMA_SPANS]
+    + ROW_FEATURES
+    + [f'cases_diff_{period}' for period in DIFF_PERIODS] + ['cases_pct_change']
+    + PASSTHROUGH_COLUMNS
+)
+
+FEATURE_FINGERPRINT = hashlib.sha1(json.dumps({
+    'version': PIPELINE_VERSION,
+    'features': FEATURE_NAMES,
+    'lags': LAGS,
+    'rolling_windows': ROLLING_WINDOWS,
+    'ema_spans': EMA_SPANS
+}, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def fit_params(data):
+    """Dataset-level constants of the features, fitted on the training data"""
+    return {
+        'year_min': int(data['year'].min()),
+        'year_max': int(data['year'].max()),
+        'fill': {column: float(data[column].mean()) for column in LAGGED_COLUMNS},
+        'counties': sorted(str(county) for county in data['county'].dropna().unique())
+    }
+
+
+def save_pipeline(path, params):
+    """Write the fingerprint and fitted params next to a model's artifacts"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': FEATURE_FINGERPRINT, 'version': PIPELINE_VERSION, 'params': params}, f, indent=2)
+
+
+def load_pipeline(path):
+    """The saved pipeline of a model, or None if it has none"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _row_features(month, year, rainfall, temperature, humidity, params):
+    """Features of a single row; works on scalars and on arrays alike"""
+    quarter = (month - 1) // 3 + 1
+    year_range = params['year_max'] - params['year_min']
+    return {
+        # Temporal
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'month_sin_2': np.sin(4 * np.pi * month / 12),
+        'month_cos_2': np.cos(4 * np.pi * month / 12),
+        'year_normalized': (year - params['year_min']) / year_range if year_range > 0 else year * 0.0,
+        'quarter': quarter,
+        'quarter_sin': np.sin(2 * np.pi * quarter / 4),
+        'quarter_cos': np.cos(2 * np.pi * quarter / 4),
+        # Interaction and polynomial
+        'temp_humidity': temperature * humidity,
+        'rainfall_temp': rainfall * temperature,
+        'rainfall_humidity': rainfall * humidity,
+        'temp_squared': temperature ** 2,
+        'rainfall_squared': rainfall ** 2,
+        'humidity_squared': humidity ** 2,
+        # Environmental indices
+        'breeding_risk': (rainfall * humidity) / (temperature + 1),
+        'malaria_index': (rainfall / 100) * (humidity / 100) * (temperature / 30),
+        'optimal_temp': np.where((temperature >= 20) & (temperature <= 30), 1, 0),
+        'optimal_rainfall': np.where((rainfall >= 50) & (rainfall <= 200), 1, 0)
+    }
+
+
+def _pct_change(cases, previous):
+    """cases / previous - 1, 0 when undefined (no previous month, 0/0 or x/0)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = cases / previous - 1
+    return np.where(np.isfinite(change), change, 0.0)
+
+
+class SortedGroups:
+    """
+    Window operations over rows sorted by group, each group a contiguous run
+    in time order (e.g. each county's months). Lags and rolling windows are
+    computed as a few whole-array shifts of the flat arrays, so the cost is
+    linear in the number of rows, with no per-group Python callback and no
+    padding of short groups. Missing values (NaN) are skipped like pandas'
+    rolling(min_periods=1) skips them.
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        n = len(keys)
+        boundary = np.r_[True, keys[1:] != keys[:-1]] if n else np.zeros(0, dtype=bool)
+        self.size = n
+        self.starts = np.flatnonzero(boundary)
+        self.lengths = np.diff(np.r_[self.starts, n])
+        # Position of every row within its group
+        self.position = np.arange(n) - np.repeat(self.starts, self.lengths)
+
+    def shift(self, values, k):
+        """Value k rows earlier in the same group (NaN before the group starts)"""
+        shifted = np.full(self.size, np.nan)
+        if k < self.size:
+            shifted[k:] = values[:self.size - k]
+        shifted[self.position < k] = np.nan
+        return shifted
+
+    def rolling(self, values, windows):
+        """
+        {window: (mean, std, max, min)} over the last window rows of each
+        group for all windows at once. std is the sample std (ddof=1), 0 for
+        a single value or a constant window; all four are NaN for a window
+        with no values.
+        """
+        windows = sorted(windows)
+        total = np.zeros(self.size)
+        count = np.zeros(self.size)
+        high = np.full(self.size, np.nan)
+        low = np.full(self.size, np.nan)
+        stats = {}
+        # Sums over the window: one shift per row back, shared by all windows
+        for k in range(windows[-1]):
+            shifted = self.shift(values, k)
+            valid = ~np.isnan(shifted)
+            total += np.where(valid, shifted, 0.0)
+            count += valid
+            high = np.fmax(high, shifted)
+            low = np.fmin(low, shifted)
+            if k + 1 in windows:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    stats[k + 1] = [total / count, np.zeros(self.size), high.copy(), low.copy(), count.copy()]
+
+        # Squared deviations from each window's mean (two passes, so no cancellation)
+        for k in range(windows[-1]):
+            shifted = self.shift(values, k)
+            for window in windows:
+                if k < window:
+                    deviation = shifted - stats[window][0]
+                    stats[window][1] += np.where(np.isnan(deviation), 0.0, deviation ** 2)
+
+        result = {}
+        for window, (mean, squares, high_w, low_w, count_w) in stats.items():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std = np.sqrt(squares / (count_w - 1))
+            std = np.where((count_w < 2) | (high_w == low_w), 0.0, std)
+            result[window] = (mean, np.where(count_w == 0, np.nan, std), high_w, low_w)
+        return result
+
+    def ema(self, values, spans):
+        """
+        {span: exponential moving average (adjust=False)} per group; missing
+        values carry the average forward. One vectorized step per row
+        position, over the groups that are at least that long.
+        """
+        alphas = {span: 2 / (span + 1) for span in spans}
+        result = {span: np.full(self.size, np.nan) for span in spans}
+        # Longest groups first, so the groups still running at step t are a prefix
+        order = np.argsort(-self.lengths, kind='stable')
+        starts = self.starts[order]
+        running = np.searchsorted(-self.lengths[order], -np.arange(self.lengths.max() if self.size else 0),
+                                  side='left')
+        previous = {span: np.full(len(starts), np.nan) for span in spans}
+        for t, active in enumerate(running):
+            rows = starts[:active] + t
+            x = values[rows]
+            missing = np.isnan(x)
+            for span, alpha in alphas.items():
+                before = previous[span][:active]
+                current = np.where(np.isnan(before), x, alpha * x + (1 - alpha) * before)
+                current = np.where(missing, before, current)
+                previous[span][:active] = current
+                result[span][rows] = current
+        return result
+
+
+def build_features(data, params, sort_order=None):
+    """
+    Feature frame for every row of a dataset (county, year, month, cases and
+    the environmental columns), indexed like data. History features are
+    computed per county in chronological order by SortedGroups, over all
+    counties at once. sort_order, the rows sorted by (county, year, month),
+    is computed when not given.
+    """
+    n = len(data)
+    codes = pd.Categorical(data['county'].astype(str), categories=params['counties']).codes.astype(np.int64)
+    if sort_order is None:
+        sort_order = np.lexsort((data['month'].to_numpy(), data['year'].to_numpy(), codes))
+    sort_order = np.asarray(sort_order)
+    groups = SortedGroups(codes[sort_order])
+
+    def column(name):
+        return data[name].to_numpy(dtype=float)[sort_order]
+
+    features = {}
+    sorted_values = {name: column(name) for name in ['month', 'year', 'cases', 'rainfall_mm',
+                                                      'temperature_celsius', 'humidity_percent']}
+    features.update(_row_features(
+        sorted_values['month'], sorted_values['year'], sorted_values['rainfall_mm'],
+        sorted_values['temperature_celsius'], sorted_values['humidity_percent'], params
+    ))
+
+    for name, prefix in LAGGED_COLUMNS.items():
+        for lag in LAGS:
+            lagged = groups.shift(sorted_values[name], lag)
+            features[f'{prefix}_{lag}'] = np.where(np.isnan(lagged), params['fill'][name], lagged)
+
+    cases_rolling = groups.rolling(sorted_values['cases'], ROLLING_WINDOWS)
+    rainfall_rolling = groups.rolling(sorted_values['rainfall_mm'], ROLLING_WINDOWS)
+    for window in ROLLING_WINDOWS:
+        mean, std, high, low = cases_rolling[window]
+        features[f'cases_rolling_mean_{window}'] = mean
+        features[f'cases_rolling_std_{window}'] = std
+        features[f'cases_rolling_max_{window}'] = high
+        features[f'cases_rolling_min_{window}'] = low
+        features[f'rainfall_rolling_mean_{window}'] = rainfall_rolling[window][0]
+
+    for span, ema in groups.ema(sorted_values['cases'], EMA_SPANS).items():
+        features[f'cases_ema_{span}'] = ema
+
+    cases = sorted_values['cases']
+    for period in DIFF_PERIODS:
+        features[f'cases_diff_{period}'] = cases - groups.shift(cases, period)
+    features['cases_pct_change'] = _pct_change(cases, groups.shift(cases, 1))
+
+    for name in PASSTHROUGH_COLUMNS:
+        if name in data.columns:
+            features[name] = sorted_values[name] if name in sorted_values else column(name)
+
+    # Back to the row order of data
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[sort_order] = np.arange(n)
+    frame = pd.DataFrame({name: np.asarray(values, dtype=float)[inverse] for name, values in features.items()},
+                         index=data.index)
+    frame = frame.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+    county_dummies = {f'county_{county}': (codes == i).astype(np.int8) for i, county in enumerate(params['counties'])}
+    return pd.concat([frame, pd.DataFrame(county_dummies, index=data.index)], axis=1)
+
+
+class RollingWindow:
+    """
+    Rolling window over the last size rows with O(1) updates. A missing value
+    (NaN) takes up its row but is left out of the statistics, as in
+    SortedGroups.rolling. Mean and std use a sliding Welford update over the
+    present values, max and min use monotonic deques.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        # Present (non-NaN) values in the window
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._index = 0
+        self._max = deque()  # (index, value) with decreasing values
+        self._min = deque()  # (index, value) with increasing values
+
+    def push(self, x):
+        """Add a row's value (NaN if missing), evicting the oldest row once the window is full"""
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            if not math.isnan(old):
+                self.count -= 1
+                if self.count == 0:
+                    self.mean = 0.0
+                    self.m2 = 0.0
+                else:
+                    delta = old - self.mean
+                    self.mean -= delta / self.count
+                    self.m2 = max(self.m2 - delta * (old - self.mean), 0.0)
+
+        self.values.append(x)
+        if not math.isnan(x):
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+
+            while self._max and self._max[-1][1] <= x:
+                self._max.pop()
+            self._max.append((self._index, x))
+            while self._min and self._min[-1][1] >= x:
+                self._min.pop()
+            self._min.append((self._index, x))
+
+        oldest = self._index - self.size
+        while self._max and self._max[0][0] <= oldest:
+            self._max.popleft()
+        while self._min and self._min[0][0] <= oldest:
+            self._min.popleft()
+        self._index += 1
+
+    def std(self):
+        """Sample standard deviation (ddof=1), 0 for a single value"""
+        n = self.count
+        # A constant window has no spread; skip the round-off left in m2
+        if n < 2 or self.max() == self.min():
+            return 0.0
+        return math.sqrt(self.m2 / (n - 1))
+
+    def max(self):
+        return self._max[0][1]
+
+    def min(self):
+        return self._min[0][1]
+
+
+class OnlineFeatureState:
+    """
+    Streaming counterpart of build_features for one county.
+
+    update() takes one observation (a dict with month, year, cases,
+    rainfall_mm, temperature_celsius, humidity_percent, ...) in chronological
+    order and returns the features build_features would produce for that
+    row as the latest month of the county. Memory is bounded by the largest
+    lag. params (from fit_params) are needed to emit features; a state can
+    be warmed up without them.
+    """
+
+    def __init__(self, params=None):
+        self.params = params
+        self.previous = {name: deque(maxlen=max(LAGS)) for name in LAGGED_COLUMNS}
+        self.cases_windows = {window: RollingWindow(window) for window in ROLLING_WINDOWS}
+        self.rainfall_windows = {window: RollingWindow(window) for window in ROLLING_WINDOWS}
+        self.ema = {}
+
+    def update(self, observation, emit=True):
+        """Consume one observation and return its feature dict (None if emit is False)"""
+        obs = {key: value for key, value in observation.items()
+               if not (isinstance(value, float) and math.isnan(value))}
+        values = {name: float(obs[name]) if obs.get(name) is not None else np.nan
+                  for name in ['cases', 'rainfall_mm', 'temperature_celsius', 'humidity_percent']}
+        cases = values['cases']
+
+        # Windows span rows, missing values included; the EMA carries over them
+        for window in ROLLING_WINDOWS:
+            self.cases_windows[window].push(cases)
+            self.rainfall_windows[window].push(values['rainfall_mm'])
+        if not np.isnan(cases):
+            for span in EMA_SPANS:
+                alpha = 2 / (span + 1)
+                self.ema[span] = cases if span not in self.ema else alpha * cases + (1 - alpha) * self.ema[span]
+
+        features = None
+        if emit:
+            features = self._features(obs, values)
+
+        for name, previous in self.previous.items():
+            previous.append(values[name])
+        return features
+
+    def _features(self, obs, values):
+        if self.params is None:
+            raise ValueError('OnlineFeatureState needs feature params to emit features')
+
+        features = dict(obs)
+        features.update({
+            name: float(value) for name, value in _row_features(
+                obs['month'], obs.get('year', self.params['year_min']), values['rainfall_mm'],
+                values['temperature_celsius'], values['humidity_percent'], self.params
+            ).items()
+        })
+
+        # Lags, filled with the training mean before the start of the history
+        for name, prefix in LAGGED_COLUMNS.items():
+            previous = self.previous[name]
+            for lag in LAGS:
+                value = previous[-lag] if len(previous) >= lag else np.nan
+                features[f'{prefix}_{lag}'] = self.params['fill'][name] if np.isnan(value) else value
+
+        # Rolling statistics
+        for window in ROLLING_WINDOWS:
+            rolling = self.cases_windows[window]
+            if rolling.count:
+                features[f'cases_rolling_mean_{window}'] = rolling.mean
+                features[f'cases_rolling_std_{window}'] = rolling.std()
+                features[f'cases_rolling_max_{window}'] = rolling.max()
+                features[f'cases_rolling_min_{window}'] = rolling.min()
+            rainfall = self.rainfall_windows[window]
+            if rainfall.count:
+                features[f'rainfall_rolling_mean_{window}'] = rainfall.mean
+
+        # Exponential moving averages
+        for span in EMA_SPANS:
+            if span in self.ema:
+                features[f'cases_ema_{span}'] = self.ema[span]
+
+        # Rate of change
+        cases = values['cases']
+        previous_cases = self.previous['cases']
+        for period in DIFF_PERIODS:
+            features[f'cases_diff_{period}'] = cases - previous_cases[-period] if len(previous_cases) >= period else np.nan
+        last = previous_cases[-1] if previous_cases else np.nan
+        features['cases_pct_change'] = float(_pct_change(cases, last))
 
-def create_advanced_features(df):
-    """Create all advanced features matching training script"""
-    df = df.copy()
-    
-    # Ensure date is datetime if present
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-    
-    # Temporal features
-    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-    df['month_sin_2'] = np.sin(4 * np.pi * df['month'] / 12)
-    df['month_cos_2'] = np.cos(4 * np.pi * df['month'] / 12)
-    
-    if 'year' in df.columns:
-        year_min = df['year'].min() if len(df) > 0 else 2014
-        year_max = df['year'].max() if len(df) > 0 else 2025
-        if year_max > year_min:
-            df['year_normalized'] = (df['year'] - year_min) / (year_max - year_min)
-        else:
-            df['year_normalized'] = 0
-    
-    df['quarter'] = ((df['month'] - 1) // 3) + 1
-    df['quarter_sin'] = np.sin(2 * np.pi * df['quarter'] / 4)
-    df['quarter_cos'] = np.cos(2 * np.pi * df['quarter'] / 4)
-    
-    # Lagged features (will be filled with defaults if not available)
-    for lag in [1, 2, 3, 6, 12, 24]:
-        if f'cases_lag_{lag}' not in df.columns:
-            df[f'cases_lag_{lag}'] = df['cases'].mean() if 'cases' in df.columns else 0
-        
-        if f'rainfall_lag_{lag}' not in df.columns:
-            df[f'rainfall_lag_{lag}'] = df['rainfall_mm'].mean() if 'rainfall_mm' in df.columns else 0
-        
-        if f'temp_lag_{lag}' not in df.columns:
-            df[f'temp_lag_{lag}'] = df['temperature_celsius'].mean() if 'temperature_celsius' in df.columns else 0
-    
-    # Rolling statistics
-    for window in [3, 6, 12]:
-        if 'cases' in df.columns:
-            df[f'cases_rolling_mean_{window}'] = df['cases'].rolling(window, min_periods=1).mean()
-            df[f'cases_rolling_std_{window}'] = df['cases'].rolling(window, min_periods=1).std().fillna(0)
-            df[f'cases_rolling_max_{window}'] = df['cases'].rolling(window, min_periods=1).max()
-            df[f'cases_rolling_min_{window}'] = df['cases'].rolling(window, min_periods=1).min()
-        else:
-            df[f'cases_rolling_mean_{window}'] = 0
-            df[f'cases_rolling_std_{window}'] = 0
-            df[f'cases_rolling_max_{window}'] = 0
-            df[f'cases_rolling_min_{window}'] = 0
-        
-        if 'rainfall_mm' in df.columns:
-            df[f'rainfall_rolling_mean_{window}'] = df['rainfall_mm'].rolling(window, min_periods=1).mean()
-        else:
-            df[f'rainfall_rolling_mean_{window}'] = 0
-    
-    # Exponential moving averages
-    for span in [3, 6, 12]:
-        if 'cases' in df.columns:
-            df[f'cases_ema_{span}'] = df['cases'].ewm(span=span, adjust=False).mean()
-        else:
-            df[f'cases_ema_{span}'] = 0
-    
-    # Interaction features
-    if 'temperature_celsius' in df.columns and 'humidity_percent' in df.columns:
-        df['temp_humidity'] = df['temperature_celsius'] * df['humidity_percent']
-    else:
-        df['temp_humidity'] = 0
-    
-    if 'rainfall_mm' in df.columns and 'temperature_celsius' in df.columns:
-        df['rainfall_temp'] = df['rainfall_mm'] * df['temperature_celsius']
-    else:
-        df['rainfall_temp'] = 0
-    
-    if 'rainfall_mm' in df.columns and 'humidity_percent' in df.columns:
-        df['rainfall_humidity'] = df['rainfall_mm'] * df['humidity_percent']
-    else:
-        df['rainfall_humidity'] = 0
-    
-    # Polynomial features
-    if 'temperature_celsius' in df.columns:
-        df['temp_squared'] = df['temperature_celsius'] ** 2
-    else:
-        df['temp_squared'] = 0
-    
-    if 'rainfall_mm' in df.columns:
-        df['rainfall_squared'] = df['rainfall_mm'] ** 2
-    else:
-        df['rainfall_squared'] = 0
-    
-    if 'humidity_percent' in df.columns:
-        df['humidity_squared'] = df['humidity_percent'] ** 2
-    else:
-        df['humidity_squared'] = 0
-    
-    # Environmental indices
-    if all(col in df.columns for col in ['rainfall_mm', 'humidity_percent', 'temperature_celsius']):
-        df['breeding_risk'] = (df['rainfall_mm'] * df['humidity_percent']) / (df['temperature_celsius'] + 1)
-        df['malaria_index'] = (
-            (df['rainfall_mm'] / 100) * 
-            (df['humidity_percent'] / 100) * 
-            (df['temperature_celsius'] / 30)
-        )
-    else:
-        df['breeding_risk'] = 0
-        df['malaria_index'] = 0
-    
-    if 'temperature_celsius' in df.columns:
-        df['optimal_temp'] = np.where(
-            (df['temperature_celsius'] >= 20) & (df['temperature_celsius'] <= 30),
-            1, 0
-        )
-    else:
-        df['optimal_temp'] = 0
-    
-    if 'rainfall_mm' in df.columns:
-        df['optimal_rainfall'] = np.where(
-            (df['rainfall_mm'] >= 50) & (df['rainfall_mm'] <= 200),
-            1, 0
-        )
-    else:
-        df['optimal_rainfall'] = 0
-    
-    # Rate of change features
-    if 'cases' in df.columns:
-        df['cases_diff_1'] = df['cases'].diff(1).fillna(0)
-        df['cases_diff_3'] = df['cases'].diff(3).fillna(0)
-        df['cases_pct_change'] = df['cases'].pct_change().fillna(0)
-    else:
-        df['cases_diff_1'] = 0
-        df['cases_diff_3'] = 0
-        df['cases_pct_change'] = 0
-    
-    # Fill any remaining NaN values
-    df = df.fillna(0)
-    
-    return df
+        # Missing and infinite values become 0, as in build_features
+        for name in FEATURE_NAMES:
+            value = features.get(name, 0)
+            features[name] = 0 if value is None or not np.isfinite(value) else value
+        return features
 
+    def peek(self, observation):
+        """Features for an observation without committing it to the state"""
+        return copy.deepcopy(self).update(observation)
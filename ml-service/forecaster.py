@@ -0,0 +1,92 @@
+"""
+Incremental Recursive Forecaster
+Keeps the rolling, EMA, lag and diff state of one county so that each
+month-ahead step of /predict_regional costs one feature row instead of a
+full re-featurization of the county history
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+def feature_matrix(rows, feature_columns):
+    """DataFrame of feature rows with inf values replaced"""
+    X_pred = pd.DataFrame(rows, columns=feature_columns)
+    # Replace inf values
+    return X_pred.replace([np.inf, -np.inf], 0)
+
+
+class RegionalForecaster:
+    """
+    Stateful feature builder for recursive forecasts of a single county.
+
+    features() returns the feature row that build_features would produce
+    for a new month appended to the history, and append() commits that
+    month (with its predicted cases) in O(1). feature_params are the
+    fitted params saved with the model (feature_engineering.fit_params).
+    """
+
+    def __init__(self, county, history, feature_params):
+        self.county = county
+        frame = history.frame
+
+        # Streaming feature state already warmed up on the county history
+        self.state = history.feature_state(feature_params)
+
+        # Per calendar month totals for the historical average
+        months = frame['month'].to_numpy().astype(int)
+        self.month_sums = np.bincount(months, weights=frame['cases'].to_numpy(dtype=float), minlength=13)
+        self.month_counts = np.bincount(months, minlength=13)
+
+        self.tail = deque(frame.tail(6)[['year', 'month', 'cases']].to_dict('records'), maxlen=6)
+
+    def features(self, year, month, rainfall, temperature, humidity, cases=0):
+        """Feature dict for a new month appended after the current state"""
+        features = self.state.peek({
+            'year': year,
+            'month': month,
+            'rainfall_mm': rainfall,
+            'temperature_celsius': temperature,
+            'humidity_percent': humidity,
+            'cases': cases
+        })
+        features[f'county_{self.county}'] = 1
+        return features
+
+    def feature_row(self, feature_columns, year, month, rainfall, temperature, humidity, cases=0):
+        """Model feature values for a new month, in training column order"""
+        features = self.features(year, month, rainfall, temperature, humidity, cases)
+        return [features.get(col, 0) for col in feature_columns]
+
+    def feature_frame(self, feature_columns, year, month, rainfall, temperature, humidity, cases=0):
+        """Single-row DataFrame of model features in training column order"""
+        row = self.feature_row(feature_columns, year, month, rainfall, temperature, humidity, cases)
+        return feature_matrix([row], feature_columns)
+
+    def append(self, year, month, cases, rainfall, temperature, humidity):
+        """Commit a month (typically a prediction) to the state"""
+        self.state.update({
+            'year': year,
+            'month': month,
+            'rainfall_mm': rainfall,
+            'temperature_celsius': temperature,
+            'humidity_percent': humidity,
+            'cases': cases
+        }, emit=False)
+
+        self.month_sums[month] += cases
+        self.month_counts[month] += 1
+
+        self.tail.append({'year': year, 'month': month, 'cases': cases})
+
+    def historical_average(self, month):
+        """Average cases for a calendar month over the history so far"""
+        if self.month_counts[month] == 0:
+            return np.nan
+        return self.month_sums[month] / self.month_counts[month]
+
+    def recent_history(self):
+        """Last six months of the history including appended predictions"""
+        return list(self.tail)
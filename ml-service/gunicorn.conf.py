@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for the ML service
+Loads the models once in the master process and forks the workers from it,
+so all workers share one copy of the tree ensembles through copy-on-write pages
+"""
+
+import gc
+import glob
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+
+# Import app.py (and load every model) before forking the workers
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+if preload_app:
+    # A background loader thread would not survive the fork, so load
+    # everything in the master before the workers start
+    os.environ['MODEL_LOAD_MODE'] = 'eager'
+
+# Workers write their /metrics totals here (one directory per port) so any of
+# them can report them all
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f"ml-service-metrics-{os.environ.get('PORT', 8000)}")
+)
+
+
+def on_starting(server):
+    # Counters start from zero with every server start
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def pre_fork(server, worker):
+    # Move the loaded models out of the garbage collector's reach so
+    # collections in the workers don't write to (and un-share) their pages
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # A replaced worker's totals would otherwise be summed into /metrics forever
+    for path in glob.glob(os.path.join(metrics_dir, f'{worker.pid}-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
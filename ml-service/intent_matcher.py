@@ -0,0 +1,110 @@
+"""
+Compiled Phrase Matcher
+Matches a message against every chatbot trigger phrase or county name in one
+pass of a single regex compiled from a trie of the phrases, so the cost per
+message depends on the message length rather than on how many phrases exist
+"""
+
+import heapq
+import re
+
+# With inflect, single-word phrases of at least MIN_INFLECTED_LENGTH letters
+# also match as the start of a longer word, as the substring scan this
+# replaced did: 'transmit' matches 'transmitted', 'prevent' 'preventive' and
+# 'fever' 'feverish'. Shorter words ('hi', 'cure'...) and phrases of several
+# words only match whole words.
+MIN_INFLECTED_LENGTH = 4
+
+
+def is_stem(phrase):
+    """True for a phrase matched as a word start when inflecting"""
+    return ' ' not in phrase and len(phrase) >= MIN_INFLECTED_LENGTH
+
+
+def _trie_regex(phrases):
+    """
+    Regex source matching any of the phrases. Sharing prefixes in nested
+    groups keeps the branching at each character small however many
+    phrases there are; longer phrases are tried before their prefixes.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True  # phrase ends here
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+
+class PhraseIndex:
+    """
+    Word-boundary matcher from labels (topics, counties) to their phrases.
+    Matching is case-insensitive; every label whose phrase occurs in the
+    text is found in a single scan (two with inflect: whole phrases and
+    word-start stems).
+    """
+
+    def __init__(self, phrases, inflect=False):
+        # phrases: label -> iterable of phrases
+        self._labels = {}
+        for label, variants in phrases.items():
+            for variant in variants:
+                labels = self._labels.setdefault(variant.lower().strip(), [])
+                if label not in labels:
+                    labels.append(label)
+        stems = {phrase for phrase in self._labels if inflect and is_stem(phrase)}
+        whole = [phrase for phrase in self._labels if phrase not in stems]
+
+        # Only the longest phrase is matched at a position, so a phrase also
+        # carries the labels of shorter phrases it starts with ('feel sick' ->
+        # 'feel'), and a stem those of shorter stems ('prevention' -> 'prevent')
+        for phrase, labels in self._labels.items():
+            shorter = [phrase[:end] for end, char in enumerate(phrase) if char == ' ']
+            if phrase in stems:
+                shorter += [phrase[:end] for end in range(MIN_INFLECTED_LENGTH, len(phrase)) if phrase[:end] in stems]
+            for prefix in shorter:
+                for label in self._labels.get(prefix, []):
+                    if label not in labels:
+                        labels.append(label)
+
+        # A lookahead at each word start finds overlapping matches too
+        self._patterns = []
+        if whole:
+            self._patterns.append(re.compile(r'(?=\b(' + _trie_regex(whole) + r')\b)', re.IGNORECASE))
+        if stems:
+            self._patterns.append(re.compile(r'(?=\b(' + _trie_regex(stems) + r'))', re.IGNORECASE))
+
+    def __len__(self):
+        return len(self._labels)
+
+    def _scan(self, pattern, text):
+        for match in pattern.finditer(text):
+            phrase = match.group(1)
+            yield match.start(), phrase, self._labels[phrase.lower()]
+
+    def matches(self, text):
+        """(position, phrase, labels) for every phrase occurrence, in text order"""
+        return heapq.merge(*[self._scan(pattern, text) for pattern in self._patterns], key=lambda match: match[0])
+
+    def labels(self, text):
+        """Set of all labels with a phrase in the text"""
+        found = set()
+        for _, _, labels in self.matches(text):
+            found.update(labels)
+        return found
+
+    def first(self, text):
+        """Label of the earliest phrase in the text, or None"""
+        for _, _, labels in self.matches(text):
+            return labels[0]
+        return None
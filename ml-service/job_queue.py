@@ -0,0 +1,255 @@
+"""
+Batch Prediction Jobs
+Runs large uploads outside the request cycle on a local worker pool. Job state
+lives in a SQLite file shared by all gunicorn workers, so any worker can answer
+a poll, and results are written next to it as JSON files.
+
+Every process running jobs heartbeats the jobs it owns; an unfinished job
+whose heartbeat is older than stale_after_seconds lost its process (crashed,
+restarted, or on another host sharing the directory) and is marked failed.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_FIELDS = [
+    'id', 'status', 'filename', 'source_path', 'result_path', 'error', 'pid', 'owner',
+    'created_at', 'started_at', 'finished_at', 'heartbeat_at', 'rows_total', 'rows_processed', 'records'
+]
+
+# Job lifecycle: queued -> running -> done | failed
+FINISHED_STATUSES = ('done', 'failed')
+
+
+class JobStore:
+    """Job records in a SQLite file (WAL mode, one connection per thread and process)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Short-lived connection: the store may be created in the gunicorn
+        # master, and SQLite connections must not be shared across a fork
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS jobs ('
+                    'id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, source_path TEXT, '
+                    'result_path TEXT, error TEXT, pid INTEGER, owner TEXT, created_at REAL NOT NULL, '
+                    'started_at REAL, finished_at REAL, heartbeat_at REAL, rows_total INTEGER, '
+                    'rows_processed INTEGER NOT NULL DEFAULT 0, records INTEGER NOT NULL DEFAULT 0)'
+                )
+                # Files created before jobs were heartbeated
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+                for column, kind in [('owner', 'TEXT'), ('heartbeat_at', 'REAL')]:
+                    if column not in columns:
+                        conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        finally:
+            conn.close()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id, filename, source_path, owner):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, filename, source_path, pid, owner, created_at, heartbeat_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', filename, source_path, os.getpid(), owner, now, now)
+            )
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connection() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        """Job record as a dict, or None if unknown"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row else None
+
+    def counts(self):
+        """Number of jobs per status"""
+        rows = self._connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+    def heartbeat(self, owner):
+        """Mark the unfinished jobs of an owner as alive"""
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), owner)
+            )
+
+    def fail_orphans(self, stale_after_seconds, job_id=None):
+        """Mark unfinished jobs (all, or one) without a heartbeat for stale_after_seconds as failed"""
+        now = time.time()
+        query = ("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                 "WHERE status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)")
+        params = ['Worker stopped before the job finished', now, now - stale_after_seconds]
+        if job_id is not None:
+            query += ' AND id = ?'
+            params.append(job_id)
+        with self._connection() as conn:
+            return conn.execute(query, params).rowcount
+
+    def expired(self, max_age_seconds):
+        """Finished jobs older than max_age_seconds"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - max_age_seconds,)
+        ).fetchall()
+        return [dict(zip(JOB_FIELDS, row)) for row in rows]
+
+    def delete(self, job_id):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+
+def job_metrics(job, now=None):
+    """Queue wait, run time and row throughput of a job record"""
+    now = now or time.time()
+    started = job['started_at']
+    finished = job['finished_at'] or now
+    running_seconds = finished - started if started else 0.0
+    progress = None
+    if job['rows_total']:
+        progress = round(min(1.0, job['rows_processed'] / job['rows_total']), 4)
+    return {
+        'queue_seconds': round((started or now) - job['created_at'], 3),
+        'running_seconds': round(running_seconds, 3),
+        'rows_per_second': round(job['rows_processed'] / running_seconds, 1) if running_seconds > 0 else 0.0,
+        'progress': progress
+    }
+
+
+class JobQueue:
+    """
+    Local worker pool for jobs. handler(job, progress, result_file) does the
+    work: it calls progress(**fields) to publish rows_total / rows_processed /
+    records and writes the JSON result to result_file as it goes, so results
+    never have to fit in memory. The pool is started on the first submit so
+    it is created in the worker process, not in a preloading gunicorn master.
+    """
+
+    def __init__(self, directory, handler, max_workers=1, result_ttl_seconds=24 * 3600,
+                 heartbeat_seconds=10, stale_after_seconds=60):
+        self.directory = directory
+        self.handler = handler
+        self.max_workers = max_workers
+        self.result_ttl_seconds = result_ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_after_seconds = stale_after_seconds
+        os.makedirs(directory, exist_ok=True)
+        self.store = JobStore(os.path.join(directory, 'jobs.db'))
+        self._executor = None
+        self._executor_pid = None
+        # Owner of the jobs submitted by this process: host, pid and a start
+        # token, so a reused pid or another host's process is never mistaken for it
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # Jobs left behind by a stopped worker process will never finish
+                self.store.fail_orphans(self.stale_after_seconds)
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job-worker')
+                self._executor_pid = os.getpid()
+                self._owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+                threading.Thread(target=self._heartbeat_loop, args=(self._owner,),
+                                 name='job-heartbeat', daemon=True).start()
+            return self._executor
+
+    def _heartbeat_loop(self, owner):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                self.store.heartbeat(owner)
+                self.store.fail_orphans(self.stale_after_seconds)
+            except sqlite3.Error as e:
+                print(f"[WARN] Job heartbeat failed: {e}")
+
+    def source_path(self, job_id, filename):
+        """Where a job's input file is kept until it has run"""
+        return os.path.join(self.directory, f'{job_id}_{filename}')
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def submit(self, job_id, filename):
+        """Queue a job whose input is already saved at source_path(job_id, filename)"""
+        pool = self._pool()
+        self.cleanup()
+        job = self.store.create(job_id, filename, self.source_path(job_id, filename), self._owner)
+        pool.submit(self._run, job_id)
+        return job
+
+    def _run(self, job_id):
+        self.store.update(job_id, status='running', started_at=time.time(), heartbeat_at=time.time())
+        job = self.store.get(job_id)
+        result_path = os.path.join(self.directory, f'{job_id}.json')
+        partial_path = f'{result_path}.part'
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                self.handler(job, lambda **fields: self.store.update(job_id, **fields), f)
+            os.replace(partial_path, result_path)
+            self.store.update(job_id, status='done', result_path=result_path, finished_at=time.time())
+            metrics = job_metrics(self.store.get(job_id))
+            print(f"[OK] Job {job_id} done: {metrics['rows_per_second']} rows/s "
+                  f"in {metrics['running_seconds']}s")
+        except Exception as e:
+            print(f"[ERROR] Job {job_id} failed: {e}")
+            print(traceback.format_exc())
+            self.store.update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            if job['source_path'] and os.path.exists(job['source_path']):
+                os.remove(job['source_path'])
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        # Polls reach any worker, so a job whose owner stopped is noticed here too
+        if (job and job['status'] not in FINISHED_STATUSES
+                and (job['heartbeat_at'] or 0) < time.time() - self.stale_after_seconds):
+            self.store.fail_orphans(self.stale_after_seconds, job_id=job_id)
+            job = self.store.get(job_id)
+        return job
+
+    def cleanup(self):
+        """Remove finished jobs and their results after result_ttl_seconds"""
+        for job in self.store.expired(self.result_ttl_seconds):
+            if job['result_path'] and os.path.exists(job['result_path']):
+                os.remove(job['result_path'])
+            self.store.delete(job['id'])
+
+    def stats(self):
+        return {
+            'workers': self.max_workers,
+            'jobs': self.store.counts()
+        }
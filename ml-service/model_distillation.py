@@ -0,0 +1,226 @@
+"""
+Fast Serving Model
+Post-training stage that turns the full weighted ensemble into a compact
+model for latency-sensitive endpoints (/chat). Candidates are built from the
+trained members:
+    full       - every member, weights refitted on held-out rows (members
+                 the fit gives zero weight are pruned and named as such)
+    pruned     - members dropped one at a time by smallest marginal
+                 contribution, forests cut to a fraction of their trees
+    distilled  - one small histogram gradient boosting model fitted to the
+                 ensemble's predictions
+Each candidate is scored for accuracy and single-row / batch latency; the
+fastest one within max_r2_loss of the full ensemble is saved as
+fast_model.pkl with the report in fast_model_report.json.
+
+The held-out rows are split in two: weights are fitted on one half and
+every candidate is scored on the other.
+"""
+
+import copy
+import json
+import os
+import time
+
+import numpy as np
+from scipy.optimize import nnls
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from model_loader import save_artifact
+from tree_engine import CompiledEnsemble, is_supported
+
+FAST_MODEL_NAME = 'fast_model.pkl'
+FAST_REPORT_NAME = 'fast_model_report.json'
+
+# Fractions of each forest's trees tried when pruning
+TREE_FRACTIONS = [0.5, 0.25, 0.1]
+
+
+class FastEnsemble:
+    """
+    Weighted members of the fast model. Tree members are evaluated through
+    the compiled node arrays (tree_engine.py), the others with their own
+    predict.
+    """
+
+    def __init__(self, members, weights, description):
+        self.members = members  # [(name, fitted model)]
+        self.weights = weights  # {name: weight}
+        self.description = description
+        self._compiled = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_compiled'] = None
+        return state
+
+    @property
+    def n_trees(self):
+        return sum(_tree_count(model) for _, model in self.members)
+
+    def compile(self):
+        supported = [(name, model) for name, model in self.members if is_supported(model)]
+        self._compiled = CompiledEnsemble(supported) if supported else None
+        return self
+
+    def predict(self, X):
+        if self._compiled is None:
+            self.compile()
+        compiled = {}
+        if self._compiled is not None:
+            compiled = dict(zip(self._compiled.names, self._compiled.predict(X)))
+        predictions = np.vstack([
+            compiled[name] if name in compiled else np.asarray(model.predict(X), dtype=float)
+            for name, model in self.members
+        ])
+        weights = np.array([self.weights[name] for name, _ in self.members], dtype=float)
+        return weights @ predictions
+
+
+def _tree_count(model):
+    if isinstance(model, HistGradientBoostingRegressor):
+        return model.n_iter_
+    estimators = getattr(model, 'estimators_', None)
+    return len(estimators) if estimators is not None else getattr(model, 'n_estimators', 0)
+
+
+def _truncated_forest(model, fraction):
+    """Copy of a random/extra-trees forest keeping the first fraction of its trees"""
+    keep = max(1, int(len(model.estimators_) * fraction))
+    truncated = copy.copy(model)
+    truncated.estimators_ = model.estimators_[:keep]
+    truncated.n_estimators = keep
+    return truncated
+
+
+def _fit_weights(predictions, y):
+    """Non-negative least squares blend weights, normalized to sum to 1"""
+    weights, _ = nnls(predictions.T, y)
+    if weights.sum() <= 0:
+        weights = np.ones(len(predictions))
+    return weights / weights.sum()
+
+
+def _latency_ms(model, X, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def build_fast_model(members, weights, X_fit, X_holdout, y_holdout, max_r2_loss=0.005,
+                     batch_rows=256, repeat=20, random_state=42):
+    """
+    Build and score the candidates; returns (FastEnsemble, report). members
+    are the trained (name, model) pairs, weights the ensemble's weights,
+    X_fit the training rows (for the distilled model) and X_holdout /
+    y_holdout rows none of the members were trained on.
+    """
+    X_fit = np.asarray(X_fit, dtype=float)
+    X_holdout = np.asarray(X_holdout, dtype=float)
+    y_holdout = np.asarray(y_holdout, dtype=float)
+    order = np.random.default_rng(random_state).permutation(len(X_holdout))
+    tune, score = order[:len(order) // 2], order[len(order) // 2:]
+
+    members = [(name, model) for name, model in members if weights.get(name)]
+    teacher = FastEnsemble(members, {name: weights[name] / sum(weights[n] for n, _ in members)
+                                     for name, _ in members}, 'trained ensemble')
+
+    candidates = [teacher]
+    # Tune-half predictions per model object, shared by all candidates using it
+    tune_predictions = {}
+
+    def reweighted(members, description):
+        for _, model in members:
+            if id(model) not in tune_predictions:
+                tune_predictions[id(model)] = np.asarray(model.predict(X_holdout[tune]), dtype=float)
+        stacked = np.vstack([tune_predictions[id(model)] for _, model in members])
+        fitted = _fit_weights(stacked, y_holdout[tune])
+        kept = [(member, float(w)) for member, w in zip(members, fitted) if w > 0]
+        pruned = [name for (name, _), w in zip(members, fitted) if w <= 0]
+        if pruned and description:
+            description = f"{description}; zero weight, pruned: {', '.join(pruned)}"
+        return FastEnsemble([member for member, _ in kept], {member[0]: w for member, w in kept}, description)
+
+    def tune_r2(candidate):
+        return r2_score(y_holdout[tune], candidate.predict(X_holdout[tune]))
+
+    # Weights refitted on held-out rows instead of R2 shares
+    candidates.append(reweighted(members, 'refitted weights'))
+
+    # Backward elimination: drop the member whose removal costs the least
+    remaining = candidates[-1].members
+    while len(remaining) > 1:
+        trials = [reweighted([m for m in remaining if m is not member], '') for member in remaining]
+        best = max(trials, key=tune_r2)
+        best.description = ', '.join(name for name, _ in best.members)
+        candidates.append(best)
+        remaining = best.members
+
+    # Fewer trees in the forests of every member subset
+    for candidate in list(candidates[1:]):
+        if not any(isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)) for _, model in candidate.members):
+            continue
+        for fraction in TREE_FRACTIONS:
+            truncated = [
+                (name, _truncated_forest(model, fraction)
+                 if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)) else model)
+                for name, model in candidate.members
+            ]
+            candidates.append(reweighted(truncated, f'{candidate.description}; {fraction:.0%} of forest trees'))
+
+    # Distillation into a single small model, taught by the better of the two full ensembles
+    source = max(candidates[:2], key=tune_r2)
+    student = HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, max_leaf_nodes=31,
+                                            early_stopping=True, random_state=random_state)
+    student.fit(X_fit, source.predict(X_fit))
+    candidates.append(FastEnsemble([('distilled', student)], {'distilled': 1.0}, 'distilled histogram GB'))
+
+    rows = []
+    teacher_score = teacher.predict(X_holdout[score])
+    batch = X_holdout[score][:batch_rows]
+    for candidate in candidates:
+        candidate.compile()
+        predictions = candidate.predict(X_holdout[score])
+        rows.append({
+            'description': candidate.description,
+            'members': {name: {'weight': round(candidate.weights[name], 4), 'trees': _tree_count(model)}
+                        for name, model in candidate.members},
+            'trees': candidate.n_trees,
+            'r2': float(r2_score(y_holdout[score], predictions)),
+            'mae': float(mean_absolute_error(y_holdout[score], predictions)),
+            # Agreement with the trained ensemble
+            'fidelity_r2': float(r2_score(teacher_score, predictions)),
+            'latency_ms_row': _latency_ms(candidate, X_holdout[score][:1], repeat),
+            'latency_ms_batch': _latency_ms(candidate, batch, max(3, repeat // 4))
+        })
+
+    baseline_r2 = rows[0]['r2']
+    eligible = [i for i, row in enumerate(rows) if row['r2'] >= baseline_r2 - max_r2_loss]
+    chosen_index = min(eligible, key=lambda i: rows[i]['latency_ms_row'])
+    report = {
+        'max_r2_loss': max_r2_loss,
+        'batch_rows': len(batch),
+        'holdout_rows': len(score),
+        'chosen': chosen_index,
+        'candidates': rows
+    }
+    return candidates[chosen_index], report
+
+
+def print_report(report):
+    print(f"   {'candidate':<64} {'trees':>6} {'R2':>7} {'fidelity':>8} {'1 row':>8} {'batch':>9}")
+    for i, row in enumerate(report['candidates']):
+        marker = '*' if i == report['chosen'] else ' '
+        print(f" {marker} {row['description'][:64]:<64} {row['trees']:>6} {row['r2']:>7.4f} "
+              f"{row['fidelity_r2']:>8.4f} {row['latency_ms_row']:>6.2f}ms {row['latency_ms_batch']:>7.2f}ms")
+
+
+def save_fast_model(model_dir, fast_model, report):
+    """Write the fast model and its report into a (staging) model directory"""
+    save_artifact(fast_model, os.path.join(model_dir, FAST_MODEL_NAME))
+    with open(os.path.join(model_dir, FAST_REPORT_NAME), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
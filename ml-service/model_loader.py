@@ -0,0 +1,117 @@
+"""
+Model Artifact Loader
+Loads model artifacts concurrently in a thread pool - eagerly, in the
+background or lazily on first use - and records per-artifact load time and size
+"""
+
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+
+# Libraries the pickled models import while being unpickled. They are imported
+# up front in the calling thread - importing them from several loader threads
+# at once can trip Python's module import locks.
+MODEL_MODULES = ['sklearn.ensemble', 'xgboost', 'lightgbm']
+
+
+def save_artifact(obj, path):
+    """
+    Save a model artifact uncompressed so its numpy arrays are stored
+    page-aligned and can be memory-mapped by load_artifact
+    """
+    joblib.dump(obj, path, compress=0)
+
+
+def load_artifact(path, mmap_mode=None):
+    """Load an artifact, memory-mapping its numpy arrays when mmap_mode is set"""
+    return joblib.load(path, mmap_mode=mmap_mode or None)
+
+
+class ArtifactLoader:
+    """Concurrent loader for a set of named artifact files"""
+
+    def __init__(self, artifacts, max_workers=None, load_fn=joblib.load):
+        # artifacts: name -> file path
+        self.artifacts = dict(artifacts)
+        self.max_workers = max_workers or max(1, min(8, len(self.artifacts)))
+        self._load_fn = load_fn
+        self._lock = threading.Lock()
+        self._futures = {}
+        self.report = {}
+
+    def _load_one(self, name, path):
+        """Load one artifact; missing files and missing libraries load as None"""
+        entry = {
+            'path': path,
+            'size_bytes': os.path.getsize(path) if os.path.exists(path) else None
+        }
+        start = time.perf_counter()
+        try:
+            value = self._load_fn(path)
+            entry['status'] = 'loaded'
+        except FileNotFoundError:
+            value = None
+            entry['status'] = 'missing'
+        except ImportError as e:
+            value = None
+            entry['status'] = 'unavailable'
+            entry['error'] = str(e)
+        except Exception as e:
+            entry['status'] = 'error'
+            entry['error'] = str(e)
+            raise
+        finally:
+            entry['seconds'] = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.report[name] = entry
+        return value
+
+    def start(self):
+        """Submit every artifact to the thread pool (only the first call does anything)"""
+        with self._lock:
+            if self._futures:
+                return
+            for module in MODEL_MODULES:
+                try:
+                    importlib.import_module(module)
+                except ImportError:
+                    pass
+            executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='artifact-loader')
+            for name, path in self.artifacts.items():
+                self._futures[name] = executor.submit(self._load_one, name, path)
+            # Worker threads finish the queued loads, no new work is accepted
+            executor.shutdown(wait=False)
+
+    def get(self, name):
+        """Return one artifact, starting the load if needed and waiting for it"""
+        self.start()
+        return self._futures[name].result()
+
+    def wait(self):
+        """Load everything and return a dict of name -> artifact (None if unavailable)"""
+        self.start()
+        return {name: future.result() for name, future in self._futures.items()}
+
+    @property
+    def started(self):
+        return bool(self._futures)
+
+    @property
+    def complete(self):
+        """True once every artifact has finished loading"""
+        return self.started and all(future.done() for future in self._futures.values())
+
+    def summary(self):
+        """Per-artifact load report plus totals"""
+        with self._lock:
+            report = {name: dict(entry) for name, entry in self.report.items()}
+        return {
+            'artifacts': report,
+            'total_bytes': sum(entry['size_bytes'] or 0 for entry in report.values()),
+            'total_seconds': round(sum(entry['seconds'] for entry in report.values()), 4),
+            'complete': self.complete
+        }
@@ -0,0 +1,140 @@
+"""
+Model Registry
+Versioned model directories, each with a manifest of its feature columns,
+ensemble weights, metrics and artifact checksums. Training scripts write a
+new version into a staging directory, publish it with an atomic rename and
+promote it by atomically replacing the CURRENT pointer file.
+
+Layout:
+    <root>/CURRENT                  name of the promoted version
+    <root>/<version>/manifest.json
+    <root>/<version>/*.pkl
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+MANIFEST_NAME = 'manifest.json'
+CURRENT_NAME = 'CURRENT'
+STAGING_PREFIX = '.staging-'
+
+
+class RegistryError(Exception):
+    """A model version is missing, incomplete or fails its checksums"""
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """sha256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Write a small text file so readers see either the old or the new content"""
+    tmp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned model artifacts under one root directory"""
+
+    def __init__(self, root='models/registry'):
+        self.root = root
+
+    def path(self, version):
+        if not version or version.startswith('.') or '/' in version or os.sep in version:
+            raise RegistryError(f'Invalid model version {version!r}')
+        return os.path.join(self.root, version)
+
+    def stage(self):
+        """New empty staging directory for a training run to save its artifacts into"""
+        staging_dir = os.path.join(self.root, STAGING_PREFIX + uuid.uuid4().hex[:12])
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def publish(self, staging_dir, feature_columns, weights=None, metrics=None, source=None,
+                feature_fingerprint=None):
+        """
+        Checksum the staged artifacts, write the manifest and move the staging
+        directory into place as a new version. Returns the version name.
+        """
+        artifacts = {}
+        for name in sorted(os.listdir(staging_dir)):
+            path = os.path.join(staging_dir, name)
+            if name == MANIFEST_NAME or not os.path.isfile(path):
+                continue
+            artifacts[name] = {'sha256': file_checksum(path), 'size_bytes': os.path.getsize(path)}
+
+        fingerprint = hashlib.sha256(
+            ''.join(f"{name}:{entry['sha256']};" for name, entry in artifacts.items()).encode()
+        ).hexdigest()
+        created_at = datetime.now()
+        version = f"{created_at.strftime('%Y%m%d-%H%M%S')}-{fingerprint[:8]}"
+
+        manifest = {
+            'version': version,
+            'created_at': created_at.isoformat(),
+            'source': source,
+            'feature_columns': list(feature_columns),
+            'feature_fingerprint': feature_fingerprint,
+            'weights': {name: float(weight) for name, weight in (weights or {}).items()},
+            'metrics': metrics or {},
+            'artifacts': artifacts
+        }
+        _write_atomic(os.path.join(staging_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, default=str))
+
+        # Same-filesystem rename: the version appears complete or not at all
+        os.rename(staging_dir, self.path(version))
+        return version
+
+    def manifest(self, version):
+        path = os.path.join(self.path(version), MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f'Model version {version} not found') from None
+
+    def versions(self):
+        """Published versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.isfile(os.path.join(self.root, name, MANIFEST_NAME))
+        )
+
+    def current(self):
+        """The promoted version, or None if nothing has been promoted"""
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def verify(self, version):
+        """Check every artifact of a version against its manifest; raises RegistryError"""
+        manifest = self.manifest(version)
+        for name, entry in manifest['artifacts'].items():
+            path = os.path.join(self.path(version), name)
+            if not os.path.exists(path):
+                raise RegistryError(f'{version}/{name} is missing')
+            if file_checksum(path) != entry['sha256']:
+                raise RegistryError(f'{version}/{name} does not match its checksum')
+        return manifest
+
+    def promote(self, version):
+        """Verify a version and make it the current one"""
+        self.verify(version)
+        _write_atomic(os.path.join(self.root, CURRENT_NAME), version + '\n')
+        return version
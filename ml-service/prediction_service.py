@@ -0,0 +1,83 @@
+"""
+Prediction Service Interface
+Regional forecasts and county statistics for in-process callers such as the
+chatbot, with an optional HTTP transport to a remote ml-service
+"""
+
+from abc import ABC, abstractmethod
+
+import requests
+
+
+class PredictionError(Exception):
+    """A forecast or statistics request was rejected or failed"""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceUnavailableError(PredictionError):
+    """The prediction service could not be reached"""
+
+    def __init__(self, message):
+        super().__init__(message, status=503)
+
+
+class PredictionService(ABC):
+    """
+    Interface used by the chatbot. Both methods return the same payloads as
+    the /predict_regional and /county_stats endpoints and raise
+    PredictionError on failure.
+    """
+
+    @abstractmethod
+    def predict_regional(self, county, months_ahead=6):
+        """Forecast payload of /predict_regional"""
+
+    @abstractmethod
+    def county_stats(self, county):
+        """Statistics payload of /county_stats"""
+
+
+class LocalPredictionService(PredictionService):
+    """Calls the forecasting functions of this process directly"""
+
+    def __init__(self, forecast_fn, stats_fn):
+        self._forecast_fn = forecast_fn
+        self._stats_fn = stats_fn
+
+    def predict_regional(self, county, months_ahead=6):
+        return self._forecast_fn(county, months_ahead)
+
+    def county_stats(self, county):
+        return self._stats_fn(county)
+
+
+class HTTPPredictionService(PredictionService):
+    """Calls a remote ml-service over HTTP"""
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise ServiceUnavailableError(str(e)) from e
+
+        if response.status_code != 200:
+            try:
+                message = response.json().get('error', response.reason)
+            except ValueError:
+                message = response.reason
+            raise PredictionError(message, status=response.status_code)
+        return response.json()
+
+    def predict_regional(self, county, months_ahead=6):
+        return self._request('POST', '/predict_regional', json={'county': county, 'months_ahead': months_ahead})
+
+    def county_stats(self, county):
+        return self._request('GET', '/county_stats', params={'county': county})
@@ -0,0 +1,276 @@
+"""
+Service Metrics
+Request counters and latency histograms kept in memory and rendered in the
+Prometheus text exposition format for /metrics.
+
+Each gunicorn worker counts its own requests. With a metrics directory set,
+every process also writes its totals there (from a background thread
+within a flush interval of a change, and on every scrape) and /metrics sums
+the files of all processes, so whichever worker answers the scrape reports
+the whole server. Processes working for a worker (its forecast pool) don't
+write files: they hand what they recorded back with collect() and the
+worker merge()s it into its own totals.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond model calls to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic total per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._registry.lock:
+            self._values[key] += amount
+            self._registry.changed = True
+
+    def snapshot(self):
+        return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, total, entry):
+        key, value = tuple(entry[0]), entry[1]
+        total[key] = total.get(key, 0.0) + value
+
+    def samples(self, merged):
+        for key, value in sorted(merged.items()):
+            yield f'{self.name}{_labels_text(self.labelnames, key)} {_number(value)}'
+
+
+class Histogram:
+    """Bucketed observations (count per bucket, sum, count) per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._registry.lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            self._registry.changed = True
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    def merge(self, total, entry):
+        key, counts, value_sum = tuple(entry[0]), entry[1], entry[2]
+        if len(counts) != len(self.buckets) + 1:
+            # Written with other buckets by an older version of the service
+            return
+        merged = total.setdefault(key, [[0] * len(counts), 0.0])
+        merged[0] = [a + b for a, b in zip(merged[0], counts)]
+        merged[1] += value_sum
+
+    def samples(self, merged):
+        for key, (counts, value_sum) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels_text(self.labelnames, key, [("le", _number(bound))])} {cumulative}'
+            yield f'{self.name}_sum{_labels_text(self.labelnames, key)} {_number(value_sum)}'
+            yield f'{self.name}_count{_labels_text(self.labelnames, key)} {cumulative}'
+
+
+class StageTimer:
+    """
+    Seconds per named stage of one request, accumulated over repeated
+    stages (e.g. every step of a recursive forecast) and observed once
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def observe(self, histogram, **labels):
+        for stage, seconds in self.seconds.items():
+            histogram.observe(seconds, stage=stage, **labels)
+
+
+class MetricsRegistry:
+    """The metrics of a process, optionally shared with other processes through a directory"""
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._metrics = {}
+        # Set by every update, cleared when the totals are written
+        self.changed = False
+        self._file = None
+        self._flusher = None
+        # Forked workers start counting from zero under a file of their own
+        # (named per process, not per pid, which the OS reuses)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def collect(self):
+        """Snapshot of everything recorded since the last collect, clearing it"""
+        with self.lock:
+            snapshot = {name: metric.snapshot() for name, metric in self._metrics.items()}
+            for metric in self._metrics.values():
+                metric._values.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot recorded by another process (see collect) to this one's totals"""
+        with self.lock:
+            for name, entries in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                for entry in entries:
+                    metric.merge(metric._values, entry)
+            self.changed = True
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._values.clear()
+        self.changed = False
+        self._file = None
+        self._flusher = None
+
+    def flush(self, force=False):
+        """
+        Write this process's totals to the metrics directory: now if forced,
+        otherwise from a background thread within flush_interval seconds
+        """
+        if self.directory is None:
+            return
+        if force:
+            self._write()
+        elif self._flusher is None:
+            with self.lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self.changed:
+                self._write()
+
+    def _write(self):
+        with self._write_lock:
+            self.changed = False
+            if self._file is None:
+                self._file = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f'{self._file}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self._file)
+
+    def _snapshots(self):
+        """Snapshots of every process writing to the directory, or of this one"""
+        if self.directory is None:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        merged = {name: {} for name in self._metrics}
+        for snapshot in self._snapshots():
+            for name, entries in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                for entry in entries:
+                    metric.merge(merged[name], entry)
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.samples(merged[name]))
+        return '\n'.join(lines) + '\n'
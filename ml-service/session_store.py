@@ -0,0 +1,168 @@
+"""
+Chat Session Store
+Per-sender conversation context for the chatbot with bounded size and idle
+expiry, kept in memory (one worker) or in a shared SQLite file (any number of
+workers on one host)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def new_context():
+    """Fresh conversation context for a sender"""
+    return {
+        'last_county': None,
+        'last_topic': None,
+        'user_name': None,
+        'conversation_count': 0
+    }
+
+
+class MemorySessionStore:
+    """In-process LRU of sender -> context with idle-TTL eviction"""
+
+    def __init__(self, max_sessions=10000, ttl_seconds=1800):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, sender):
+        """Context of a sender (a fresh one if unknown or idle too long)"""
+        with self._lock:
+            entry = self._sessions.get(sender)
+            if entry is None:
+                return new_context()
+
+            context, last_seen = entry
+            if self.ttl_seconds and time.monotonic() - last_seen > self.ttl_seconds:
+                del self._sessions[sender]
+                self.expirations += 1
+                return new_context()
+            return dict(context)
+
+    def save(self, sender, context):
+        """Store a sender's context, evicting the least recently active senders if full"""
+        with self._lock:
+            self._sessions[sender] = (dict(context), time.monotonic())
+            self._sessions.move_to_end(sender)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite file shared by all workers. Expired sessions are
+    ignored on read and pruned, together with the least recently active
+    sessions over max_sessions, every prune_every writes.
+    """
+
+    def __init__(self, path='sessions.db', max_sessions=10000, ttl_seconds=1800, prune_every=100):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Short-lived connection: the store may be created in the gunicorn
+        # master, and SQLite connections must not be shared across a fork
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS sessions ('
+                    'sender TEXT PRIMARY KEY, context TEXT NOT NULL, last_seen REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)')
+        finally:
+            conn.close()
+
+    def _connection(self):
+        """One connection per thread and process; WAL lets workers read while another writes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sender):
+        row = self._connection().execute(
+            'SELECT context, last_seen FROM sessions WHERE sender = ?', (sender,)
+        ).fetchone()
+        if row is None:
+            return new_context()
+
+        context, last_seen = row
+        if self.ttl_seconds and time.time() - last_seen > self.ttl_seconds:
+            return new_context()
+        return json.loads(context)
+
+    def save(self, sender, context):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO sessions (sender, context, last_seen) VALUES (?, ?, ?) '
+                'ON CONFLICT(sender) DO UPDATE SET context = excluded.context, last_seen = excluded.last_seen',
+                (sender, json.dumps(context), time.time())
+            )
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete expired sessions and the least recently active ones over max_sessions"""
+        with self._connection() as conn:
+            if self.ttl_seconds:
+                conn.execute('DELETE FROM sessions WHERE last_seen < ?', (time.time() - self.ttl_seconds,))
+            conn.execute(
+                'DELETE FROM sessions WHERE sender IN ('
+                'SELECT sender FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)',
+                (self.max_sessions,)
+            )
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM sessions')
+
+    def stats(self):
+        count = self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'sessions': count,
+            'max_sessions': self.max_sessions,
+            'ttl_seconds': self.ttl_seconds
+        }
@@ -0,0 +1,99 @@
+"""
+Feature Pipeline Tests
+OnlineFeatureState (serving) must produce the same features as
+build_features (training) for every row, fed one county at a time in
+chronological order.
+
+Run from the ml-service directory:
+    python -m pytest test_feature_engineering.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engineering import FEATURE_NAMES, PASSTHROUGH_COLUMNS, OnlineFeatureState, build_features, fit_params
+
+
+def synthetic_dataset(seed=0):
+    """Monthly rows of a few counties, one of them shorter than the largest lag"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for county, months in [('Kisumu', 48), ('Nairobi', 40), ('Turkana', 10)]:
+        month_index = np.arange(months)
+        frame = pd.DataFrame({
+            'county': county,
+            'year': 2020 + month_index // 12,
+            'month': month_index % 12 + 1,
+            'cases': rng.poisson(120, months).astype(float),
+            'rainfall_mm': rng.gamma(2.0, 60.0, months),
+            'temperature_celsius': rng.normal(24, 3, months),
+            'humidity_percent': rng.uniform(40, 95, months)
+        })
+        for column in PASSTHROUGH_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = rng.uniform(0, 100, months)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def online_features(data, params):
+    """Features of every row from OnlineFeatureState, as a frame indexed like data"""
+    rows = {}
+    for _, county_rows in data.groupby('county', sort=False):
+        # Stable, like build_features' lexsort, so duplicate months keep their order
+        county_rows = county_rows.sort_values(['year', 'month'], kind='mergesort')
+        state = OnlineFeatureState(params)
+        for index, row in county_rows.iterrows():
+            rows[index] = state.update(row.to_dict())
+    return pd.DataFrame.from_dict(rows, orient='index')[FEATURE_NAMES].loc[data.index]
+
+
+def assert_online_matches_batch(data):
+    params = fit_params(data)
+    batch = build_features(data, params)[FEATURE_NAMES].astype(float)
+    online = online_features(data, params).astype(float)
+    mismatched = [name for name in FEATURE_NAMES
+                  if not np.allclose(online[name], batch[name], rtol=1e-9, atol=1e-9)]
+    assert not mismatched, f'online and batch features differ: {mismatched}'
+
+
+def test_chronological_rows():
+    assert_online_matches_batch(synthetic_dataset())
+
+
+def test_shuffled_rows():
+    data = synthetic_dataset()
+    assert_online_matches_batch(data.sample(frac=1.0, random_state=1))
+
+
+def test_duplicate_months():
+    data = synthetic_dataset()
+    duplicates = data[data['county'] == 'Kisumu'].iloc[[5, 6, 20]].copy()
+    duplicates['cases'] += 7
+    duplicates.index = duplicates.index + 1000
+    assert_online_matches_batch(pd.concat([data, duplicates]))
+
+
+def test_county_shorter_than_largest_lag():
+    data = synthetic_dataset()
+    assert (data['county'] == 'Turkana').sum() < 24
+    assert_online_matches_batch(data[data['county'] == 'Turkana'])
+
+
+@pytest.mark.parametrize('column', ['cases', 'rainfall_mm'])
+def test_missing_values(column):
+    data = synthetic_dataset()
+    kisumu = data.index[data['county'] == 'Kisumu']
+    # A run of missing months, single gaps, and a county starting with a gap
+    missing = list(kisumu[[3, 4, 5, 11, 30]]) + [data.index[data['county'] == 'Turkana'][0]]
+    data.loc[missing, column] = np.nan
+    assert_online_matches_batch(data)
+
+
+def test_missing_cases_and_rainfall_shuffled():
+    data = synthetic_dataset(seed=3)
+    rng = np.random.default_rng(3)
+    data.loc[rng.choice(data.index, 12, replace=False), 'cases'] = np.nan
+    data.loc[rng.choice(data.index, 12, replace=False), 'rainfall_mm'] = np.nan
+    assert_online_matches_batch(data.sample(frac=1.0, random_state=4))
@@ -0,0 +1,71 @@
+"""
+Chat Matcher Tests
+The compiled phrase index (intent_matcher.py) must find the chatbot topics
+the substring scan it replaced found, apart from short triggers inside other
+words ('hi' in 'this').
+
+Run from the ml-service directory:
+    python -m pytest test_intent_matcher.py
+"""
+
+import pytest
+
+from chatbot_v2 import KilmalariaAI
+from intent_matcher import PhraseIndex
+from prediction_service import LocalPredictionService
+
+
+@pytest.fixture(scope='module')
+def bot():
+    # Matching never reaches the prediction service
+    return KilmalariaAI(LocalPredictionService(None, None))
+
+
+# Topics the substring scan found; it also found 'greeting' in the messages
+# containing 'hi' inside a word (feverish, chills, this, which)
+SUBSTRING_SCAN_TOPICS = [
+    ('how is malaria transmitted', {'transmission'}),
+    ('preventive measures', {'prevention'}),
+    ('I have a feverish child', {'symptoms', 'children'}),
+    ('mosquitoes spreading disease', {'transmission'}),
+    ('it spreads through bites', {'transmission'}),
+    ('how is it diagnosed', {'diagnosis'}),
+    ('I was tested positive', {'diagnosis'}),
+    ('is it treatable', {'treatment'}),
+    ('what medications are used', {'treatment'}),
+    ('what treatments exist', {'treatment'}),
+    ('protecting my children', {'prevention', 'children'}),
+    ('my baby has chills and a headache', {'symptoms', 'children'}),
+    ('Predictions for Kisumu next 6 months', {'predict'}),
+    ('forecasting the future', {'predict'}),
+    ('show me the historical statistics', {'statistics'}),
+    ('which counties are available', {'counties'}),
+    ('this is a test', {'diagnosis'}),
+    ('Hello there', {'greeting'}),
+]
+
+
+@pytest.mark.parametrize('message, topics', SUBSTRING_SCAN_TOPICS)
+def test_topics_match_substring_scan(bot, message, topics):
+    assert bot.intent_index.labels(message.lower()) == topics
+
+
+def test_stems_match_word_starts_only():
+    index = PhraseIndex({'transmission': ['transmit'], 'greeting': ['hi']}, inflect=True)
+    assert index.labels('transmitted') == {'transmission'}
+    assert index.labels('retransmit') == set()
+    assert index.labels('this') == set()
+    assert index.labels('hi there') == {'greeting'}
+
+
+def test_longer_stem_carries_shorter_stem_labels():
+    index = PhraseIndex({'prevention': ['prevent'], 'policy': ['preventive care']}, inflect=True)
+    assert index.labels('preventive care') == {'prevention', 'policy'}
+    index = PhraseIndex({'a': ['prevent'], 'b': ['prevention']}, inflect=True)
+    assert index.labels('preventions') == {'a', 'b'}
+
+
+def test_phrases_without_inflect_match_whole_words(bot):
+    assert bot.county_index.first('forecast for homa bay and kisumu') == 'Homa Bay'
+    assert bot.county_index.first('kisumus') is None
+    assert bot.county_index.first('muranga next month') == "Murang'a"
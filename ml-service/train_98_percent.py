@@ -3,12 +3,17 @@ Fast Training Script for 98% Accuracy
 Optimized for speed and accuracy
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, ExtraTreesRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor, ExtraTreesRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 import joblib
+from columnar_dataset import load_dataset
+from feature_cache import FeatureCache
+from feature_engineering import FEATURE_FINGERPRINT, build_features, fit_params, save_pipeline
+from model_distillation import build_fast_model, print_report, save_fast_model
+from model_loader import save_artifact
+from model_registry import ModelRegistry
 import os
 from datetime import datetime
 import warnings
@@ -18,55 +23,52 @@ print("=" * 70)
 print("TRAINING FOR 98% ACCURACY")
 print("=" * 70)
 
-# Load data
-print("\n[1/5] Loading data...")
-data = pd.read_csv('malaria_master_dataset.csv')
-print(f"Loaded {len(data):,} records")
-
-# Feature engineering
-print("\n[2/5] Feature engineering...")
-data = data.copy()
-
-# Temporal
-data['month_sin'] = np.sin(2 * np.pi * data['month'] / 12)
-data['month_cos'] = np.cos(2 * np.pi * data['month'] / 12)
-data['year_norm'] = (data['year'] - data['year'].min()) / (data['year'].max() - data['year'].min() + 1)
-
-# Lagged features
-for lag in [1, 2, 3, 6, 12]:
-    data[f'lag_{lag}'] = data.groupby('county')['cases'].shift(lag).fillna(data['cases'].mean())
-
-# Rolling
-for w in [3, 6]:
-    data[f'roll_mean_{w}'] = data.groupby('county')['cases'].transform(lambda x: x.rolling(w, min_periods=1).mean())
-    data[f'roll_std_{w}'] = data.groupby('county')['cases'].transform(lambda x: x.rolling(w, min_periods=1).std().fillna(0))
-
-# Interactions
-data['temp_hum'] = data['temperature_celsius'] * data['humidity_percent']
-data['rain_temp'] = data['rainfall_mm'] * data['temperature_celsius']
-data['rain_hum'] = data['rainfall_mm'] * data['humidity_percent']
-data['breeding'] = (data['rainfall_mm'] * data['humidity_percent']) / (data['temperature_celsius'] + 1)
-
-# County encoding
-county_dummies = pd.get_dummies(data['county'], prefix='county')
-data = pd.concat([data, county_dummies], axis=1)
-
-# Select features
-feature_cols = [
-    'month_sin', 'month_cos', 'year_norm',
-    'lag_1', 'lag_2', 'lag_3', 'lag_6', 'lag_12',
-    'roll_mean_3', 'roll_mean_6', 'roll_std_3', 'roll_std_6',
+# Features the models use, besides the county dummies
+base_features = [
+    'month_sin', 'month_cos', 'year_normalized',
+    'cases_lag_1', 'cases_lag_2', 'cases_lag_3', 'cases_lag_6', 'cases_lag_12',
+    'cases_rolling_mean_3', 'cases_rolling_mean_6', 'cases_rolling_std_3', 'cases_rolling_std_6',
     'rainfall_mm', 'temperature_celsius', 'humidity_percent',
     'wind_speed_kmh', 'altitude_meters', 'ndvi',
-    'temp_hum', 'rain_temp', 'rain_hum', 'breeding',
+    'temp_humidity', 'rainfall_temp', 'rainfall_humidity', 'breeding_risk',
     'heat_index', 'breeding_index', 'transmission_index',
     'bed_net_coverage_percent', 'irs_coverage_percent',
-] + [col for col in data.columns if col.startswith('county_')]
-
-feature_cols = [col for col in feature_cols if col in data.columns]
-
-X = data[feature_cols].fillna(0).replace([np.inf, -np.inf], 0)
-y = data['cases'].values
+]
+
+# Engineered matrices are cached by dataset checksum, feature pipeline and feature
+# list; a rerun on unchanged data skips straight to fitting (FEATURE_CACHE=0 rebuilds)
+feature_cache = FeatureCache(os.environ.get('FEATURE_CACHE_DIR', 'feature_cache'))
+cache_recipe = {'script': 'train_98_percent.py', 'features': base_features}
+cache_key = feature_cache.key('malaria_master_dataset.csv', cache_recipe)
+cached = feature_cache.load(cache_key) if os.environ.get('FEATURE_CACHE', '1') != '0' else None
+
+if cached is not None:
+    print("\n[1-2/5] Loading cached features...")
+    X, y, feature_params = cached.X, cached.y, cached.params
+    feature_cols = list(X.columns)
+    print(f"Loaded {len(X):,} rows from feature cache {cache_key}")
+else:
+    # Load data
+    print("\n[1/5] Loading data...")
+    # Typed columns instead of parsing the CSV (converted once by columnar_dataset.py);
+    # loaded into memory since the feature engineering below modifies the frame
+    data = load_dataset('malaria_master_dataset.csv', mmap_mode=None).frame
+    print(f"Loaded {len(data):,} records")
+
+    # Feature engineering
+    print("\n[2/5] Feature engineering...")
+    # Shared feature pipeline (feature_engineering.py): /predict_regional computes the
+    # same features, and the fitted params are saved with the model
+    feature_params = fit_params(data)
+    features = build_features(data, feature_params)
+
+    # Select features
+    feature_cols = base_features + [col for col in features.columns if col.startswith('county_')]
+    feature_cols = [col for col in feature_cols if col in features.columns]
+
+    X = features[feature_cols]
+    y = data['cases'].values
+    feature_cache.save(cache_key, X, y, feature_params, recipe=cache_recipe)
 
 print(f"Created {len(feature_cols)} features")
 
@@ -88,15 +90,16 @@ rf_pred = rf.predict(X_test)
 rf_r2 = r2_score(y_test, rf_pred)
 print(f"RandomForest: {rf_r2*100:.2f}%")
 
-# GradientBoosting - Optimized
-gb = GradientBoostingRegressor(
-    n_estimators=500, max_depth=12, learning_rate=0.02,
-    min_samples_split=2, min_samples_leaf=1, subsample=0.9, random_state=42
+# HistGradientBoosting - binned, multi-threaded; stops once a 10% validation split stops improving
+hgb = HistGradientBoostingRegressor(
+    max_iter=1000, learning_rate=0.05, max_leaf_nodes=31, min_samples_leaf=20,
+    l2_regularization=0.1, early_stopping=True, validation_fraction=0.1,
+    n_iter_no_change=30, random_state=42
 )
-gb.fit(X_train, y_train)
-gb_pred = gb.predict(X_test)
-gb_r2 = r2_score(y_test, gb_pred)
-print(f"GradientBoosting: {gb_r2*100:.2f}%")
+hgb.fit(X_train, y_train)
+hgb_pred = hgb.predict(X_test)
+hgb_r2 = r2_score(y_test, hgb_pred)
+print(f"HistGradientBoosting: {hgb_r2*100:.2f}% ({hgb.n_iter_} iterations)")
 
 # ExtraTrees - More trees
 et = ExtraTreesRegressor(
@@ -110,12 +113,12 @@ print(f"ExtraTrees: {et_r2*100:.2f}%")
 
 # Ensemble - Weighted by performance
 print("\n[5/5] Creating ensemble...")
-total_r2 = rf_r2 + gb_r2 + et_r2
+total_r2 = rf_r2 + hgb_r2 + et_r2
 rf_w = rf_r2 / total_r2
-gb_w = gb_r2 / total_r2
+hgb_w = hgb_r2 / total_r2
 et_w = et_r2 / total_r2
 
-ensemble_pred = rf_w * rf_pred + gb_w * gb_pred + et_w * et_pred
+ensemble_pred = rf_w * rf_pred + hgb_w * hgb_pred + et_w * et_pred
 ensemble_r2 = r2_score(y_test, ensemble_pred)
 ensemble_mae = mean_absolute_error(y_test, ensemble_pred)
 ensemble_rmse = np.sqrt(mean_squared_error(y_test, ensemble_pred))
@@ -125,17 +128,20 @@ print(f"MAE: {ensemble_mae:.2f}, RMSE: {ensemble_rmse:.2f}")
 
 # Save
 print("\nSaving models...")
-os.makedirs('models', exist_ok=True)
-joblib.dump(rf, 'models/randomforest_model.pkl')
-joblib.dump(gb, 'models/gradientboosting_model.pkl')
-joblib.dump(et, 'models/extratrees_model.pkl')
-joblib.dump(rf, 'models/malaria_model.pkl')  # Backward compat
-joblib.dump(feature_cols, 'models/feature_columns.pkl')
+# Save into a staging directory of the model registry; nothing is served from it until published
+registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
+model_dir = registry.stage()
+save_artifact(rf, os.path.join(model_dir, 'randomforest_model.pkl'))
+save_artifact(hgb, os.path.join(model_dir, 'histgradientboosting_model.pkl'))
+save_artifact(et, os.path.join(model_dir, 'extratrees_model.pkl'))
+save_artifact(rf, os.path.join(model_dir, 'malaria_model.pkl'))  # Backward compat
+joblib.dump(feature_cols, os.path.join(model_dir, 'feature_columns.pkl'))
+save_pipeline(os.path.join(model_dir, 'feature_pipeline.json'), feature_params)
 
 ensemble_metadata = {
     'weights': {
         'randomforest': float(rf_w),
-        'gradientboosting': float(gb_w),
+        'histgradientboosting': float(hgb_w),
         'extratrees': float(et_w)
     },
     'metrics': {
@@ -145,12 +151,33 @@ ensemble_metadata = {
     },
     'individual_scores': {
         'randomforest_r2': float(rf_r2),
-        'gradientboosting_r2': float(gb_r2),
+        'histgradientboosting_r2': float(hgb_r2),
         'extratrees_r2': float(et_r2)
     },
     'training_date': datetime.now().isoformat()
 }
-joblib.dump(ensemble_metadata, 'models/ensemble_metrics.pkl')
+joblib.dump(ensemble_metadata, os.path.join(model_dir, 'ensemble_metrics.pkl'))
+
+# Compact model for latency-sensitive endpoints (FAST_MODEL_ENDPOINTS in app.py); FAST_MODEL=0 skips it
+if os.environ.get('FAST_MODEL', '1') != '0':
+    print("   Building fast serving model...")
+    fast_model, fast_report = build_fast_model(
+        [('randomforest', rf), ('histgradientboosting', hgb), ('extratrees', et)],
+        ensemble_metadata['weights'], X_train, X_test, y_test)
+    print_report(fast_report)
+    save_fast_model(model_dir, fast_model, fast_report)
+    print(f"   [OK] Fast model: {fast_model.description} ({fast_model.n_trees} trees)")
+
+# Publish as a new registry version and promote it (PROMOTE_MODEL=0 only publishes);
+# a running service with the registry watcher swaps it in without a restart
+version = registry.publish(model_dir, feature_cols, weights=ensemble_metadata['weights'],
+                           metrics=ensemble_metadata['metrics'], source='train_98_percent.py',
+                           feature_fingerprint=FEATURE_FINGERPRINT)
+if os.environ.get('PROMOTE_MODEL', '1') != '0':
+    registry.promote(version)
+    print(f"   [OK] Model version {version} published and promoted")
+else:
+    print(f"   [OK] Model version {version} published (not promoted)")
 
 print("\n" + "=" * 70)
 print(f"TRAINING COMPLETE - Accuracy: {ensemble_r2*100:.2f}%")
@@ -5,12 +5,20 @@ Uses XGBoost, LightGBM, advanced feature engineering, and stacking ensemble
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, ExtraTreesRegressor, VotingRegressor
-from sklearn.model_selection import train_test_split, cross_val_score, KFold
+from sklearn.ensemble import (RandomForestRegressor, HistGradientBoostingRegressor,
+                              ExtraTreesRegressor, VotingRegressor)
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler, RobustScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score, mean_absolute_percentage_error
 from sklearn.feature_selection import SelectKBest, f_regression
 import joblib
+from columnar_dataset import load_dataset
+from cv_runner import run_cross_validation
+from feature_cache import FeatureCache
+from feature_engineering import FEATURE_FINGERPRINT, build_features, fit_params, save_pipeline
+from model_distillation import build_fast_model, print_report, save_fast_model
+from model_loader import save_artifact
+from model_registry import ModelRegistry
 import os
 from datetime import datetime
 import warnings
@@ -42,100 +50,8 @@ print("=" * 70)
 print("ADVANCED ML MODEL TRAINING - TARGET: 98% ACCURACY")
 print("=" * 70)
 
-# Load data
-print("\n[1/8] Loading dataset...")
-data = pd.read_csv('malaria_master_dataset.csv')
-print(f"   [OK] Loaded {len(data):,} records")
-print(f"   [OK] Initial features: {data.shape[1]}")
-
-# Feature engineering - Advanced
-print("\n[2/8] Advanced feature engineering...")
-
-# Ensure date is datetime
-data['date'] = pd.to_datetime(data['date'])
-
-# Temporal features
-data['month_sin'] = np.sin(2 * np.pi * data['month'] / 12)
-data['month_cos'] = np.cos(2 * np.pi * data['month'] / 12)
-data['month_sin_2'] = np.sin(4 * np.pi * data['month'] / 12)  # Higher frequency
-data['month_cos_2'] = np.cos(4 * np.pi * data['month'] / 12)
-data['year_normalized'] = (data['year'] - data['year'].min()) / (data['year'].max() - data['year'].min())
-data['quarter'] = ((data['month'] - 1) // 3) + 1
-data['quarter_sin'] = np.sin(2 * np.pi * data['quarter'] / 4)
-data['quarter_cos'] = np.cos(2 * np.pi * data['quarter'] / 4)
-
-# Advanced lagged features
-for lag in [1, 2, 3, 6, 12, 24]:
-    data[f'cases_lag_{lag}'] = data.groupby('county')['cases'].shift(lag)
-    data[f'cases_lag_{lag}'] = data[f'cases_lag_{lag}'].fillna(data['cases'].mean())
-    
-    # Lagged environmental features
-    data[f'rainfall_lag_{lag}'] = data.groupby('county')['rainfall_mm'].shift(lag)
-    data[f'rainfall_lag_{lag}'] = data[f'rainfall_lag_{lag}'].fillna(data['rainfall_mm'].mean())
-    
-    data[f'temp_lag_{lag}'] = data.groupby('county')['temperature_celsius'].shift(lag)
-    data[f'temp_lag_{lag}'] = data[f'temp_lag_{lag}'].fillna(data['temperature_celsius'].mean())
-
-# Rolling statistics - multiple windows
-for window in [3, 6, 12]:
-    data[f'cases_rolling_mean_{window}'] = data.groupby('county')['cases'].transform(
-        lambda x: x.rolling(window, min_periods=1).mean()
-    )
-    data[f'cases_rolling_std_{window}'] = data.groupby('county')['cases'].transform(
-        lambda x: x.rolling(window, min_periods=1).std().fillna(0)
-    )
-    data[f'cases_rolling_max_{window}'] = data.groupby('county')['cases'].transform(
-        lambda x: x.rolling(window, min_periods=1).max()
-    )
-    data[f'cases_rolling_min_{window}'] = data.groupby('county')['cases'].transform(
-        lambda x: x.rolling(window, min_periods=1).min()
-    )
-    
-    data[f'rainfall_rolling_mean_{window}'] = data.groupby('county')['rainfall_mm'].transform(
-        lambda x: x.rolling(window, min_periods=1).mean()
-    )
-
-# Exponential moving averages
-for span in [3, 6, 12]:
-    data[f'cases_ema_{span}'] = data.groupby('county')['cases'].transform(
-        lambda x: x.ewm(span=span, adjust=False).mean()
-    )
-
-# Interaction features - polynomial combinations
-data['temp_humidity'] = data['temperature_celsius'] * data['humidity_percent']
-data['rainfall_temp'] = data['rainfall_mm'] * data['temperature_celsius']
-data['rainfall_humidity'] = data['rainfall_mm'] * data['humidity_percent']
-data['temp_squared'] = data['temperature_celsius'] ** 2
-data['rainfall_squared'] = data['rainfall_mm'] ** 2
-data['humidity_squared'] = data['humidity_percent'] ** 2
-
-# Advanced environmental indices
-data['breeding_risk'] = (data['rainfall_mm'] * data['humidity_percent']) / (data['temperature_celsius'] + 1)
-data['malaria_index'] = (
-    (data['rainfall_mm'] / 100) * 
-    (data['humidity_percent'] / 100) * 
-    (data['temperature_celsius'] / 30)
-)
-data['optimal_temp'] = np.where(
-    (data['temperature_celsius'] >= 20) & (data['temperature_celsius'] <= 30),
-    1, 0
-)
-data['optimal_rainfall'] = np.where(
-    (data['rainfall_mm'] >= 50) & (data['rainfall_mm'] <= 200),
-    1, 0
-)
-
-# Rate of change features
-data['cases_diff_1'] = data.groupby('county')['cases'].diff(1).fillna(0)
-data['cases_diff_3'] = data.groupby('county')['cases'].diff(3).fillna(0)
-data['cases_pct_change'] = data.groupby('county')['cases'].pct_change().fillna(0)
-
-# County encoding (one-hot)
-county_dummies = pd.get_dummies(data['county'], prefix='county')
-data = pd.concat([data, county_dummies], axis=1)
-
-# Select features
-feature_cols = [
+# Features the models use, besides the county dummies
+base_features = [
     # Temporal
     'month_sin', 'month_cos', 'month_sin_2', 'month_cos_2',
     'year_normalized', 'quarter', 'quarter_sin', 'quarter_cos',
@@ -165,29 +81,60 @@ feature_cols = [
     'cases_diff_1', 'cases_diff_3', 'cases_pct_change',
     # Intervention features
     'bed_net_coverage_percent', 'irs_coverage_percent',
-    # County dummies
-] + [col for col in data.columns if col.startswith('county_')]
-
-# Remove any missing columns
-feature_cols = [col for col in feature_cols if col in data.columns]
-
-# Prepare data
-X = data[feature_cols].fillna(0)
-y = data['cases'].values
-
-# Replace infinity values
-X = X.replace([np.inf, -np.inf], 0)
-
-# Remove outliers (keep 99.5% of data)
-Q1 = np.percentile(y, 0.25)
-Q3 = np.percentile(y, 99.75)
-IQR = Q3 - Q1
-outlier_mask = (y >= Q1 - 1.5*IQR) & (y <= Q3 + 1.5*IQR)
-X = X[outlier_mask]
-y = y[outlier_mask]
-
-# Ensure no infinity or NaN values remain
-X = X.replace([np.inf, -np.inf], 0).fillna(0)
+]
+
+# Engineered matrices are cached by dataset checksum, feature pipeline, feature list
+# and outlier filter; a rerun on unchanged data skips straight to fitting
+# (FEATURE_CACHE=0 rebuilds)
+feature_cache = FeatureCache(os.environ.get('FEATURE_CACHE_DIR', 'feature_cache'))
+cache_recipe = {'script': 'train_advanced_model.py', 'features': base_features, 'outliers': 'iqr 0.25-99.75'}
+cache_key = feature_cache.key('malaria_master_dataset.csv', cache_recipe)
+cached = feature_cache.load(cache_key) if os.environ.get('FEATURE_CACHE', '1') != '0' else None
+
+if cached is not None:
+    print("\n[1-2/8] Loading cached features...")
+    X, y, feature_params = cached.X, cached.y, cached.params
+    feature_cols = list(X.columns)
+    print(f"   [OK] Loaded {len(X):,} rows from feature cache {cache_key}")
+else:
+    # Load data
+    print("\n[1/8] Loading dataset...")
+    # Typed columns instead of parsing the CSV (converted once by columnar_dataset.py);
+    # loaded into memory since the feature engineering below modifies the frame
+    data = load_dataset('malaria_master_dataset.csv', mmap_mode=None).frame
+    print(f"   [OK] Loaded {len(data):,} records")
+    print(f"   [OK] Initial features: {data.shape[1]}")
+
+    # Feature engineering - Advanced
+    print("\n[2/8] Advanced feature engineering...")
+
+    # Shared feature pipeline (feature_engineering.py): /predict_regional computes the
+    # same features, and the fitted params are saved with the model
+    feature_params = fit_params(data)
+    features = build_features(data, feature_params)
+
+    # Select features (plus county dummies), skipping any missing columns
+    feature_cols = base_features + [col for col in features.columns if col.startswith('county_')]
+    feature_cols = [col for col in feature_cols if col in features.columns]
+
+    # Prepare data
+    X = features[feature_cols]
+    y = data['cases'].values
+
+    # Replace infinity values
+    X = X.replace([np.inf, -np.inf], 0)
+
+    # Remove outliers (keep 99.5% of data)
+    Q1 = np.percentile(y, 0.25)
+    Q3 = np.percentile(y, 99.75)
+    IQR = Q3 - Q1
+    outlier_mask = (y >= Q1 - 1.5*IQR) & (y <= Q3 + 1.5*IQR)
+    X = X[outlier_mask]
+    y = y[outlier_mask]
+
+    # Ensure no infinity or NaN values remain
+    X = X.replace([np.inf, -np.inf], 0).fillna(0)
+    feature_cache.save(cache_key, X, y, feature_params, recipe=cache_recipe)
 
 print(f"   [OK] Created {len(feature_cols)} advanced features")
 print(f"   [OK] After outlier removal: {len(X):,} samples")
@@ -249,23 +196,27 @@ predictions_test['randomforest'] = rf_model.predict(X_test)
 scores['randomforest'] = r2_score(y_test, predictions_test['randomforest'])
 print(f"      [OK] RandomForest R²: {scores['randomforest']:.4f} ({scores['randomforest']*100:.2f}%)")
 
-# 2. GradientBoosting - Optimized
-print("   Training GradientBoosting...")
-gb_model = GradientBoostingRegressor(
-    n_estimators=500,
-    max_depth=10,
-    learning_rate=0.03,
-    min_samples_split=2,
-    min_samples_leaf=1,
-    subsample=0.85,
+# 2. HistGradientBoosting - binned and multi-threaded, with early stopping on a
+#    10% validation split of the training set (replaces GradientBoosting)
+print("   Training HistGradientBoosting...")
+hgb_model = HistGradientBoostingRegressor(
+    max_iter=1000,
+    learning_rate=0.05,
+    max_leaf_nodes=31,
+    min_samples_leaf=20,
+    l2_regularization=0.1,
+    early_stopping=True,
+    validation_fraction=0.1,
+    n_iter_no_change=30,
     random_state=42,
     verbose=0
 )
-gb_model.fit(X_train, y_train)
-models['gradientboosting'] = gb_model
-predictions_test['gradientboosting'] = gb_model.predict(X_test)
-scores['gradientboosting'] = r2_score(y_test, predictions_test['gradientboosting'])
-print(f"      [OK] GradientBoosting R²: {scores['gradientboosting']:.4f} ({scores['gradientboosting']*100:.2f}%)")
+hgb_model.fit(X_train, y_train)
+models['histgradientboosting'] = hgb_model
+predictions_test['histgradientboosting'] = hgb_model.predict(X_test)
+scores['histgradientboosting'] = r2_score(y_test, predictions_test['histgradientboosting'])
+print(f"      [OK] HistGradientBoosting R²: {scores['histgradientboosting']:.4f} "
+      f"({scores['histgradientboosting']*100:.2f}%, {hgb_model.n_iter_} iterations)")
 
 # 3. ExtraTrees - Optimized
 print("   Training ExtraTrees...")
@@ -355,34 +306,26 @@ print(f"     MAE: {ensemble_mae:.2f}, RMSE: {ensemble_rmse:.2f}, MAPE: {ensemble
 
 # Cross-validation
 print("\n[7/8] Cross-validation...")
-kf = KFold(n_splits=5, shuffle=True, random_state=42)
-cv_scores = []
-
-for train_idx, val_idx in kf.split(X_train):
-    X_cv_train, X_cv_val = X_train.iloc[train_idx], X_train.iloc[val_idx]
-    y_cv_train, y_cv_val = y_train[train_idx], y_train[val_idx]
-    
-    # Train all models
-    cv_preds = []
-    cv_weights = []
-    
-    for name, model_class in [
-        ('rf', RandomForestRegressor(n_estimators=300, max_depth=30, random_state=42, n_jobs=-1)),
-        ('gb', GradientBoostingRegressor(n_estimators=300, max_depth=8, learning_rate=0.03, random_state=42)),
-        ('et', ExtraTreesRegressor(n_estimators=300, max_depth=30, random_state=42, n_jobs=-1))
-    ]:
-        model = model_class
-        model.fit(X_cv_train, y_cv_train)
-        pred = model.predict(X_cv_val)
-        cv_preds.append(pred)
-        score = r2_score(y_cv_val, pred)
-        cv_weights.append(max(score, 0.01))  # Ensure positive weight
-    
-    # Weighted ensemble
-    total_weight = sum(cv_weights)
-    cv_ensemble = sum(w/total_weight * p for w, p in zip(cv_weights, cv_preds))
-    cv_r2 = r2_score(y_cv_val, cv_ensemble)
-    cv_scores.append(cv_r2)
+# Folds and models run concurrently, one fit per CPU (CV_WORKERS to override); each
+# finished fit is checkpointed so an interrupted run resumes (CV_CHECKPOINT_DIR)
+cv_estimators = {
+    'rf': RandomForestRegressor(n_estimators=300, max_depth=30, random_state=42, n_jobs=-1),
+    'hgb': HistGradientBoostingRegressor(max_iter=1000, learning_rate=0.05, max_leaf_nodes=31, min_samples_leaf=20,
+                                         l2_regularization=0.1, early_stopping=True, validation_fraction=0.1,
+                                         n_iter_no_change=30, random_state=42),
+    'et': ExtraTreesRegressor(n_estimators=300, max_depth=30, random_state=42, n_jobs=-1)
+}
+cv_result = run_cross_validation(
+    X_train, y_train, cv_estimators, n_splits=5, random_state=42,
+    checkpoint_dir=os.environ.get('CV_CHECKPOINT_DIR', 'models/cv_checkpoints'),
+    max_workers=int(os.environ['CV_WORKERS']) if os.environ.get('CV_WORKERS') else None
+)
+cv_scores = cv_result['scores']
+for fold in cv_result['folds']:
+    resumed = ' (resumed)' if fold['cached'] else ''
+    print(f"      Fold {fold['fold'] + 1}: R² {fold['r2']:.4f}, {fold['wall_seconds']:.1f}s wall{resumed}")
+print(f"   [OK] {cv_result['wall_seconds']:.1f}s wall for {cv_result['fit_seconds']:.1f}s of fits "
+      f"on {cv_result['workers']} workers")
 
 cv_mean = np.mean(cv_scores)
 cv_std = np.std(cv_scores)
@@ -390,17 +333,20 @@ print(f"   [OK] Cross-validation R²: {cv_mean:.4f} (+/- {cv_std*2:.4f})")
 
 # Save models
 print("\n[8/8] Saving models...")
-os.makedirs('models', exist_ok=True)
+# Save into a staging directory of the model registry; nothing is served from it until published
+registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
+model_dir = registry.stage()
 
 # Save all models
 for name, model in models.items():
-    joblib.dump(model, f'models/{name}_model.pkl')
+    save_artifact(model, os.path.join(model_dir, f'{name}_model.pkl'))
 
 # Save main model (RandomForest for backward compatibility)
-joblib.dump(rf_model, 'models/malaria_model.pkl')
-joblib.dump(feature_cols, 'models/feature_columns.pkl')
-joblib.dump(scaler, 'models/scaler.pkl')
-joblib.dump(selector, 'models/feature_selector.pkl')
+save_artifact(rf_model, os.path.join(model_dir, 'malaria_model.pkl'))
+joblib.dump(feature_cols, os.path.join(model_dir, 'feature_columns.pkl'))
+save_pipeline(os.path.join(model_dir, 'feature_pipeline.json'), feature_params)
+joblib.dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
+joblib.dump(selector, os.path.join(model_dir, 'feature_selector.pkl'))
 
 # Save ensemble metadata
 ensemble_metadata = {
@@ -419,7 +365,26 @@ ensemble_metadata = {
     'n_samples': len(X_train),
     'models_available': list(models.keys())
 }
-joblib.dump(ensemble_metadata, 'models/ensemble_metrics.pkl')
+joblib.dump(ensemble_metadata, os.path.join(model_dir, 'ensemble_metrics.pkl'))
+
+# Compact model for latency-sensitive endpoints (FAST_MODEL_ENDPOINTS in app.py); FAST_MODEL=0 skips it
+if os.environ.get('FAST_MODEL', '1') != '0':
+    print("   Building fast serving model...")
+    fast_model, fast_report = build_fast_model(list(models.items()), weights, X_train, X_test, y_test)
+    print_report(fast_report)
+    save_fast_model(model_dir, fast_model, fast_report)
+    print(f"   [OK] Fast model: {fast_model.description} ({fast_model.n_trees} trees)")
+
+# Publish as a new registry version and promote it (PROMOTE_MODEL=0 only publishes);
+# a running service with the registry watcher swaps it in without a restart
+version = registry.publish(model_dir, feature_cols, weights=ensemble_metadata['weights'],
+                           metrics=ensemble_metadata['metrics'], source='train_advanced_model.py',
+                           feature_fingerprint=FEATURE_FINGERPRINT)
+if os.environ.get('PROMOTE_MODEL', '1') != '0':
+    registry.promote(version)
+    print(f"   [OK] Model version {version} published and promoted")
+else:
+    print(f"   [OK] Model version {version} published (not promoted)")
 
 print("   [OK] Models saved successfully")
 
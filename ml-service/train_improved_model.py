@@ -3,13 +3,17 @@ Improved ML Model Training Script
 Uses advanced ensemble methods and hyperparameter tuning to achieve higher accuracy
 """
 
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, ExtraTreesRegressor
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score, mean_absolute_percentage_error
 import joblib
+from columnar_dataset import load_dataset
+from feature_cache import FeatureCache
+from feature_engineering import FEATURE_FINGERPRINT, build_features, fit_params, save_pipeline
+from model_loader import save_artifact
+from model_registry import ModelRegistry
 import os
 from datetime import datetime
 
@@ -17,55 +21,14 @@ print("=" * 60)
 print("IMPROVED ML MODEL TRAINING")
 print("=" * 60)
 
-# Load data
-print("\n[1/7] Loading dataset...")
-data = pd.read_csv('malaria_master_dataset.csv')
-print(f"   ✓ Loaded {len(data):,} records")
-print(f"   ✓ Initial features: {data.shape[1]}")
-
-# Feature engineering
-print("\n[2/7] Engineering features...")
-
-# Create temporal features
-data['date'] = pd.to_datetime(data['date'])
-data['month_sin'] = np.sin(2 * np.pi * data['month'] / 12)
-data['month_cos'] = np.cos(2 * np.pi * data['month'] / 12)
-data['year_normalized'] = (data['year'] - data['year'].min()) / (data['year'].max() - data['year'].min())
-
-# Create lagged features
-for lag in [1, 2, 3, 6, 12]:
-    data[f'cases_lag_{lag}'] = data.groupby('county')['cases'].shift(lag)
-    data[f'cases_lag_{lag}'] = data[f'cases_lag_{lag}'].fillna(data['cases'].mean())
-
-# Rolling averages
-data['cases_rolling_3'] = data.groupby('county')['cases'].transform(lambda x: x.rolling(3, min_periods=1).mean())
-data['cases_rolling_6'] = data.groupby('county')['cases'].transform(lambda x: x.rolling(6, min_periods=1).mean())
-
-# Interaction features
-data['temp_humidity'] = data['temperature_celsius'] * data['humidity_percent']
-data['rainfall_temp'] = data['rainfall_mm'] * data['temperature_celsius']
-data['rainfall_humidity'] = data['rainfall_mm'] * data['humidity_percent']
-data['breeding_risk'] = data['rainfall_mm'] * data['humidity_percent'] / (data['temperature_celsius'] + 1)
-
-# Environmental indices
-data['malaria_index'] = (
-    (data['rainfall_mm'] / 100) * 
-    (data['humidity_percent'] / 100) * 
-    (data['temperature_celsius'] / 30)
-)
-
-# County encoding (one-hot)
-county_dummies = pd.get_dummies(data['county'], prefix='county')
-data = pd.concat([data, county_dummies], axis=1)
-
-# Select features
-feature_cols = [
+# Features the models use, besides the county dummies
+base_features = [
     # Temporal
     'month_sin', 'month_cos', 'year_normalized',
     # Lagged cases
     'cases_lag_1', 'cases_lag_2', 'cases_lag_3', 'cases_lag_6', 'cases_lag_12',
     # Rolling averages
-    'cases_rolling_3', 'cases_rolling_6',
+    'cases_rolling_mean_3', 'cases_rolling_mean_6',
     # Environmental
     'rainfall_mm', 'temperature_celsius', 'humidity_percent',
     'wind_speed_kmh', 'altitude_meters', 'ndvi',
@@ -75,15 +38,45 @@ feature_cols = [
     'malaria_index', 'heat_index', 'breeding_index', 'transmission_index',
     # Intervention features
     'bed_net_coverage_percent', 'irs_coverage_percent',
-    # County dummies
-] + [col for col in data.columns if col.startswith('county_')]
-
-# Remove any missing columns
-feature_cols = [col for col in feature_cols if col in data.columns]
-
-# Prepare data
-X = data[feature_cols].fillna(0)
-y = data['cases'].values
+]
+
+# Engineered matrices are cached by dataset checksum, feature pipeline and feature
+# list; a rerun on unchanged data skips straight to fitting (FEATURE_CACHE=0 rebuilds)
+feature_cache = FeatureCache(os.environ.get('FEATURE_CACHE_DIR', 'feature_cache'))
+cache_recipe = {'script': 'train_improved_model.py', 'features': base_features}
+cache_key = feature_cache.key('malaria_master_dataset.csv', cache_recipe)
+cached = feature_cache.load(cache_key) if os.environ.get('FEATURE_CACHE', '1') != '0' else None
+
+if cached is not None:
+    print("\n[1-2/7] Loading cached features...")
+    X, y, feature_params = cached.X, cached.y, cached.params
+    feature_cols = list(X.columns)
+    print(f"   ✓ Loaded {len(X):,} rows from feature cache {cache_key}")
+else:
+    # Load data
+    print("\n[1/7] Loading dataset...")
+    # Typed columns instead of parsing the CSV (converted once by columnar_dataset.py);
+    # loaded into memory since the feature engineering below modifies the frame
+    data = load_dataset('malaria_master_dataset.csv', mmap_mode=None).frame
+    print(f"   ✓ Loaded {len(data):,} records")
+    print(f"   ✓ Initial features: {data.shape[1]}")
+
+    # Feature engineering
+    print("\n[2/7] Engineering features...")
+
+    # Shared feature pipeline (feature_engineering.py): /predict_regional computes the
+    # same features, and the fitted params are saved with the model
+    feature_params = fit_params(data)
+    features = build_features(data, feature_params)
+
+    # Select features (plus county dummies), skipping any missing columns
+    feature_cols = base_features + [col for col in features.columns if col.startswith('county_')]
+    feature_cols = [col for col in feature_cols if col in features.columns]
+
+    # Prepare data
+    X = features[feature_cols]
+    y = data['cases'].values
+    feature_cache.save(cache_key, X, y, feature_params, recipe=cache_recipe)
 
 print(f"   ✓ Created {len(feature_cols)} engineered features")
 print(f"   ✓ Target variable: cases")
@@ -209,17 +202,20 @@ print(f"   ExtraTrees CV R²: {cv_scores_et.mean():.4f} (+/- {cv_scores_et.std()
 
 # Save models
 print("\n[7/7] Saving models...")
-os.makedirs('models', exist_ok=True)
+# Save into a staging directory of the model registry; nothing is served from it until published
+registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
+model_dir = registry.stage()
 
 # Save individual models
-joblib.dump(rf_model, 'models/randomforest_model.pkl')
-joblib.dump(gb_model, 'models/gradientboosting_model.pkl')
-joblib.dump(et_model, 'models/extratrees_model.pkl')
+save_artifact(rf_model, os.path.join(model_dir, 'randomforest_model.pkl'))
+save_artifact(gb_model, os.path.join(model_dir, 'gradientboosting_model.pkl'))
+save_artifact(et_model, os.path.join(model_dir, 'extratrees_model.pkl'))
 
 # Save ensemble as main model (using RandomForest as base, but predictions will use ensemble)
 # For app.py, we'll use the ensemble weights
-joblib.dump(rf_model, 'models/malaria_model.pkl')  # Keep for backward compatibility
-joblib.dump(feature_cols, 'models/feature_columns.pkl')
+save_artifact(rf_model, os.path.join(model_dir, 'malaria_model.pkl'))  # Keep for backward compatibility
+joblib.dump(feature_cols, os.path.join(model_dir, 'feature_columns.pkl'))
+save_pipeline(os.path.join(model_dir, 'feature_pipeline.json'), feature_params)
 
 # Save ensemble metadata
 ensemble_metadata = {
@@ -243,10 +239,21 @@ ensemble_metadata = {
     'n_features': len(feature_cols),
     'n_samples': len(X_train)
 }
-joblib.dump(ensemble_metadata, 'models/ensemble_metrics.pkl')
+joblib.dump(ensemble_metadata, os.path.join(model_dir, 'ensemble_metrics.pkl'))
 
 # Save scaler
-joblib.dump(scaler, 'models/scaler.pkl')
+joblib.dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
+
+# Publish as a new registry version and promote it (PROMOTE_MODEL=0 only publishes);
+# a running service with the registry watcher swaps it in without a restart
+version = registry.publish(model_dir, feature_cols, weights=ensemble_metadata['weights'],
+                           metrics=ensemble_metadata['metrics'], source='train_improved_model.py',
+                           feature_fingerprint=FEATURE_FINGERPRINT)
+if os.environ.get('PROMOTE_MODEL', '1') != '0':
+    registry.promote(version)
+    print(f"   [OK] Model version {version} published and promoted")
+else:
+    print(f"   [OK] Model version {version} published (not promoted)")
 
 print("   ✓ Models saved successfully")
 
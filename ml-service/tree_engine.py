@@ -0,0 +1,201 @@
+"""
+Compiled Tree-Ensemble Inference
+Flattens fitted scikit-learn RandomForest, ExtraTrees, GradientBoosting and
+HistGradientBoosting regressors into one set of contiguous node arrays and
+evaluates every tree of every model with a single vectorized NumPy traversal
+"""
+
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor,
+                              RandomForestRegressor)
+
+# Rows traversed at once; bounds the (rows x trees) node index matrix
+MAX_BATCH_ROWS = 2048
+
+
+def _gradient_boosting_init(model):
+    """Constant initial prediction of a gradient boosting model, or None if it depends on X"""
+    if isinstance(model.init_, str) and model.init_ == 'zero':
+        return 0.0
+    if isinstance(model.init_, DummyRegressor):
+        return float(np.ravel(model.init_.constant_)[0])
+    return None
+
+
+def is_supported(model):
+    """True if the model can be compiled (single-output tree ensemble regressor)"""
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        return getattr(model, 'n_outputs_', 1) == 1
+    if isinstance(model, GradientBoostingRegressor):
+        return model.estimators_.shape[1] == 1 and _gradient_boosting_init(model) is not None
+    if isinstance(model, HistGradientBoostingRegressor):
+        # Identity link only; categorical splits use bitsets the node arrays cannot express
+        return (model.loss == 'squared_error' and model.n_trees_per_iteration_ == 1
+                and (model.is_categorical_ is None or not np.any(model.is_categorical_)))
+    return False
+
+
+def _tree_arrays(tree):
+    """(feature, threshold, left, right, value, missing_go_to_left, is_leaf, depth) of a fitted sklearn tree"""
+    leaf = tree.children_left == -1
+    if hasattr(tree, 'missing_go_to_left'):
+        missing = np.asarray(tree.missing_go_to_left, dtype=bool)
+    else:
+        missing = np.zeros(tree.node_count, dtype=bool)
+    return (tree.feature, tree.threshold, tree.children_left, tree.children_right,
+            tree.value[:, 0, 0].astype(float), missing, leaf, tree.max_depth)
+
+
+def _hist_tree_arrays(predictor):
+    """The same arrays for a tree of a histogram gradient boosting model"""
+    nodes = predictor.nodes
+    return (nodes['feature_idx'], nodes['num_threshold'], nodes['left'], nodes['right'],
+            nodes['value'].astype(float), nodes['missing_go_to_left'].astype(bool),
+            nodes['is_leaf'].astype(bool), int(nodes['depth'].max()))
+
+
+class CompiledEnsemble:
+    """
+    Node arrays for a set of named tree ensembles.
+
+    Leaves point back to themselves, so all trees can be walked for the
+    maximum depth without checking which rows have already reached a leaf.
+    predict() returns one row of predictions per model, like calling each
+    model's predict in turn.
+
+    sklearn compares float32 inputs in its trees but float64 inputs in
+    histogram gradient boosting, so the traversal reads both: histogram GB
+    nodes index the second, float64 half of the input row.
+    """
+
+    def __init__(self, models):
+        # models: list of (name, fitted model) pairs, all supported
+        self.names = []
+        self.n_features = None
+
+        features, thresholds, lefts, rights, values, missing_left = [], [], [], [], [], []
+        roots = []
+        model_bounds = [0]
+        self._combine = []  # (kind, scale, init) per model
+
+        offset = 0
+        max_depth = 0
+        for name, model in models:
+            if not is_supported(model):
+                raise ValueError(f"Cannot compile {name}: {type(model).__name__}")
+            if self.n_features is None:
+                self.n_features = model.n_features_in_
+            elif model.n_features_in_ != self.n_features:
+                raise ValueError(f"{name} expects {model.n_features_in_} features, not {self.n_features}")
+
+            # Histogram GB reads the float64 copy of the features (see class docstring)
+            feature_offset = 0
+            if isinstance(model, HistGradientBoostingRegressor):
+                trees = [_hist_tree_arrays(predictor) for predictor, in model._predictors]
+                # Leaf values already include the learning rate
+                self._combine.append(('boosting', 1.0, float(np.ravel(model._baseline_prediction)[0])))
+                feature_offset = self.n_features
+            elif isinstance(model, GradientBoostingRegressor):
+                trees = [_tree_arrays(estimator.tree_) for estimator in model.estimators_[:, 0]]
+                self._combine.append(('boosting', model.learning_rate, _gradient_boosting_init(model)))
+            else:
+                trees = [_tree_arrays(estimator.tree_) for estimator in model.estimators_]
+                self._combine.append(('average', len(trees), 0.0))
+
+            for feature, threshold, left, right, value, missing, leaf, depth in trees:
+                nodes = np.arange(len(value))
+
+                features.append(np.where(leaf, 0, feature.astype(np.intp) + feature_offset))
+                thresholds.append(np.where(leaf, np.inf, threshold))
+                lefts.append(np.where(leaf, nodes, left) + offset)
+                rights.append(np.where(leaf, nodes, right) + offset)
+                values.append(value)
+                missing_left.append(missing & ~leaf)
+
+                roots.append(offset)
+                offset += len(value)
+                max_depth = max(max_depth, depth)
+
+            self.names.append(name)
+            model_bounds.append(len(roots))
+
+        self.feature = np.concatenate(features) if features else np.zeros(0, dtype=np.intp)
+        self.threshold = np.concatenate(thresholds) if thresholds else np.zeros(0)
+        self.left = np.concatenate(lefts).astype(np.intp) if lefts else np.zeros(0, dtype=np.intp)
+        self.right = np.concatenate(rights).astype(np.intp) if rights else np.zeros(0, dtype=np.intp)
+        self.value = np.concatenate(values) if values else np.zeros(0)
+        self.missing_left = np.concatenate(missing_left) if missing_left else np.zeros(0, dtype=bool)
+        self.has_missing_left = bool(self.missing_left.any())
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.model_bounds = model_bounds
+        self.max_depth = max_depth
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def n_nodes(self):
+        return len(self.value)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaf_values(self, X):
+        """(n_rows, n_trees) matrix with the leaf value each row reaches in each tree"""
+        n_trees = self.n_trees
+        nodes = np.tile(self.roots, len(X))
+        X_flat = X.ravel()
+        n_features = X.shape[1]
+
+        # Flat (row, tree) positions still walking down; paths that reached a
+        # leaf are dropped so the work follows the actual path lengths
+        active = np.arange(len(nodes))
+        row_offsets = (active // n_trees) * n_features
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            x = X_flat[row_offsets + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if self.has_missing_left:
+                go_left |= np.isnan(x) & self.missing_left[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = following
+
+            walking = following != current
+            if not walking.all():
+                active = active[walking]
+                row_offsets = row_offsets[walking]
+                if len(active) == 0:
+                    break
+
+        return self.value[nodes].reshape(len(X), n_trees)
+
+    def predict(self, X):
+        """(n_models, n_rows) matrix of predictions, in the order the models were given"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        # sklearn evaluates trees on float32 inputs, histogram GB on the float64 ones
+        X = np.hstack([X.astype(np.float32).astype(np.float64), X])
+
+        predictions = np.empty((len(self.names), len(X)))
+        for start in range(0, len(X), MAX_BATCH_ROWS):
+            chunk = slice(start, start + MAX_BATCH_ROWS)
+            leaves = self.leaf_values(X[chunk])
+            for i, (kind, scale, init) in enumerate(self._combine):
+                tree_values = leaves[:, self.model_bounds[i]:self.model_bounds[i + 1]]
+                if kind == 'boosting':
+                    predictions[i, chunk] = init + (scale * tree_values).sum(axis=1)
+                else:
+                    predictions[i, chunk] = tree_values.sum(axis=1) / scale
+        return predictions
+
+    def summary(self):
+        """Sizes for the /health endpoint"""
+        return {
+            'models': list(self.names),
+            'trees': self.n_trees,
+            'nodes': self.n_nodes,
+            'max_depth': self.max_depth
+        }